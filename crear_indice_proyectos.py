@@ -1,12 +1,17 @@
-import os
-import re
+import hashlib
 from pathlib import Path
 
+from src.config.settings import NEAR_DUPLICATE_INDEX, PROJECT_SEARCH_INDEX, PROJECTS_ROOT
+from src.content.near_duplicates import NearDuplicateIndex
+from src.content.project_catalog import ProjectCatalog
+from src.content.script_index import ScriptIndex
+from src.content.text_search import BM25Index
+
 # --- Configuración ---
 
 # El directorio que contiene todas las carpetas de tus proyectos
-# Usar el directorio actual donde está el script
-ROOT_FOLDER = Path(__file__).parent
+# PROJECTS_ROOT (variable de entorno); por defecto, el directorio donde está el script
+ROOT_FOLDER = Path(PROJECTS_ROOT)
 
 # El archivo de salida donde se guardará el índice completo
 OUTPUT_FILE = "_master_project_list.txt"
@@ -14,107 +19,144 @@ OUTPUT_FILE = "_master_project_list.txt"
 # Nuevo: archivo de salida "curado" solo con proyectos virales / medio virales
 TOP_OUTPUT_FILE = "_master_project_top.txt"
 
-# --- Fin Configuración ---
+# Catálogo persistente (SQLite): huella de cada carpeta y de su guion, resumen e idea.
+# Solo se vuelven a leer los proyectos que han cambiado desde la última ejecución.
+# En la misma base va el índice de texto completo de los guiones (main_search.py)
+CATALOG_FILE = "_project_catalog.sqlite3"
 
+# Índice de búsqueda (BM25) sobre los resúmenes: la idea automática solo envía
+# al modelo los proyectos virales / medio virales más afines al estilo.
+# Se guarda junto a las carpetas de proyecto (ver PROJECT_SEARCH_INDEX)
+INDEX_FILE = "_project_index.json"
 
-def find_first_summary_line(script_path: Path) -> str:
-    """Lee un texto.txt y devuelve la primera línea de contenido real."""
-    try:
-        with script_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                # Ignora líneas vacías o etiquetas de speaker/imagen
-                if not line:
-                    continue
-                if line.startswith("[") and line.endswith("]"):
-                    continue
-
-                # Encontramos la primera línea de contenido
-                return line
-    except Exception as e:
-        return f"ERROR al leer el archivo: {e}"
+# Firmas MinHash de idea, resumen y guion de cada proyecto: la idea automática
+# descarta en local las ideas casi repetidas (ver NEAR_DUPLICATE_INDEX).
+# Solo se recalculan los proyectos cuyos archivos han cambiado
+DUPLICATES_FILE = "_project_minhash.json"
 
-    return "No se encontró texto de resumen."
-
-
-# --- NUEVA FUNCIÓN DE ORDEN ---
-# Esta es una versión más simple que solo necesita el nombre.
-def get_sort_key_from_name(project_name):
-    """Extrae el número del nombre del proyecto para ordenar."""
-    try:
-        # 2. Obtiene el número (ej: "10")
-        numero_str = project_name.split('_', 1)[0]
-        # 3. Lo convierte a entero (10)
-        return int(numero_str)
-    except (ValueError, IndexError):
-        # Si un proyecto no tiene número
-        return 99999
+# --- Fin Configuración ---
 
 
-def get_sort_key(linea_proyecto):
-    """Extrae el número de la línea de resumen completa para ordenar."""
-    try:
-        # 1. Obtiene el nombre (ej: "10_LAESPERA")
-        nombre_proyecto = linea_proyecto.split(':', 1)[0]
-        # 2. Usa la nueva función
-        return get_sort_key_from_name(nombre_proyecto)
-    except (ValueError, IndexError):
-        return 99999
+def open_catalog(root: Path = None) -> ProjectCatalog:
+    """Abre el catálogo de proyectos de root (None = ROOT_FOLDER); lo crea si no existe."""
+    return ProjectCatalog(str(Path(root or ROOT_FOLDER) / CATALOG_FILE))
 
 
-def main():
-    print(f"Buscando proyectos en: {ROOT_FOLDER.resolve()}")
+def _content_stamp(row: dict) -> str:
+    """Huella del contenido indexado de un proyecto (hash del guion + idea)."""
+    idea_hash = hashlib.sha1((row["idea"] or "").encode("utf-8")).hexdigest()[:12]
+    return f"{row['script_sha1']}:{idea_hash}"
 
-    project_summaries = []
-    summary_dict = {}  # Nuevo: para poder recuperar el resumen por nombre
 
-    # Listas para clasificar
-    viral_projects = []
-    medio_viral_projects = []
+def open_script_index(root: Path = None) -> ScriptIndex:
+    """Abre el índice de texto completo de los guiones (en la base del catálogo)."""
+    return ScriptIndex(str(Path(root or ROOT_FOLDER) / CATALOG_FILE))
 
-    # Iteramos sobre cada subcarpeta en la carpeta raíz
-    for subfolder in ROOT_FOLDER.iterdir():
-        if not subfolder.is_dir():
-            continue  # Ignora archivos sueltos
 
-        project_name = subfolder.name
+def _read_script(root: Path, row: dict) -> str:
+    """Texto del guion de un proyecto del catálogo ("" si no se puede leer)."""
+    try:
+        return (root / row["name"] / row["script_name"]).read_text(encoding="utf-8")
+    except Exception:
+        return ""
 
-        # Filtrar solo carpetas de proyectos (que empiecen con número_)
-        if not re.match(r'^\d+_', project_name):
-            continue  # Ignora carpetas que no son proyectos
 
-        # Clasificación de proyectos
-        if project_name.endswith("_v"):
-            viral_projects.append(project_name)
-        elif project_name.endswith("_mv"):
-            medio_viral_projects.append(project_name)
+def refresh_catalog(root: Path = None, on_change=None) -> tuple:
+    """
+    Actualiza solo el catálogo y el índice de texto completo de los guiones.
 
-        script_path = None
-        try:
-            script_path = next(subfolder.glob("texto*.txt"))
-        except StopIteration:
-            pass
+    Es la parte barata de build_index (la que usa main_search.py antes de
+    buscar): no reescribe los informes ni el índice BM25 ni las firmas MinHash.
+    build_index las pone al día en su siguiente ejecución comparando huellas.
 
-        if not script_path or not script_path.exists():
-            print(f"  -> AVISO: No se encontró 'texto*.txt' en '{project_name}'")
-            continue
+    Args:
+        root: Carpeta que contiene los proyectos (None = ROOT_FOLDER)
+        on_change: Callback adicional on_change(fila, texto del guion) para cada
+            proyecto nuevo o modificado
 
-        summary = find_first_summary_line(script_path)
-        entry = f"{project_name}: {summary}"
-        project_summaries.append(entry)
-        summary_dict[project_name] = summary  # Guardamos el resumen asociado
+    Returns:
+        (CatalogChanges, filas del catálogo ordenadas por número)
+    """
+    root = Path(root or ROOT_FOLDER)
+    script_index = open_script_index(root)
 
-        print(f"  -> Indexado: {project_name} (usando '{script_path.name}')")
+    def update(row: dict, script_text: str) -> None:
+        script_index.update_project(row["name"], script_text)
+        if on_change is not None:
+            on_change(row, script_text)
 
-    # Ordenamos las listas de virales
-    viral_projects.sort(key=get_sort_key_from_name)
-    medio_viral_projects.sort(key=get_sort_key_from_name)
+    catalog = open_catalog(root)
+    try:
+        changes = catalog.refresh(root, on_change=update)
+        rows = catalog.projects()
+
+        # Guiones que falten en el índice (p.ej. catálogo anterior a la búsqueda)
+        searchable = script_index.projects()
+        for row in rows:
+            if row["script_name"] and row["name"] not in searchable:
+                script_index.update_project(row["name"], _read_script(root, row))
+        script_index.remove_projects(changes.removed)
+    finally:
+        catalog.close()
+        script_index.close()
+    return changes, rows
+
+
+def build_index(root: Path = None, verbose: bool = True):
+    """
+    Actualiza el catálogo y regenera los índices y los informes de texto.
+
+    Solo se leen los proyectos nuevos o modificados; el resto se toma del
+    catálogo. Se puede llamar en el mismo proceso (create_project.py).
+
+    Args:
+        root: Carpeta que contiene los proyectos (None = ROOT_FOLDER)
+        verbose: Muestra cada proyecto (re)indexado
+
+    Returns:
+        CatalogChanges con los proyectos añadidos, actualizados y eliminados
+    """
+    default_root = root is None
+    root = Path(root or ROOT_FOLDER)
+    print(f"Buscando proyectos en: {root.resolve()}")
+
+    # Con la carpeta por defecto se escribe donde leen la idea automática y el
+    # filtro de duplicados (PROJECT_SEARCH_INDEX / NEAR_DUPLICATE_INDEX)
+    index_path = Path(PROJECT_SEARCH_INDEX) if default_root else root / INDEX_FILE
+    duplicates_path = Path(NEAR_DUPLICATE_INDEX) if default_root else root / DUPLICATES_FILE
+    duplicates_index = NearDuplicateIndex.load(str(duplicates_path))
+    fingerprinted = []
+
+    def on_change(row: dict, script_text: str) -> None:
+        # Firmas MinHash solo de lo que ha cambiado (el índice de texto lo pone al día refresh_catalog)
+        fingerprinted.append(row["name"])
+        duplicates_index.update_project(row["name"], _content_stamp(row), idea=row["idea"] or "",
+                                        summary=row["summary"] or "", script=script_text)
+        if verbose:
+            if row["script_name"]:
+                print(f"  -> Indexado: {row['name']} (usando '{row['script_name']}')")
+            else:
+                print(f"  -> AVISO: No se encontró 'texto*.txt' en '{row['name']}'")
+
+    changes, rows = refresh_catalog(root, on_change=on_change)
+
+    # Firmas que falten o estén desfasadas (se borró el archivo de firmas, o el
+    # catálogo se refrescó desde main_search.py sin recalcularlas)
+    for row in rows:
+        if row["script_name"] and duplicates_index.stamps.get(row["name"]) != _content_stamp(row):
+            on_change(row, _read_script(root, row))
+    pruned = duplicates_index.prune(row["name"] for row in rows)
+
+    project_summaries = [f"{row['name']}: {row['summary']}" for row in rows if row["script_name"]]
+    summary_dict = {row["name"]: row["summary"] for row in rows if row["script_name"]}
+    viral_projects = [row["name"] for row in rows if row["tier"] == "v"]
+    medio_viral_projects = [row["name"] for row in rows if row["tier"] == "mv"]
 
     # ------------------------------------------------------------------
     # 1) Escribimos el archivo maestro COMPLETO (como antes, + pequeña nota)
     # ------------------------------------------------------------------
     try:
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        with open(root / OUTPUT_FILE, "w", encoding="utf-8") as f:
             f.write("--- ÍNDICE DE PROYECTOS 'RELATOS EXTRAORDINARIOS' ---\n\n")
             f.write(f"Total de proyectos indexados: {len(project_summaries)}\n")
             f.write("-" * 50 + "\n")
@@ -126,9 +168,7 @@ def main():
             )
             f.write("-" * 50 + "\n\n")
 
-            # Ordenamos numéricamente todas las entradas
-            project_summaries.sort(key=get_sort_key)
-
+            # El catálogo ya viene ordenado numéricamente
             for entry in project_summaries:
                 f.write(f"{entry}\n")
 
@@ -150,13 +190,13 @@ def main():
 
     except Exception as e:
         print(f"\nError fatal al escribir el archivo de salida '{OUTPUT_FILE}': {e}")
-        return
+        return changes
 
     # ------------------------------------------------------------------
     # 2) Escribimos el archivo "TOP" CURADO solo para la IA
     # ------------------------------------------------------------------
     try:
-        with open(TOP_OUTPUT_FILE, "w", encoding="utf-8") as f:
+        with open(root / TOP_OUTPUT_FILE, "w", encoding="utf-8") as f:
             f.write("--- ÍNDICE CURADO PARA IA: PROYECTOS VIRALES Y MEDIO VIRALES ---\n\n")
             f.write(
                 "Este archivo está pensado específicamente para que los modelos de IA generen "
@@ -183,12 +223,42 @@ def main():
         print(f"\nError al escribir el archivo curado '{TOP_OUTPUT_FILE}': {e}")
         # No abortamos, el archivo grande ya está escrito
 
+    # ------------------------------------------------------------------
+    # 3) Índice de búsqueda sobre los resúmenes (para la idea automática)
+    # ------------------------------------------------------------------
+    try:
+        index = BM25Index()
+        for row in rows:
+            if row["script_name"]:
+                index.add(row["name"], f"{row['name'].replace('_', ' ')} {row['summary']}",
+                          summary=row["summary"], tier=row["tier"])
+        index.save(str(index_path))
+    except Exception as e:
+        print(f"\nError al escribir el índice de búsqueda '{index_path}': {e}")
+
+    # ------------------------------------------------------------------
+    # 4) Firmas MinHash para descartar ideas repetidas
+    # ------------------------------------------------------------------
+    if fingerprinted or pruned or not duplicates_path.exists():
+        try:
+            duplicates_index.save(str(duplicates_path))
+        except Exception as e:
+            print(f"\nError al escribir las firmas de duplicados '{duplicates_path}': {e}")
+
     print("\n" + "=" * 50)
     print(f"¡Éxito! Se ha creado el índice en: {OUTPUT_FILE}")
     print(f"Se ha creado también la versión curada para IA en: {TOP_OUTPUT_FILE}")
+    print(f"Índice de búsqueda para la idea automática: {index_path.name}")
+    print(f"Catálogo: {len(changes.added)} nuevos, {len(changes.updated)} modificados, "
+          f"{len(changes.removed)} eliminados, {changes.unchanged} sin cambios")
     print(f"Se han indexado {len(project_summaries)} proyectos.")
     print(f"Se encontraron {len(viral_projects)} virales y {len(medio_viral_projects)} medio virales.")
     print("=" * 50)
+    return changes
+
+
+def main():
+    build_index()
 
 
 if __name__ == "__main__":
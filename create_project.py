@@ -15,6 +15,11 @@ from openai import OpenAI
 import openai
 from google import genai
 from google.genai import types
+import crear_indice_proyectos
+from src.content.ideation import select_idea_exemplars, find_near_duplicate_projects
+from src.content.near_duplicates import NearDuplicateIndex
+from src.config.settings import NEAR_DUPLICATE_INDEX
+from src.services.runware_connection import get_shared_connection, close_shared_connections
 
 # --- CONFIGURACIÓN INICIAL ---
 # Cargar claves de API de forma segura desde el archivo .env
@@ -46,7 +51,7 @@ RUNWARE_API_KEY = os.getenv("RUNWARE_API_KEY")
 runware_available = False
 if RUNWARE_API_KEY:
     try:
-        from runware import Runware, IVideoInference, IFrameImage, IImageInference
+        from runware import IVideoInference, IFrameImage, IImageInference
         import asyncio
         runware_available = True
     except ImportError:
@@ -1135,9 +1140,8 @@ async def _generate_visuals_runware_async(
     all_images_successful = True
     
     try:
-        # Conectar a Runware
-        runware = Runware(api_key=RUNWARE_API_KEY)
-        await runware.connect()
+        # Conexión compartida con la animación (no se cierra al terminar las imágenes)
+        runware = await get_shared_connection(RUNWARE_API_KEY).get()
         print("\n✅ Conectado a Runware API para generación de imágenes.")
 
         # --- CAMBIO: Iteramos sobre la lista de prompts visuales ---
@@ -1234,10 +1238,6 @@ async def _generate_visuals_runware_async(
     except Exception as e:
         print(f"❌ Error fatal conectando o generando con Runware: {e}")
         all_images_successful = False
-    finally:
-        if runware:
-            await runware.disconnect()
-            print("\n🔌 Desconectado de Runware API (imágenes).")
 
     return all_images_successful
 
@@ -1471,7 +1471,7 @@ def generate_visuals_for_script(
 
         print(f"   📖 Brief de consistencia (qwen/corto) aplicado con lógica por escena")
 
-        return asyncio.run(_generate_visuals_runware_async(
+        return get_shared_connection(RUNWARE_API_KEY).run(_generate_visuals_runware_async(
             visual_prompts_list=visual_prompts_list,
             audio_scenes_list=audio_scenes_list,
             scene_contexts_list=scene_contexts,
@@ -1643,48 +1643,39 @@ def animate_images_with_runware(project_path: str, overwrite: bool = False):
 
     # Función async principal que ejecuta todas las animaciones
     async def animate_all():
-        # Conectar a Runware
-        runware = Runware(api_key=RUNWARE_API_KEY)
-        await runware.connect()
+        # Reutilizar la conexión abierta durante la generación de imágenes (si la hay)
+        runware = await get_shared_connection(RUNWARE_API_KEY).get()
         print("✅ Conectado a Runware API\n")
 
         all_videos_successful = True
 
-        try:
-            for image_file in image_files:
-                image_number = image_file.split('.')[0]
-                image_path = os.path.join(images_path, image_file)
-                video_path = os.path.join(images_path, f"{image_number}.mp4")
-
-                # Si ya existe y no queremos sobrescribir
-                if os.path.exists(video_path) and not overwrite:
-                    print(f"✓ Video {image_number}.mp4 ya existe, saltando animación.")
-                    continue
+        for image_file in image_files:
+            image_number = image_file.split('.')[0]
+            image_path = os.path.join(images_path, image_file)
+            video_path = os.path.join(images_path, f"{image_number}.mp4")
 
-                # Animar imagen
-                success = await _animate_single_image_runware(
-                    runware, image_path, video_path, image_number
-                )
+            # Si ya existe y no queremos sobrescribir
+            if os.path.exists(video_path) and not overwrite:
+                print(f"✓ Video {image_number}.mp4 ya existe, saltando animación.")
+                continue
 
-                if not success:
-                    print(f"🚫 Falló la animación de {image_file}")
-                    all_videos_successful = False
-                    # Continuar con las siguientes imágenes
+            # Animar imagen
+            success = await _animate_single_image_runware(
+                runware, image_path, video_path, image_number
+            )
 
-                # Pequeña pausa entre llamadas
-                await asyncio.sleep(1)
+            if not success:
+                print(f"🚫 Falló la animación de {image_file}")
+                all_videos_successful = False
+                # Continuar con las siguientes imágenes
 
-        finally:
-            # Cerrar conexión
-            try:
-                await runware.disconnect()
-            except Exception as e:
-                print(f"   ⚠️  Advertencia al cerrar conexión: {e}")
+            # Pequeña pausa entre llamadas
+            await asyncio.sleep(1)
 
         return all_videos_successful
 
     # Ejecutar el loop async
-    all_successful = asyncio.run(animate_all())
+    all_successful = get_shared_connection(RUNWARE_API_KEY).run(animate_all())
 
     if all_successful:
         print("\n✅ Todas las imágenes han sido animadas con éxito.")
@@ -1698,56 +1689,30 @@ def animate_images_with_runware(project_path: str, overwrite: bool = False):
 
 # --- 3. FUNCIONES PARA MODO AUTOMÁTICO ---
 def run_project_indexer():
-    """Ejecuta crear_indice_proyectos.py para actualizar el master list."""
+    """Actualiza el catálogo, los índices y el master list (en el mismo proceso, solo lo que cambió)."""
     print("📊 Actualizando índice de proyectos...")
     try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        indexer_path = os.path.join(script_dir, "crear_indice_proyectos.py")
-
-        if not os.path.exists(indexer_path):
-            print(f"⚠️ No se encontró crear_indice_proyectos.py en {indexer_path}")
-            return False
-
-        result = subprocess.run(
-            [sys.executable, indexer_path],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print("✅ Índice de proyectos actualizado correctamente")
+        changes = crear_indice_proyectos.build_index(verbose=False)
+        print(f"✅ Índice de proyectos actualizado correctamente "
+              f"({len(changes.changed)} cambios, {changes.unchanged} sin cambios)")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error al ejecutar crear_indice_proyectos.py: {e}")
-        print(f"Salida: {e.stdout}")
-        print(f"Error: {e.stderr}")
+    except Exception as e:
+        print(f"❌ Error al actualizar el índice de proyectos: {e}")
         return False
 
 
 def get_next_project_number():
-    """Lee el master list y determina el siguiente número de proyecto."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    master_list_path = os.path.join(script_dir, "_master_project_list.txt")
-
-    if not os.path.exists(master_list_path):
-        print("⚠️ No se encontró _master_project_list.txt, usando número 1")
-        return 1
-
-    max_number = 0
+    """Determina el siguiente número de proyecto a partir del catálogo."""
     try:
-        with open(master_list_path, "r", encoding="utf-8") as f:
-            for line in f:
-                # Buscar líneas que empiecen con número_NOMBRE
-                match = re.match(r'^(\d+)_', line)
-                if match:
-                    num = int(match.group(1))
-                    if num > max_number:
-                        max_number = num
-
-        next_number = max_number + 1
-        print(f"📈 Último proyecto: {max_number}, siguiente: {next_number}")
+        catalog = crear_indice_proyectos.open_catalog()
+        try:
+            next_number = catalog.next_number()
+        finally:
+            catalog.close()
+        print(f"📈 Último proyecto: {next_number - 1}, siguiente: {next_number}")
         return next_number
     except Exception as e:
-        print(f"❌ Error al leer _master_project_list.txt: {e}")
+        print(f"❌ Error al leer el catálogo de proyectos: {e}")
         return 1
 
 
@@ -1793,21 +1758,26 @@ def generate_automatic_idea(client: OpenAI, style_name: str | None = None):
     print("🤖 MODO AUTOMÁTICO ACTIVADO")
     print("="*70)
 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    master_list_path = os.path.join(script_dir, "_master_project_top.txt")
+    # Solo los proyectos virales / medio virales más afines al estilo (índice BM25):
+    # el prompt no crece con el catálogo
+    print("📖 Buscando proyectos anteriores de referencia...")
+    master_content = select_idea_exemplars(style_name)
 
-    if not os.path.exists(master_list_path):
-        print(f"❌ Error: No se encontró {master_list_path}")
-        return None
+    if not master_content:
+        # Sin índice de búsqueda: se envía el índice curado completo
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        master_list_path = os.path.join(script_dir, "_master_project_top.txt")
 
-    # Leer el contenido del master list
-    print("📖 Leyendo análisis de proyectos anteriores...")
-    try:
-        with open(master_list_path, "r", encoding="utf-8") as f:
-            master_content = f.read()
-    except Exception as e:
-        print(f"❌ Error al leer el archivo: {e}")
-        return None
+        if not os.path.exists(master_list_path):
+            print(f"❌ Error: No se encontró {master_list_path}")
+            return None
+
+        try:
+            with open(master_list_path, "r", encoding="utf-8") as f:
+                master_content = f.read()
+        except Exception as e:
+            print(f"❌ Error al leer el archivo: {e}")
+            return None
 
     # Hint opcional según el estilo visual escogido
     style_hint = ""
@@ -1875,7 +1845,11 @@ siga los patrones de misterio y atmósfera de estos ejemplos, sin copiarlos lite
 """.strip()
 
 
+    # Firmas MinHash de proyectos anteriores: las ideas repetidas se descartan en local
+    duplicates_index = NearDuplicateIndex.load(NEAR_DUPLICATE_INDEX)
+
     try:
+        # Última idea que solo falla restricciones de estilo (nunca una casi duplicada)
         last_idea = None
 
         # Hasta 3 intentos por si el modelo insiste con coches / carreteras / medianoches
@@ -1889,7 +1863,6 @@ siga los patrones de misterio y atmósfera de estos ejemplos, sin copiarlos lite
             )
 
             new_idea = response.choices[0].message.content.strip()
-            last_idea = new_idea
 
             idea_lower = new_idea.lower()
 
@@ -1917,7 +1890,10 @@ siga los patrones de misterio y atmósfera de estos ejemplos, sin copiarlos lite
             word_count = len(new_idea.split())
             longitud_ok = 20 <= word_count <= 120
 
-            if not starts_bad and not contains_banned and longitud_ok:
+            # Parecido con proyectos anteriores (idea, resumen o guion)
+            near_duplicates = find_near_duplicate_projects(new_idea, duplicates_index)
+
+            if not starts_bad and not contains_banned and longitud_ok and not near_duplicates:
                 # ✅ Idea válida
                 print("\n" + "="*70)
                 print("💡 NUEVA IDEA GENERADA:")
@@ -1926,19 +1902,27 @@ siga los patrones de misterio y atmósfera de estos ejemplos, sin copiarlos lite
                 print("="*70 + "\n")
                 return new_idea
             else:
-                print("⚠️ Idea con tema o inicio no deseado, o longitud rara. Reintentando...")
+                if not near_duplicates:
+                    last_idea = new_idea
+                print("⚠️ Idea con tema o inicio no deseado, longitud rara o ya hecha. Reintentando...")
                 if starts_bad:
                     print("   ↳ Motivo: inicio tipo 'medianoche' o similar.")
                 if contains_banned:
                     print("   ↳ Motivo: referencia a coche/carretera/viaje.")
                 if not longitud_ok:
                     print(f"   ↳ Motivo: longitud fuera de rango (palabras: {word_count}).")
+                if near_duplicates:
+                    similarity, project, kind = near_duplicates[0]
+                    print(f"   ↳ Motivo: se parece a {project} ({kind}, similitud {similarity:.2f}).")
 
-        # Si después de 3 intentos no conseguimos una idea perfecta, usamos la última pero avisamos
+        # Si después de 3 intentos no conseguimos una idea perfecta, usamos la última que no
+        # repite un proyecto anterior; si todas estaban repetidas, no se sigue
         print("⚠️ No se pudo obtener una idea que cumpla todas las restricciones tras varios intentos.")
         if last_idea:
-            print("\nÚltima idea generada (se utilizará de todas formas):")
+            print("\nÚltima idea generada que no repite proyectos (se utilizará de todas formas):")
             print(last_idea)
+        else:
+            print("❌ Todas las ideas generadas se parecen a proyectos anteriores.")
         return last_idea
 
     except Exception as e:
@@ -1950,6 +1934,14 @@ siga los patrones de misterio y atmósfera de estos ejemplos, sin copiarlos lite
 
 # --- 4. FUNCIÓN PRINCIPAL ORQUESTADORA ---
 def main():
+    try:
+        _main()
+    finally:
+        # También en los return anticipados: no queda abierto el websocket ni su event loop
+        close_shared_connections()
+
+
+def _main():
     parser = argparse.ArgumentParser(description="Automatización para Relatos Extraordinarios")
     parser.add_argument("--idea", required=False, help="La idea principal para el vídeo.")
     parser.add_argument("--project-name", required=False, help="El nombre de la carpeta del proyecto (p.ej. 192_RISA).")
@@ -1978,7 +1970,7 @@ def main():
     if args.idea is None and args.project_name is None:
         print("\n🚀 Modo automático detectado (no se proporcionaron --idea ni --project-name)")
 
-        # 1. Ejecutar crear_indice_proyectos.py
+        # 1. Actualizar el índice de proyectos (crear_indice_proyectos.build_index)
         if not run_project_indexer():
             print("❌ Error al actualizar el índice de proyectos. Abortando.")
             return
@@ -2109,6 +2101,10 @@ def main():
     else:
         print("\n💡 Tip: Puedes animar las imágenes agregando --animate-images a tu comando")
 
+    # Ya no se usa más Runware en esta ejecución
+    if runware_available:
+        close_shared_connections()
+
     # Verificar si el video base ya existe
     video_out_path = os.path.join(project_path, "Out", "video.mp4")
     video_exists = os.path.exists(video_out_path)
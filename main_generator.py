@@ -10,6 +10,7 @@ Ahora: Usa los módulos refactorizados en src/
 import argparse
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Importar configuración
@@ -18,11 +19,25 @@ from src.config.styles import STYLE_NAMES, STYLE_PRESETS_GEMINI, build_master_pr
 
 # Importar servicios
 from src.services.openai_service import OpenAIService
+from src.services.api_ledger import ledger_stage, set_ledger_context
 from src.services.gemini_service import GeminiService
 
 # Importar lógica de contenido
 from src.content.ideation import generate_project_name_from_idea, generate_automatic_idea
-from src.content.scripting import generate_creative_content, generate_visual_prompts_for_script
+from src.content.scripting import (
+    generate_creative_content,
+    generate_project_content,
+    generate_visual_prompts_for_script,
+    stream_visual_prompts_for_script,
+    screen_visual_prompts_for_safety
+)
+from src.content.consistency import extract_visual_consistency_brief
+
+
+def run_in_stage(stage: str, fn, *args, **kwargs):
+    """Ejecuta fn etiquetando sus llamadas a APIs con la etapa indicada (en su hilo)."""
+    with ledger_stage(stage):
+        return fn(*args, **kwargs)
 
 
 def interactive_style_selection():
@@ -66,15 +81,39 @@ def main():
     parser.add_argument("--overwrite", action="store_true", help="Sobrescribir imágenes existentes")
     parser.add_argument("--image-model", choices=["gemini", "qwen"], default="gemini",
                         help="Modelo para generar imágenes: gemini (alta calidad) o qwen (económico)")
+    parser.add_argument("--no-image-cache", action="store_true",
+                        help="No reutiliza imágenes cacheadas aunque el prompt final no haya cambiado")
+    parser.add_argument("--single-call", action="store_true",
+                        help="Genera guion, post, prompts visuales y brief en una sola llamada a GPT")
+    parser.add_argument("--stream-prompts", action="store_true",
+                        help="Lanza cada imagen en cuanto llega su prompt visual (ignorado con --single-call o --dry-run)")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="Reutiliza del disco las respuestas de GPT para peticiones idénticas (también LLM_CACHE=1)")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Ignora la caché de respuestas de GPT aunque LLM_CACHE=1")
+    parser.add_argument("--no-safety-screen", action="store_true",
+                        help="No revisa los prompts visuales antes de generar con Gemini (solo reescritura reactiva)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Duplica en Runware las escenas de Gemini que se retrasan (requiere RUNWARE_API_KEY)")
     parser.add_argument("--animate", action="store_true",
                         help="Animar imágenes con Runware después de generarlas (solo con --image-model qwen)")
 
     args = parser.parse_args()
 
+    if args.animate and args.image_model != "qwen":
+        print("⚠️ --animate solo está disponible con --image-model qwen; se ignorará.")
+        args.animate = False
+
+    if args.hedge and args.image_model != "gemini":
+        print("⚠️ --hedge solo está disponible con --image-model gemini; se ignorará.")
+        args.hedge = False
+
     # Validar API keys según modelo seleccionado
     required_keys = ["OPENAI_API_KEY"]
     if args.image_model == "gemini":
         required_keys.append("GEMINI_API_KEY")
+        if args.hedge:
+            required_keys.append("RUNWARE_API_KEY")
     elif args.image_model == "qwen":
         required_keys.append("RUNWARE_API_KEY")
 
@@ -86,7 +125,12 @@ def main():
 
     # Inicializar servicios
     print(f"🚀 Inicializando servicios (Modelo de imágenes: {args.image_model})...")
-    openai_service = OpenAIService()
+    use_llm_cache = None
+    if args.no_llm_cache:
+        use_llm_cache = False
+    elif args.llm_cache:
+        use_llm_cache = True
+    openai_service = OpenAIService(use_cache=use_llm_cache)
 
     # Inicializar servicio de imágenes según modelo seleccionado
     if args.image_model == "gemini":
@@ -101,9 +145,13 @@ def main():
         image_service = runware_service
 
     # 1. Obtener o generar idea
+    set_ledger_context(stage="idea")
     if args.auto_idea:
         print("\n🎲 Generando idea automática...")
         idea = generate_automatic_idea(openai_service)
+        if not idea:
+            print("❌ No se obtuvo una idea nueva (todas repetían proyectos anteriores). Usa --idea.")
+            sys.exit(1)
         print(f"💡 Idea generada: {idea}\n")
     elif args.idea:
         idea = args.idea
@@ -117,34 +165,71 @@ def main():
     style_name = interactive_style_selection()
     style_block = dict(STYLE_PRESETS_GEMINI)[style_name]
 
-    # 3. Generar contenido creativo (guion + social post)
-    print("\n🧠 Generando guion y contenido para redes sociales...")
-    content = generate_creative_content(idea, openai_service)
+    model_type = "qwen" if args.image_model == "qwen" else "gemini"
+    # En streaming los prompts se piden al generar las imágenes, no aquí
+    stream_prompts = args.stream_prompts and not args.single_call and not args.dry_run
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # El nombre del proyecto solo depende de la idea: se pide mientras se escribe el guion
+        name_future = executor.submit(
+            run_in_stage, "nombre", generate_project_name_from_idea, idea, openai_service
+        )
 
-    if not content:
-        print("❌ Error al generar contenido.")
-        sys.exit(1)
+        # 3. Generar contenido creativo (guion + social post)
+        if args.single_call:
+            print("\n🧠 Generando guion, post, prompts visuales y brief en una sola llamada...")
+            set_ledger_context(stage="contenido")
+            content = generate_project_content(idea, openai_service, model_type=model_type)
+        else:
+            print("\n🧠 Generando guion y contenido para redes sociales...")
+            set_ledger_context(stage="guion")
+            content = generate_creative_content(idea, openai_service)
 
-    script_text = content.get("script", "")
-    social_post = content.get("social_post", "")
+        if not content:
+            print("❌ Error al generar contenido.")
+            sys.exit(1)
 
-    print("✅ Guion generado")
-    print("✅ Post para redes generado")
+        script_text = content.get("script", "")
+        social_post = content.get("social_post", "")
 
-    # 4. Generar nombre de proyecto
-    print("\n📝 Generando nombre de proyecto...")
-    project_name = generate_project_name_from_idea(idea, openai_service)
-    print(f"📁 Nombre del proyecto: {project_name}")
+        print("✅ Guion generado")
+        print("✅ Post para redes generado")
 
-    # 5. Generar prompts visuales
-    print("\n🎬 Generando prompts visuales para cada escena...")
-    visual_prompts = generate_visual_prompts_for_script(script_text, openai_service)
+        if args.single_call:
+            visual_prompts = content.get("visual_prompts") or []
+            visual_brief_raw = content.get("brief")
+        else:
+            # 4-5. Prompts visuales y brief de consistencia solo dependen del
+            # guion: se piden a la vez y se espera a ambos
+            prompts_future = None
+            if stream_prompts:
+                print("\n🎬 Generando brief de consistencia (los prompts llegarán en streaming)...")
+            else:
+                print("\n🎬 Generando prompts visuales y brief de consistencia en paralelo...")
+                prompts_future = executor.submit(
+                    run_in_stage, "prompts_visuales", generate_visual_prompts_for_script, script_text, openai_service
+                )
+            # El brief solo se usa para generar imágenes
+            brief_future = None
+            if not args.dry_run:
+                brief_future = executor.submit(
+                    run_in_stage, "brief", extract_visual_consistency_brief,
+                    script_text, openai_service, model_type=model_type
+                )
+            visual_prompts = prompts_future.result() if prompts_future else []
+            visual_brief_raw = brief_future.result() if brief_future else None
+
+        project_name = name_future.result()
 
-    if not visual_prompts:
-        print("❌ Error al generar prompts visuales.")
-        sys.exit(1)
+    print(f"📁 Nombre del proyecto: {project_name}")
+    # Las llamadas de esta ejecución quedan asociadas al proyecto (también las anteriores)
+    set_ledger_context(project=project_name.replace(" ", "_"))
+
+    if not stream_prompts:
+        if not visual_prompts:
+            print("❌ Error al generar prompts visuales.")
+            sys.exit(1)
 
-    print(f"✅ {len(visual_prompts)} prompts visuales generados")
+        print(f"✅ {len(visual_prompts)} prompts visuales generados")
 
     # 6. Crear directorio del proyecto
     project_dir = args.output / project_name.replace(" ", "_")
@@ -160,8 +245,9 @@ def main():
     print(f"💾 Post guardado en: {social_file}")
 
     prompts_file = project_dir / "visual_prompts.json"
-    prompts_file.write_text(json.dumps(visual_prompts, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"💾 Prompts visuales guardados en: {prompts_file}")
+    if not stream_prompts:
+        prompts_file.write_text(json.dumps(visual_prompts, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 Prompts visuales guardados en: {prompts_file}")
 
     metadata = {
         "idea": idea,
@@ -179,7 +265,6 @@ def main():
         # Importar módulos adicionales para generación
         import re
         from src.content.consistency import (
-            extract_visual_consistency_brief,
             ensure_brief_dict,
             classify_scene_for_brief,
             build_consistency_context_for_scene
@@ -193,7 +278,7 @@ def main():
             print("❌ ERROR: No se encontraron descripciones de escenas en el guion.")
             sys.exit(1)
 
-        if len(audio_scenes_list) != len(visual_prompts):
+        if not stream_prompts and len(audio_scenes_list) != len(visual_prompts):
             print(f"⚠️ Advertencia: Número de escenas de audio ({len(audio_scenes_list)}) "
                   f"diferente a prompts visuales ({len(visual_prompts)})")
 
@@ -208,11 +293,17 @@ def main():
             cleaned_visual_prompts.append(cleaned)
 
         visual_prompts = cleaned_visual_prompts
-        print(f"   🧩 Escenas con protagonista detectadas: {sum(character_flags)} de {len(character_flags)}")
+        if not stream_prompts:
+            print(f"   🧩 Escenas con protagonista detectadas: {sum(character_flags)} de {len(character_flags)}")
 
-        # Extraer brief de consistencia (adaptar al modelo)
-        model_type = "qwen" if args.image_model == "qwen" else "gemini"
-        visual_brief_raw = extract_visual_consistency_brief(script_text, openai_service, model_type=model_type)
+        # Revisión de seguridad previa (una sola llamada, memorizada por prompt)
+        set_ledger_context(stage="seguridad")
+        if stream_prompts and args.image_model == "gemini" and not args.no_safety_screen:
+            print("   ℹ️  Prompts en streaming: sin revisión previa de seguridad (se mantiene la reescritura reactiva)")
+        elif args.image_model == "gemini" and not args.no_safety_screen:
+            visual_prompts = screen_visual_prompts_for_safety(visual_prompts, openai_service)
+
+        # Brief de consistencia (ya extraído en paralelo, adaptado al modelo)
         visual_brief = ensure_brief_dict(visual_brief_raw)
 
         # Guardar brief
@@ -228,10 +319,9 @@ def main():
             print(f"   ⚠️ Advertencia: No se pudo guardar brief.txt: {e}")
 
         # Construir contexto por escena
-        scene_contexts = []
-        total_scenes = len(visual_prompts)
+        total_scenes = len(audio_scenes_list) if stream_prompts else len(visual_prompts)
 
-        for idx, audio_scene in enumerate(audio_scenes_list):
+        def scene_context(idx: int, audio_scene: str) -> str:
             flags = classify_scene_for_brief(audio_scene)
 
             # El personaje se controla por el marcador [PROTAGONISTA]
@@ -240,22 +330,53 @@ def main():
             else:
                 flags["include_character"] = False
 
-            ctx = build_consistency_context_for_scene(
+            return build_consistency_context_for_scene(
                 visual_brief,
                 include_character=flags["include_character"],
                 include_environment=flags["include_environment"],
                 include_objects=flags["include_objects"],
                 total_scenes=total_scenes,
             )
-            scene_contexts.append(ctx)
 
-        print(f"   📖 Contextos de consistencia preparados por escena (total: {len(scene_contexts)})")
+        scene_stream = None
+        streamed_prompts = []
+        if stream_prompts:
+            scene_contexts = []
+
+            def iter_streamed_scenes():
+                """Prepara cada escena (marcador, limpieza, contexto) en cuanto llega su prompt."""
+                with ledger_stage("prompts_visuales"):
+                    for idx, raw_prompt in stream_visual_prompts_for_script(script_text, openai_service):
+                        character_flags.append("[PROTAGONISTA]" in raw_prompt)
+                        prompt = raw_prompt.replace("[PROTAGONISTA]", "la protagonista")
+                        streamed_prompts.append(prompt)
+                        audio_scene = audio_scenes_list[idx] if idx < len(audio_scenes_list) else ""
+                        print(f"   📨 Prompt {idx+1}/{total_scenes} recibido: se lanza su imagen")
+                        yield idx, prompt, scene_context(idx, audio_scene)
+
+            scene_stream = iter_streamed_scenes()
+            print("\n🎬 Generando prompts visuales en streaming (cada imagen arranca al llegar su prompt)...")
+        else:
+            scene_contexts = [scene_context(idx, audio_scene) for idx, audio_scene in enumerate(audio_scenes_list)]
+            print(f"   📖 Contextos de consistencia preparados por escena (total: {len(scene_contexts)})")
 
         # Generar imágenes con el modelo seleccionado
         images_dir = project_dir / "images"
         images_dir.mkdir(exist_ok=True)
+        set_ledger_context(stage="imagenes")
 
         if args.image_model == "gemini":
+            hedge = None
+            if args.hedge:
+                from src.services.runware_service import is_runware_available
+                if is_runware_available():
+                    from src.services.image_backends import HedgedImageGenerator, RunwareBackend
+                    hedge = HedgedImageGenerator(RunwareBackend(
+                        style_block, style_name.lower(), use_cache=not args.no_image_cache
+                    ))
+                else:
+                    print("⚠️ Runware no está instalado; se genera sin duplicados (pip install runware)")
+
             # Generar con Gemini (alta calidad)
             success = gemini_service.generate_visuals_for_script(
                 visual_prompts_list=visual_prompts,
@@ -266,21 +387,53 @@ def main():
                 style_block=style_block,
                 overwrite=args.overwrite,
                 image_model="gemini-2.5-flash-image",
-                style_slug_for_pixelize=style_name.lower()
+                style_slug_for_pixelize=style_name.lower(),
+                use_cache=not args.no_image_cache,
+                hedge=hedge,
+                scene_stream=scene_stream
             )
+
+            if hedge is not None:
+                hedge.print_summary()
+                hedge.close()
         else:  # qwen
-            # Generar con Runware/Qwen (económico)
-            import asyncio
-            success = asyncio.run(runware_service.generate_visuals_for_script(
+            # Generar con Runware/Qwen (económico); con --animate cada escena se anima
+            # en cuanto su imagen está lista, sobre la misma conexión
+            success = runware_service.run(runware_service.generate_visuals_for_script(
                 visual_prompts_list=visual_prompts,
                 audio_scenes_list=audio_scenes_list,
                 scene_contexts_list=scene_contexts,
                 project_path=str(project_dir),
                 style_block=style_block,
                 overwrite=args.overwrite,
-                style_slug_for_pixelize=style_name.lower()
+                style_slug_for_pixelize=style_name.lower(),
+                animate=args.animate,
+                use_cache=not args.no_image_cache,
+                scene_stream=scene_stream
             ))
 
+            if args.animate:
+                # Apuntar el guion a los videos de las escenas animadas
+                animated = {p.stem for p in images_dir.glob("*.mp4") if p.stem.isdigit()}
+                updated_script = re.sub(
+                    r"\[imagen:(\d+)\.png\]",
+                    lambda m: f"[imagen:{m.group(1)}.mp4]" if m.group(1) in animated else m.group(0),
+                    script_text
+                )
+                if updated_script != script_text:
+                    script_file.write_text(updated_script, encoding="utf-8")
+                    print(f"✅ {script_file.name} actualizado: .png → .mp4 en {len(animated)} escenas animadas")
+
+            runware_service.close()
+
+        if stream_prompts:
+            # Los prompts solo se conocen enteros al terminar el streaming
+            prompts_file.write_text(json.dumps(streamed_prompts, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"💾 {len(streamed_prompts)} prompts visuales guardados en: {prompts_file}")
+            print(f"   🧩 Escenas con protagonista detectadas: {sum(character_flags)} de {len(character_flags)}")
+            if len(streamed_prompts) < len(audio_scenes_list):
+                success = False
+
         if success:
             print(f"\n✅ ¡Proyecto creado exitosamente en {project_dir}!")
             print(f"📁 Imágenes generadas en: {images_dir}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Informe de coste y latencia de las llamadas a APIs externas.
+
+Lee el registro SQLite (API_LEDGER_PATH) y muestra, por grupo, el número de
+llamadas, errores, latencia p50/p95, tiempo hasta el primer token (p50, solo
+llamadas en streaming), tiempo total y coste.
+
+Uso:
+    python main_ledger_report.py                       # por proyecto y etapa
+    python main_ledger_report.py --by provider model   # por proveedor y modelo
+    python main_ledger_report.py --project Mi_Proyecto --days 7
+"""
+import argparse
+import sys
+import time
+
+from src.services.api_ledger import ApiLedger
+from src.config.settings import API_LEDGER_PATH
+
+GROUP_FIELDS = ("project", "stage", "provider", "model", "operation")
+
+
+def _percentile(values: list, p: float) -> float:
+    """Percentil p (0-100) por interpolación lineal."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(rows: list, group_by: list) -> list:
+    """
+    Agrega las llamadas por los campos indicados.
+
+    Args:
+        rows: Filas del registro (dicts)
+        group_by: Campos de agrupación (ver GROUP_FIELDS)
+
+    Returns:
+        Lista de dicts (group, calls, errors, p50, p95, ttft_p50, total_s, cost) ordenada por
+        tiempo total; ttft_p50 es None si el grupo no tiene llamadas en streaming
+    """
+    groups = {}
+    for row in rows:
+        key = tuple(row.get(field) or "-" for field in group_by)
+        groups.setdefault(key, []).append(row)
+
+    summary = []
+    for key, items in groups.items():
+        latencies = [r["latency_s"] for r in items]
+        costs = [r["cost_usd"] for r in items if r["cost_usd"] is not None]
+        ttfts = [r["ttft_s"] for r in items if r.get("ttft_s") is not None]
+        summary.append({
+            "group": " / ".join(str(k) for k in key),
+            "calls": len(items),
+            "errors": sum(1 for r in items if not r["ok"]),
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "ttft_p50": _percentile(ttfts, 50) if ttfts else None,
+            "total_s": sum(latencies),
+            "cost": sum(costs) if costs else None,
+        })
+    summary.sort(key=lambda s: s["total_s"], reverse=True)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe de coste y latencia de las llamadas a APIs")
+    parser.add_argument("--by", nargs="+", choices=GROUP_FIELDS, default=["project", "stage"],
+                        help="Campos de agrupación (default: project stage)")
+    parser.add_argument("--project", type=str, help="Solo este proyecto")
+    parser.add_argument("--days", type=float, help="Solo las llamadas de los últimos N días")
+    parser.add_argument("--db", type=str, default=API_LEDGER_PATH, help="Ruta del registro SQLite")
+    args = parser.parse_args()
+
+    since = time.time() - args.days * 86400 if args.days else None
+    ledger = ApiLedger(args.db)
+    rows = ledger.rows(project=args.project, since=since)
+    ledger.close()
+
+    if not rows:
+        print("ℹ️  No hay llamadas registradas con esos filtros.")
+        sys.exit(0)
+
+    summary = summarize(rows, args.by)
+    title = " / ".join(args.by)
+    width = max(len(title), max(len(s["group"]) for s in summary))
+
+    print(f"\n📊 Llamadas a APIs ({len(rows)} registradas) — {args.db}\n")
+    print(f"{title:<{width}}  {'Llamadas':>8}  {'Errores':>7}  {'p50':>7}  {'p95':>7}  {'TTFT':>7}  {'Total':>9}  {'Coste':>9}")
+    for s in summary:
+        cost = f"${s['cost']:.3f}" if s["cost"] is not None else "-"
+        ttft = f"{s['ttft_p50']:.1f}s" if s["ttft_p50"] is not None else "-"
+        print(f"{s['group']:<{width}}  {s['calls']:>8}  {s['errors']:>7}  {s['p50']:>6.1f}s  "
+              f"{s['p95']:>6.1f}s  {ttft:>7}  {s['total_s']:>8.0f}s  {cost:>9}")
+
+    total_cost = sum(s["cost"] or 0.0 for s in summary)
+    total_time = sum(s["total_s"] for s in summary)
+    print(f"\n💰 Coste total: ${total_cost:.3f} · ⏱️  Tiempo total en llamadas: {total_time:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,25 +15,28 @@ from pathlib import Path
 
 # Importar configuración
 from src.config.settings import (
-    validate_api_keys, DEFAULT_MODEL_ID, DEFAULT_EXT, DEFAULT_ACCEPT
+    validate_api_keys, DEFAULT_MODEL_ID, DEFAULT_EXT, DEFAULT_ACCEPT,
+    ELEVEN_MODEL_CHAR_LIMITS, ELEVEN_DEFAULT_CHAR_LIMIT, ELEVEN_PCM_FORMATS, DEFAULT_PCM_FORMAT,
+    PCM_ACCEPT
 )
 from src.config.voices import pick_voice
 
 # Importar servicios
 from src.services.elevenlabs_service import ElevenLabsService
+from src.services.api_ledger import set_ledger_context
 
 # Importar procesamiento de media
 from src.media.image_proc import parse_color
-from src.media.audio_proc import concatenate_audio_files, is_pydub_available
+from src.media.audio_proc import concatenate_audio_files, is_pydub_available, probe_audio_duration
+from src.media.tts_batch import TtsUnit, group_units_by_speaker, pending_runs, synthesize_group
+from src.media.tts_journal import TtsJournal, request_hash, write_atomic
+from src.media.pcm_store import AudioIndex, encode_pcm
 
 # Importar lógica de video
 from src.video.parser import parse_script_with_images
 from src.video.composition import parse_resolution
 from src.video.subtitles import generate_srt_subtitles
 
-# MoviePy imports
-from moviepy.editor import AudioFileClip
-
 
 def safe_basename(text: str, max_len: int = 40) -> str:
     """Genera un nombre de archivo seguro a partir de texto."""
@@ -79,9 +82,20 @@ def main():
     parser.add_argument("--model", default=DEFAULT_MODEL_ID, help="Modelo ElevenLabs")
     parser.add_argument("--ext", default=DEFAULT_EXT, help="Extensión de audio")
     parser.add_argument("--accept", default=DEFAULT_ACCEPT, help="Accept header para TTS")
+    parser.add_argument("--audio-format", choices=["mp3", "wav", "flac"], default="mp3",
+                        help="Formato de los audios TTS: mp3 (por defecto) o PCM sin pérdidas "
+                             "guardado como wav (mapeable en memoria al renderizar) o flac "
+                             "(más pequeño; se decodifica una vez a memoria al renderizar)")
+    parser.add_argument("--pcm-format", choices=sorted(ELEVEN_PCM_FORMATS), default=DEFAULT_PCM_FORMAT,
+                        help="Formato PCM pedido a ElevenLabs con --audio-format wav/flac")
     parser.add_argument("--overwrite", action="store_true", help="Sobrescribe audios existentes")
     parser.add_argument("--dry-run", action="store_true", help="Simula sin generar audios ni vídeo")
     parser.add_argument("--max-chars", type=int, default=0, help="Divide bloques largos")
+    parser.add_argument("--batch-speaker", action="store_true",
+                        help="Agrupa turnos consecutivos del mismo hablante en una sola petición TTS "
+                             "y los vuelve a cortar por turno (requiere pydub)")
+    parser.add_argument("--batch-max-chars", type=int, default=0,
+                        help="Máximo de caracteres por petición agrupada (0 = límite del modelo)")
     parser.add_argument("--video-out", type=Path, help="Ruta del mp4 final")
     parser.add_argument("--resolution", default="1920x1080", help="Resolución WxH")
     parser.add_argument("--fps", type=int, default=30, help="FPS del video")
@@ -105,9 +119,17 @@ def main():
                         help="Activa música de fondo si existe images/musica.mp3")
     parser.add_argument("--music-audio-vol", type=float, default=0.2,
                         help="Volumen de la música de fondo (0.0-1.0)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Codifica cada segmento en cuanto su audio está listo, en paralelo al TTS")
+    parser.add_argument("--render-workers", type=int, default=2,
+                        help="Segmentos codificados en paralelo en modo --pipeline")
 
     args = parser.parse_args()
 
+    lossless = args.audio_format != "mp3"
+    if lossless:
+        args.ext = f".{args.audio_format}"
+
     # Validar API keys
     try:
         validate_api_keys(["ELEVENLABS_API_KEY"])
@@ -141,56 +163,160 @@ def main():
 
     # 3. Generar audios
     print("\n🎤 Generando audios con ElevenLabs...")
+    set_ledger_context(project=Path(args.script_txt).resolve().parent.name, stage="tts")
     audio_paths = []
     audio_texts = []
     audio_speakers = []
     results = []
 
+    units = []
     for i, t in enumerate(turns, start=1):
         if t.speaker == "__CIERRE__":
             # No genera audio para bloques de cierre
             continue
 
-        voice_id, speed = pick_voice(t.speaker)
         chunks = iter_chunks(t.text, args.max_chars)
-
         for j, chunk in enumerate(chunks, start=1):
             idx_str = f"{i:03d}"
             part = "" if len(chunks) == 1 else f"-{j}"
             fname = f"{idx_str}_{t.speaker}_{safe_basename(chunk, 30)}{part}{args.ext}"
-            fpath = outdir / "audio" / fname
+            units.append(TtsUnit(block=i, speaker=t.speaker, text=chunk, path=outdir / "audio" / fname))
 
+    if args.batch_speaker:
+        batch_limit = args.batch_max_chars or ELEVEN_MODEL_CHAR_LIMITS.get(args.model, ELEVEN_DEFAULT_CHAR_LIMIT)
+        groups = group_units_by_speaker(units, batch_limit)
+        print(f"   📦 Agrupando turnos por hablante: {len(units)} clips en {len(groups)} peticiones "
+              f"(máx. {batch_limit} caracteres)")
+    else:
+        groups = [[u] for u in units]
+
+    # Journal de peticiones completadas (permite reanudar sin rehacer ni usar audios truncados)
+    journal = TtsJournal(outdir)
+    # Índice lateral de los audios sin pérdidas (frecuencia, muestras, offset de datos)
+    audio_index = AudioIndex(outdir) if lossless else None
+    output_format = args.pcm_format if lossless else None
+    accept = PCM_ACCEPT if lossless else args.accept
+    fmt_key = f"{args.audio_format}/{args.pcm_format}" if lossless else args.accept
+
+    def unit_hash(u) -> str:
+        voice_id, speed = pick_voice(u.speaker)
+        return request_hash(u.text, voice_id, args.model, speed, fmt_key)
+
+    def clip_duration(u):
+        if audio_index is None:
+            return probe_audio_duration(u.path)
+        entry = audio_index.register(u.path)
+        return entry["duration"] if entry else 0
+
+    def synthesize_single(u) -> bool:
+        voice_id, speed = pick_voice(u.speaker)
+        try:
+            audio_bytes = elevenlabs.create_speech(
+                text=u.text,
+                voice_id=voice_id,
+                model_id=args.model,
+                speed=speed,
+                accept=accept,
+                output_format=output_format
+            )
+            if lossless:
+                audio_bytes = encode_pcm(audio_bytes, ELEVEN_PCM_FORMATS[args.pcm_format], args.audio_format)
+            write_atomic(u.path, audio_bytes)
+            journal.record(u.path, unit_hash(u), clip_duration(u))
+            results.append(f"[{u.block}] OK {u.path.name} -> {u.speaker} ({turns[u.block - 1].image or 'sin imagen'})")
+            return True
+        except Exception as e:
+            results.append(f"[{u.block}] ERROR {u.path.name}: {e}")
+            return False
+        finally:
+            time.sleep(0.12)
+
+    def synthesize_all(on_ready, stop=None):
+        """
+        Sintetiza todos los grupos y llama on_ready(unit) por cada clip disponible, en orden.
+
+        Si stop (threading.Event) se activa, no se lanzan más peticiones.
+        """
+        for group in groups:
+            if stop is not None and stop.is_set():
+                break
             if args.dry_run:
-                results.append(f"[{i}] DRY-RUN {fname} -> {t.speaker}")
-                audio_paths.append(fpath)
-                audio_texts.append(chunk)
-                audio_speakers.append(t.speaker)
+                for u in group:
+                    results.append(f"[{u.block}] DRY-RUN {u.path.name} -> {u.speaker}")
+                    on_ready(u)
                 continue
 
-            if fpath.exists() and not args.overwrite:
-                results.append(f"[{i}] SKIP existe {fname}")
-                audio_paths.append(fpath)
-                audio_texts.append(chunk)
-                audio_speakers.append(t.speaker)
-                continue
+            done = set()
+            for u in group:
+                if not args.overwrite and journal.is_complete(u.path, unit_hash(u)):
+                    results.append(f"[{u.block}] SKIP existe {u.path.name}")
+                    if audio_index is not None and audio_index.get(u.path) is None:
+                        audio_index.register(u.path)
+                    done.add(u.path)
+
+            # Solo se agrupan turnos pendientes contiguos (no a través de uno ya terminado)
+            for pending in pending_runs(group, lambda u: u.path in done):
+                if stop is not None and stop.is_set():
+                    break
+                if len(pending) > 1:
+                    voice_id, speed = pick_voice(pending[0].speaker)
+                    try:
+                        method, durations = synthesize_group(elevenlabs, pending, voice_id, args.model, speed,
+                                                             output_format=output_format)
+                        for u, dur in zip(pending, durations):
+                            if audio_index is not None:
+                                audio_index.register(u.path)
+                            journal.record(u.path, unit_hash(u), dur)
+                            results.append(f"[{u.block}] OK {u.path.name} -> {u.speaker} (lote de {len(pending)}, corte por {method})")
+                            done.add(u.path)
+                        pending = []
+                    except Exception as e:
+                        results.append(f"[{pending[0].block}] AVISO lote de {len(pending)} falló ({e}); reintentando turno a turno")
+                    time.sleep(0.12)
+
+                for u in pending:
+                    if stop is not None and stop.is_set():
+                        break
+                    if synthesize_single(u):
+                        done.add(u.path)
+
+            for u in group:
+                if u.path in done:
+                    on_ready(u)
+
+        if audio_index is not None and not args.dry_run:
+            audio_index.save()
+
+    def keep(u):
+        audio_paths.append(u.path)
+        audio_texts.append(u.text)
+        audio_speakers.append(u.speaker)
+
+    # Modo tubería: el vídeo se codifica por segmentos mientras el TTS avanza
+    if args.pipeline and args.video_out is not None and not args.dry_run:
+        from src.video.pipeline import render_pipelined
+
+        print(f"\n🚚 Modo tubería: codificando segmentos en paralelo al TTS ({args.render_workers} workers)...")
+
+        def produce(on_ready, stop):
+            synthesize_all(lambda u: (keep(u), on_ready(u)), stop)
+
+        success = render_pipelined(produce, turns, args, args.images_dir.resolve(),
+                                   workers=args.render_workers, audio_index=audio_index)
+
+        for line in results:
+            print(line)
+
+        if success:
+            print(f"\n✅ Proceso completado exitosamente!")
+            print(f"📁 Audios en: {outdir}")
+            print(f"🎬 Video en: {args.video_out}")
+        else:
+            print(f"\n⚠️ Hubo errores en el renderizado del video.")
+            print(f"📁 Audios generados en: {outdir}")
+        return
 
-            try:
-                audio_bytes = elevenlabs.create_speech(
-                    text=chunk,
-                    voice_id=voice_id,
-                    model_id=args.model,
-                    speed=speed,
-                    accept=args.accept
-                )
-                fpath.write_bytes(audio_bytes)
-                results.append(f"[{i}] OK {fname} -> {t.speaker} ({t.image or 'sin imagen'})")
-                audio_paths.append(fpath)
-                audio_texts.append(chunk)
-                audio_speakers.append(t.speaker)
-            except Exception as e:
-                results.append(f"[{i}] ERROR {fname}: {e}")
-
-            time.sleep(0.12 if not args.dry_run else 0.0)
+    synthesize_all(keep)
 
     for line in results:
         print(line)
@@ -207,7 +333,7 @@ def main():
 
     print("\n🎬 Generando video...")
 
-    from src.video.renderer import render_video_from_frames
+    from src.video.renderer import render_video_from_frames, resolve_image_file, open_audio_clip
     from src.media.image_proc import parse_color
     from src.video.composition import parse_resolution
 
@@ -222,23 +348,6 @@ def main():
     current_time = 0.0
     ai = 0  # índice en audio_paths
 
-    def resolve_img_file(t_image):
-        if not t_image:
-            return None
-        cand = [images_dir / t_image]
-        if not cand[0].exists() and "." in t_image:
-            from pathlib import Path
-            stem, ext = Path(t_image).stem, Path(t_image).suffix
-            alts = [images_dir / (stem + alt) for alt in [ext, ".png", ".jpg", ".jpeg", ".webp", ".mp4", ".mov", ".m4v", ".webm"]]
-            for c in alts:
-                if c.exists():
-                    cand = [c]
-                    break
-        for c in cand:
-            if c.exists():
-                return c
-        return None
-
     for i, t in enumerate(turns, start=1):
         # Reunir partes de audio del bloque i
         parts_for_block = []
@@ -253,12 +362,12 @@ def main():
         if not parts_for_block:
             continue
 
-        img_file = resolve_img_file(t.image)
+        img_file = resolve_image_file(images_dir, t.image)
         img_key = str(img_file.resolve()) if img_file else f"COLOR:{bg_color}"
 
         # Crear frames con audio y tiempos
         for part_path, part_text, part_speaker in parts_for_block:
-            audio_clip = AudioFileClip(str(part_path))
+            audio_clip = open_audio_clip(part_path, audio_index)
             audio_refs.append(audio_clip)
             dur = audio_clip.duration + (args.pad_ms / 1000.0)
 
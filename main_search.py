@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de texto completo en los guiones de todos los proyectos.
+
+Consulta el índice invertido que crear_indice_proyectos.py mantiene junto al
+catálogo (_project_catalog.sqlite3) y muestra, por proyecto, los turnos que
+contienen las palabras buscadas con su [SPEAKER] y su [imagen:N.png]. La
+búsqueda no distingue tildes ni mayúsculas; "palabra*" busca por prefijo.
+
+Uso:
+    python main_search.py faro abandonado               # turnos con ambas palabras
+    python main_search.py "la estación" --phrase        # frase exacta
+    python main_search.py aparec* --project 123_El_Faro_v
+    python main_search.py niña --no-refresh --limit 20  # sin reindexar antes
+"""
+import argparse
+import sys
+import time
+
+import crear_indice_proyectos
+from src.content.script_index import TITLE_TURN
+from src.content.text_search import search_tokens
+
+SNIPPET_CHARS = 120
+
+
+def _snippet(text: str, positions: list, width: int = SNIPPET_CHARS) -> str:
+    """Fragmento del turno centrado en la primera coincidencia."""
+    text = " ".join(text.split())
+    if len(text) <= width:
+        return text
+    # Posición (en palabras) de la primera coincidencia -> posición en caracteres
+    words = text.split(" ")
+    target, count, offset = positions[0] if positions else 0, 0, 0
+    for word in words:
+        if count >= target:
+            break
+        count += len(search_tokens(word))
+        offset += len(word) + 1
+    start = max(0, min(offset - width // 3, len(text) - width))
+    snippet = text[start:start + width]
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca palabras o frases en los guiones de los proyectos")
+    parser.add_argument("query", nargs="+", help="Palabras a buscar (palabra* = prefijo)")
+    parser.add_argument("--phrase", action="store_true", help="Exige las palabras seguidas y en orden")
+    parser.add_argument("--project", type=str, help="Solo este proyecto")
+    parser.add_argument("--limit", type=int, default=50, help="Máximo de turnos mostrados (default: 50)")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="No actualiza el catálogo antes de buscar (más rápido)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if not args.no_refresh:
+        # Solo catálogo e índice de texto, y solo de los proyectos que han cambiado
+        changes, _ = crear_indice_proyectos.refresh_catalog()
+        if changes.changed or changes.removed:
+            print(f"🔄 Índice actualizado: {len(changes.changed)} proyectos nuevos o modificados, "
+                  f"{len(changes.removed)} eliminados")
+
+    query = " ".join(args.query)
+    index = crear_indice_proyectos.open_script_index()
+    try:
+        results = index.search(query, phrase=args.phrase, project=args.project, limit=args.limit)
+    finally:
+        index.close()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if not results:
+        print(f"ℹ️  Sin resultados para '{query}' ({elapsed_ms:.1f} ms).")
+        sys.exit(0)
+
+    current = None
+    for r in results:
+        if r["project"] != current:
+            current = r["project"]
+            print(f"\n📁 {current}")
+        image = f"[imagen:{r['image']}]" if r["image"] else "-"
+        turn = "título" if r["turn"] == TITLE_TURN else f"#{r['turn']}"
+        print(f"   {turn:<6} [{r['speaker']}] {image}  {_snippet(r['text'], r['positions'])}")
+
+    projects = len({r["project"] for r in results})
+    more = f" (límite {args.limit})" if len(results) >= args.limit else ""
+    print(f"\n🔎 {len(results)} turnos en {projects} proyectos{more} · {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -46,11 +46,108 @@ NEGATIVE_PROMPT = (
     "mutated, ugly, duplicate, out of frame, missing items, extra limbs, fused fingers)"
 )
 
+# === Concurrencia de generación de imágenes ===
+# Escenas generadas a la vez con Gemini y cuota de peticiones por minuto por API key
+GEMINI_IMAGE_CONCURRENCY = int(os.getenv("GEMINI_IMAGE_CONCURRENCY", "4"))
+GEMINI_IMAGE_RPM = int(os.getenv("GEMINI_IMAGE_RPM", "10"))
+# Inferencias de imagen simultáneas sobre la conexión de Runware
+RUNWARE_IMAGE_CONCURRENCY = int(os.getenv("RUNWARE_IMAGE_CONCURRENCY", "4"))
+# Animaciones (Seedance) simultáneas sobre la conexión de Runware
+RUNWARE_ANIMATION_CONCURRENCY = int(os.getenv("RUNWARE_ANIMATION_CONCURRENCY", "3"))
+
+# Rondas de reintento al final para escenas fallidas y espera base entre rondas (s)
+SCENE_RETRY_ROUNDS = int(os.getenv("SCENE_RETRY_ROUNDS", "2"))
+SCENE_RETRY_BACKOFF = float(os.getenv("SCENE_RETRY_BACKOFF", "15"))
+
+# Procesos dedicados al postproceso de imágenes (pixelado, paleta, etalonado, enfoque)
+IMAGE_POSTPROCESS_WORKERS = int(os.getenv("IMAGE_POSTPROCESS_WORKERS", "2"))
+
+# === Caché de imágenes generadas (compartida entre proyectos) ===
+IMAGE_CACHE_DIR = os.getenv(
+    "IMAGE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dramatizaciones", "images")
+)
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE", "1") != "0"
+# === Caché de respuestas de chat (opcional: LLM_CACHE=1 o --llm-cache) ===
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "0") == "1"
+LLM_CACHE_DIR = os.getenv(
+    "LLM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dramatizaciones", "llm")
+)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))  # segundos (0 = sin caducidad)
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+
+# Memoria de la revisión previa de seguridad de prompts (por hash del prompt)
+SAFETY_SCREEN_CACHE = os.getenv(
+    "SAFETY_SCREEN_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "dramatizaciones", "safety_screening.json")
+)
+
+# === Índice de proyectos anteriores (crear_indice_proyectos.py) ===
+# Carpeta que contiene las carpetas de proyecto (NNN_NOMBRE[_v|_mv])
+PROJECTS_ROOT = os.getenv("PROJECTS_ROOT", os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Índice BM25 de resúmenes de proyectos (lo escribe crear_indice_proyectos.py)
+PROJECT_SEARCH_INDEX = os.getenv("PROJECT_SEARCH_INDEX", os.path.join(PROJECTS_ROOT, "_project_index.json"))
+# Proyectos virales / medio virales enviados como ejemplo a la idea automática
+IDEA_EXEMPLARS_K = int(os.getenv("IDEA_EXEMPLARS_K", "12"))
+# Firmas MinHash de ideas, resúmenes y guiones (lo actualiza crear_indice_proyectos.py)
+NEAR_DUPLICATE_INDEX = os.getenv("NEAR_DUPLICATE_INDEX", os.path.join(PROJECTS_ROOT, "_project_minhash.json"))
+# Similitud (0-1) a partir de la cual una idea nueva se descarta por repetir un proyecto
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.5"))
+# Ideas candidatas pedidas en cada llamada de la idea automática
+IDEA_CANDIDATES = int(os.getenv("IDEA_CANDIDATES", "3"))
+
+# === Prompts visuales por tramos (guiones largos) ===
+# Guiones con más escenas que esto se parten en tramos que se piden en paralelo
+VISUAL_PROMPT_SHARD_SIZE = int(os.getenv("VISUAL_PROMPT_SHARD_SIZE", "12"))
+# Escenas vecinas que se envían como contexto a cada lado del tramo
+VISUAL_PROMPT_SHARD_OVERLAP = int(os.getenv("VISUAL_PROMPT_SHARD_OVERLAP", "1"))
+VISUAL_PROMPT_SHARD_WORKERS = int(os.getenv("VISUAL_PROMPT_SHARD_WORKERS", "4"))
+# Rondas de reintento solo para los tramos que fallen
+VISUAL_PROMPT_SHARD_RETRIES = int(os.getenv("VISUAL_PROMPT_SHARD_RETRIES", "2"))
+
+# === Peticiones duplicadas (hedging) entre backends de imagen ===
+# Si una escena tarda más que este percentil de latencia del backend principal,
+# se lanza la misma escena en el secundario y gana la primera que termine.
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+# Muestras mínimas antes de fiarse del histograma (mientras tanto, espera fija)
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "8"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "60"))
+# Gasto máximo (USD) en peticiones duplicadas por ejecución
+HEDGE_BUDGET_USD = float(os.getenv("HEDGE_BUDGET_USD", "0.50"))
+# Coste estimado por imagen de cada backend (USD)
+IMAGE_COST_ESTIMATES = {
+    "gemini": float(os.getenv("GEMINI_IMAGE_COST", "0.039")),
+    "runware": float(os.getenv("RUNWARE_IMAGE_COST", "0.006")),
+}
+# Histogramas de latencia por backend (persisten entre ejecuciones)
+LATENCY_STATS_PATH = os.getenv(
+    "LATENCY_STATS_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "dramatizaciones", "latency_histograms.json")
+)
+
+# === Registro de coste y latencia de las llamadas a APIs externas (SQLite) ===
+API_LEDGER_PATH = os.getenv(
+    "API_LEDGER_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "dramatizaciones", "api_ledger.sqlite3")
+)
+API_LEDGER_ENABLED = os.getenv("API_LEDGER", "1") != "0"
+# Precio de los modelos de texto (USD por millón de tokens: entrada, salida)
+LLM_PRICES_PER_MTOKEN = {
+    "gpt-5.1": (1.25, 10.0),
+}
+# Coste estimado de ElevenLabs (USD por 1000 caracteres; depende del plan)
+ELEVEN_COST_PER_1K_CHARS = float(os.getenv("ELEVEN_COST_PER_1K_CHARS", "0.30"))
+
 # Modelo de Runware económico
 QWEN_AIR_ID = "runware:108@1"
 
+# Imagen de entrada de las animaciones Seedance: se reduce a la resolución de
+# salida y se codifica una sola vez en un formato compacto ("jpeg" o "webp")
+ANIMATION_UPLOAD_FORMAT = os.getenv("ANIMATION_UPLOAD_FORMAT", "jpeg").lower()
+ANIMATION_UPLOAD_QUALITY = int(os.getenv("ANIMATION_UPLOAD_QUALITY", "90"))
+
 # === URLs de servicios ===
 ELEVEN_API_URL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+ELEVEN_API_URL_TIMESTAMPS = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/with-timestamps"
 
 # === Configuración de audio por defecto ===
 DEFAULT_MODEL_ID = "eleven_multilingual_v2"
@@ -63,6 +160,27 @@ DEFAULT_VOICE_SETTINGS = {
     "use_speaker_boost": True,
 }
 
+# Límite de caracteres por petición TTS según modelo (para agrupar turnos)
+ELEVEN_MODEL_CHAR_LIMITS = {
+    "eleven_multilingual_v2": 10000,
+    "eleven_flash_v2_5": 40000,
+    "eleven_turbo_v2_5": 40000,
+    "eleven_v3": 3000,
+}
+ELEVEN_DEFAULT_CHAR_LIMIT = 5000
+
+# Formatos PCM de ElevenLabs (output_format -> frecuencia de muestreo)
+# El audio PCM se guarda sin pérdidas como WAV (mapeable en memoria) o FLAC
+ELEVEN_PCM_FORMATS = {
+    "pcm_16000": 16000,
+    "pcm_22050": 22050,
+    "pcm_24000": 24000,
+    "pcm_44100": 44100,
+}
+DEFAULT_PCM_FORMAT = "pcm_44100"
+# Con output_format=pcm_* la respuesta no es MP3: Accept genérico
+PCM_ACCEPT = "audio/*"
+
 # === Etiquetas de metadatos ===
 META_PREFIXES = ("SFX", "AMB", "AMBIENTE", "FX", "NOTA", "MÚSICA", "MUSICA")
 IMAGE_PREFIX = "IMAGEN"
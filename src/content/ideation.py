@@ -1,7 +1,20 @@
 """
 Generación de ideas y nombres de proyectos.
 """
+from ..config.settings import (
+    PROJECT_SEARCH_INDEX,
+    IDEA_EXEMPLARS_K,
+    NEAR_DUPLICATE_INDEX,
+    NEAR_DUPLICATE_THRESHOLD,
+    IDEA_CANDIDATES
+)
+from ..config.styles import STYLE_IDEA_HINTS
 from ..services.openai_service import OpenAIService
+from .near_duplicates import NearDuplicateIndex
+from .text_search import BM25Index
+
+# Consulta por defecto cuando no hay estilo elegido
+_DEFAULT_IDEA_QUERY = "misterio terror paranormal leyenda lugar abandonado maldición desaparición"
 
 
 def generate_project_name_from_idea(idea_text: str, client: OpenAIService) -> str:
@@ -41,43 +54,151 @@ Reglas:
         return "Proyecto Sin Nombre"
 
 
-def generate_automatic_idea(client: OpenAIService, style_name: str = None) -> str:
+def select_idea_exemplars(style_name: str = None, k: int = None, index_path: str = None) -> str:
+    """
+    Elige los proyectos virales (_v) y medio virales (_mv) más afines al estilo.
+
+    Usa el índice BM25 que escribe crear_indice_proyectos.py, de modo que el
+    prompt de la idea automática tiene siempre el mismo tamaño aunque el
+    catálogo de proyectos crezca.
+
+    Args:
+        style_name: Nombre del estilo visual (su pista se usa como consulta)
+        k: Número de ejemplos (None = IDEA_EXEMPLARS_K)
+        index_path: Ruta del índice (None = PROJECT_SEARCH_INDEX)
+
+    Returns:
+        Bloque de texto con una línea "NOMBRE: resumen" por ejemplo, o cadena
+        vacía si el índice no existe
+    """
+    index = BM25Index.load(index_path or PROJECT_SEARCH_INDEX)
+    if not index:
+        return ""
+
+    query = _DEFAULT_IDEA_QUERY
+    if style_name:
+        query = f"{style_name} {STYLE_IDEA_HINTS.get(style_name, '')}"
+
+    k = k or IDEA_EXEMPLARS_K
+    is_viral = lambda meta: meta.get("tier") in ("v", "mv")
+    hits = index.search(query, k=k, where=is_viral)
+    if not hits:
+        # Ningún proyecto viral comparte palabras con el estilo: primero los _v, sin orden por afinidad
+        viral = sorted((doc["meta"]["tier"] != "v", name, doc["meta"])
+                       for name, doc in index.docs.items() if is_viral(doc["meta"]))
+        hits = [(0.0, name, meta) for _, name, meta in viral[:k]]
+    if not hits:
+        return ""
+
+    lines = {"v": [], "mv": []}
+    for _, name, meta in hits:
+        lines[meta["tier"]].append(f"{name}: {meta.get('summary', '')}")
+
+    blocks = []
+    if lines["v"]:
+        blocks.append("🔥 PROYECTOS VIRALES (_v):\n" + "\n".join(lines["v"]))
+    if lines["mv"]:
+        blocks.append("🌪️ PROYECTOS MEDIO VIRALES (_mv):\n" + "\n".join(lines["mv"]))
+    print(f"📚 {len(hits)} proyectos de referencia elegidos del índice ({len(index)} indexados)")
+    return "\n\n".join(blocks)
+
+
+def find_near_duplicate_projects(idea: str, index: NearDuplicateIndex = None, threshold: float = None) -> list:
+    """
+    Comprueba en local si una idea repite un proyecto anterior.
+
+    Args:
+        idea: Texto de la idea
+        index: Índice MinHash ya cargado (None = se carga NEAR_DUPLICATE_INDEX)
+        threshold: Similitud mínima (None = NEAR_DUPLICATE_THRESHOLD)
+
+    Returns:
+        Lista de (similitud, proyecto, tipo de documento); vacía si la idea es nueva
+        o si no hay índice
+    """
+    if index is None:
+        index = NearDuplicateIndex.load(NEAR_DUPLICATE_INDEX)
+    return index.find_similar(idea, NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold)
+
+
+def generate_automatic_idea(client: OpenAIService, style_name: str = None, max_calls: int = 2) -> str:
     """
     Genera automáticamente una idea para un proyecto de terror/misterio.
 
+    Cada llamada pide IDEA_CANDIDATES ideas; las que se parecen demasiado a un
+    proyecto anterior (índice MinHash) se descartan en local antes de seguir.
+
     Args:
         client: Cliente de OpenAI
         style_name: Nombre del estilo visual (opcional, para adaptar la idea)
+        max_calls: Llamadas máximas si todas las candidatas están repetidas
 
     Returns:
-        Texto con la idea generada
+        Texto con la idea generada, o None si todas las candidatas repiten
+        proyectos anteriores (nunca se devuelve una idea casi duplicada)
     """
     # Implementación completa en create_project.py líneas 1790-1950
     # Por simplicidad, aquí una versión básica:
 
-    system_prompt = """
+    system_prompt = f"""
 Eres un generador de ideas para historias cortas de terror, misterio y suspenso.
-Genera una idea original y concisa (2-3 frases) para una dramatización de audio.
+Genera {IDEA_CANDIDATES} ideas originales y concisas (2-3 frases cada una), distintas
+entre sí, para una dramatización de audio.
 
 Requisitos:
 - Debe ser atmosférica y visual
 - Un solo protagonista claro
 - Situación intrigante o inquietante
 - Ambientación específica y evocadora
+
+Responde con JSON:
+{{
+  "ideas": ["idea 1", "idea 2", ...]
+}}
 """
 
     if style_name:
         system_prompt += f"\n\nAdapta la idea al estilo visual: {style_name}"
 
-    try:
-        response = client.chat_completion(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": "Genera una idea original de terror/misterio"}
-            ],
-            model="gpt-5.1"
+    user_prompt = "Genera una idea original de terror/misterio"
+    exemplars = select_idea_exemplars(style_name)
+    if exemplars:
+        user_prompt = (
+            "Proyectos anteriores con más éxito (inspírate en sus patrones, sin repetir temas):\n\n"
+            f"{exemplars}\n\n{user_prompt}"
         )
-        return response.strip()
+
+    duplicates_index = NearDuplicateIndex.load(NEAR_DUPLICATE_INDEX)
+    rejected = 0
+    try:
+        for _ in range(max(1, max_calls)):
+            response = client.chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                model="gpt-5.1",
+                response_format={"type": "json_object"},
+                use_cache=False  # cada ejecución debe proponer una idea nueva
+            )
+            candidates = [idea.strip() for idea in response.get("ideas", []) if isinstance(idea, str) and idea.strip()]
+
+            for idea in candidates:
+                matches = find_near_duplicate_projects(idea, duplicates_index)
+                if not matches:
+                    return idea
+                similarity, project, kind = matches[0]
+                print(f"⚠️ Idea descartada: se parece a {project} ({kind}, similitud {similarity:.2f})")
+                rejected += 1
+
+        if rejected:
+            print("❌ Todas las ideas candidatas se parecen a proyectos anteriores.")
+            return None
     except Exception as e:
         print(f"Error al generar idea automática: {e}")
-        return "Un investigador encuentra un objeto misterioso que cambia su percepción de la realidad."
+
+    fallback = "Un investigador encuentra un objeto misterioso que cambia su percepción de la realidad."
+    if find_near_duplicate_projects(fallback, duplicates_index):
+        print("❌ La idea por defecto también repite un proyecto anterior.")
+        return None
+    return fallback
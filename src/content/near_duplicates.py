@@ -0,0 +1,225 @@
+"""
+Detección local de ideas casi duplicadas (MinHash + LSH).
+
+Cada proyecto anterior aporta su idea, su resumen y su guion (troceado en
+ventanas de tamaño parecido al de una idea, para que una idea repetida dentro
+de un guion largo siga siendo detectable), reducidos a firmas MinHash de sus
+bigramas de palabras. Las firmas se
+reparten en bandas LSH: una idea candidata solo se compara con los documentos
+que comparten alguna banda, sin recorrer el catálogo entero ni llamar a
+ningún modelo. El índice se guarda en JSON y crear_indice_proyectos.py lo
+actualiza solo para los proyectos que han cambiado.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+
+from .text_search import search_tokens
+
+_PRIME = (1 << 61) - 1
+# Semilla fija: las firmas guardadas deben seguir siendo comparables entre ejecuciones
+_SEED = 20240611
+# Palabras (sin palabras vacías) por ventana del guion
+SCRIPT_WINDOW = 80
+
+
+def shingles(text: str, size: int = 2) -> set:
+    """
+    Conjunto de n-gramas de palabras (sin tildes ni palabras vacías).
+
+    Args:
+        text: Texto
+        size: Palabras por n-grama
+
+    Returns:
+        Conjunto de n-gramas (str); con menos palabras que size, las palabras sueltas
+    """
+    return _token_shingles(search_tokens(text, drop_stopwords=True), size)
+
+
+def _token_shingles(tokens: list, size: int = 2) -> set:
+    if len(tokens) < size:
+        return set(tokens)
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class NearDuplicateIndex:
+    """Índice MinHash/LSH de ideas, resúmenes y guiones de proyectos."""
+
+    def __init__(self, num_perm: int = 128, bands: int = 64):
+        """
+        Args:
+            num_perm: Longitud de la firma MinHash
+            bands: Bandas LSH (num_perm debe ser múltiplo); más bandas
+                detectan parecidos más débiles a costa de más candidatos
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) debe ser múltiplo de bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(_SEED)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.docs = {}      # "proyecto#tipo" -> {"project", "kind", "size", "sig"}
+        self.stamps = {}    # proyecto -> huella de sus archivos (para el índice incremental)
+        self._buckets = {}  # (banda, valores) -> {doc_key}
+
+    def signature(self, shingle_set: set) -> list:
+        """
+        Firma MinHash de un conjunto de n-gramas.
+
+        Returns:
+            Lista de num_perm enteros, o None si el conjunto está vacío
+        """
+        if not shingle_set:
+            return None
+        hashes = [_hash64(s) for s in shingle_set]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _bands_of(self, sig: list):
+        for band in range(self.bands):
+            yield band, tuple(sig[band * self.rows:(band + 1) * self.rows])
+
+    def _add_doc(self, key: str, project: str, kind: str, shingle_set: set) -> None:
+        sig = self.signature(shingle_set)
+        if sig is None:
+            return
+        self.docs[key] = {"project": project, "kind": kind, "size": len(shingle_set), "sig": sig}
+        for band in self._bands_of(sig):
+            self._buckets.setdefault(band, set()).add(key)
+
+    def remove_project(self, project: str) -> None:
+        """Quita del índice todos los documentos de un proyecto."""
+        self.stamps.pop(project, None)
+        for key in [k for k, doc in self.docs.items() if doc["project"] == project]:
+            for band in self._bands_of(self.docs[key]["sig"]):
+                bucket = self._buckets.get(band)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[band]
+            del self.docs[key]
+
+    def update_project(self, project: str, stamp: str, idea: str = "", summary: str = "", script: str = "") -> bool:
+        """
+        Indexa (o reindexa) un proyecto si su huella ha cambiado.
+
+        Args:
+            project: Nombre de la carpeta del proyecto
+            stamp: Huella (str) de sus archivos (fecha de modificación, hash...);
+                si coincide con la guardada no se recalcula nada
+            idea: Idea original (metadata.json), si existe
+            summary: Resumen (primera línea del guion)
+            script: Texto completo del guion
+
+        Returns:
+            True si el proyecto se ha (re)indexado
+        """
+        if self.stamps.get(project) == stamp:
+            return False
+        self.remove_project(project)
+        for kind, text in (("idea", idea), ("resumen", summary)):
+            if text:
+                self._add_doc(f"{project}#{kind}", project, kind, shingles(text))
+        # Las etiquetas [NARRADOR], [imagen:N.png]... se repiten en todos los guiones
+        tokens = search_tokens(re.sub(r"\[[^\]]*\]", " ", script or ""), drop_stopwords=True)
+        for n, start in enumerate(range(0, len(tokens), SCRIPT_WINDOW)):
+            # Cada ventana arranca con la última palabra de la anterior: no se pierde ningún bigrama
+            window = tokens[max(0, start - 1):start + SCRIPT_WINDOW]
+            self._add_doc(f"{project}#guion{n}", project, "guion", _token_shingles(window))
+        self.stamps[project] = stamp
+        return True
+
+    def prune(self, projects) -> int:
+        """
+        Quita los proyectos que ya no existen.
+
+        Args:
+            projects: Nombres de los proyectos que siguen existiendo
+
+        Returns:
+            Número de proyectos eliminados
+        """
+        gone = set(self.stamps) - set(projects)
+        for project in gone:
+            self.remove_project(project)
+        return len(gone)
+
+    def find_similar(self, text: str, threshold: float = 0.5) -> list:
+        """
+        Busca proyectos parecidos a un texto (p.ej. una idea candidata).
+
+        La similitud es el máximo entre la Jaccard estimada y la fracción del
+        texto contenida en el documento (una idea corta frente a un guion largo
+        apenas comparte Jaccard aunque lo repita literalmente).
+
+        Args:
+            text: Texto a comprobar
+            threshold: Similitud mínima (0-1) para devolver un proyecto
+
+        Returns:
+            Lista de (similitud, proyecto, tipo de documento) de mayor a menor,
+            como mucho una entrada por proyecto
+        """
+        shingle_set = shingles(text)
+        sig = self.signature(shingle_set)
+        if sig is None:
+            return []
+
+        candidates = set()
+        for band in self._bands_of(sig):
+            candidates |= self._buckets.get(band, set())
+
+        best = {}
+        for key in candidates:
+            doc = self.docs[key]
+            jaccard = sum(1 for x, y in zip(sig, doc["sig"]) if x == y) / self.num_perm
+            # |A∩B| = J·(|A|+|B|)/(1+J)  →  contención de A (el texto) en B
+            containment = min(1.0, jaccard * (len(shingle_set) + doc["size"]) / ((1 + jaccard) * len(shingle_set)))
+            similarity = max(jaccard, containment)
+            if similarity >= threshold and similarity > best.get(doc["project"], (0.0,))[0]:
+                best[doc["project"]] = (similarity, doc["kind"])
+
+        return sorted(((sim, project, kind) for project, (sim, kind) in best.items()), reverse=True)
+
+    def save(self, path: str) -> None:
+        """Guarda el índice en JSON (escritura atómica)."""
+        data = {"num_perm": self.num_perm, "bands": self.bands, "seed": _SEED,
+                "stamps": self.stamps, "docs": self.docs}
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, num_perm: int = 128, bands: int = 64):
+        """
+        Carga un índice guardado con save().
+
+        Si el archivo no existe, no es válido o se guardó con otra
+        configuración de firmas, se devuelve un índice vacío (se reconstruye).
+
+        Returns:
+            NearDuplicateIndex
+        """
+        index = cls(num_perm, bands)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return index
+        if (data.get("num_perm"), data.get("bands"), data.get("seed")) != (num_perm, bands, _SEED):
+            return index
+
+        index.stamps = data.get("stamps", {})
+        index.docs = data.get("docs", {})
+        for key, doc in index.docs.items():
+            for band in index._bands_of(doc["sig"]):
+                index._buckets.setdefault(band, set()).add(key)
+        return index
@@ -0,0 +1,220 @@
+"""
+Catálogo persistente de proyectos (SQLite).
+
+Guarda por cada carpeta NNN_NOMBRE[_v|_mv] su número, categoría, resumen, idea
+y la huella de sus archivos (fechas de modificación y hash del guion). Al
+refrescarlo solo se vuelven a leer los proyectos cuya carpeta, guion o
+metadata.json han cambiado, y el siguiente número de proyecto es una consulta
+sobre una columna indexada.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    number INTEGER,
+    tier TEXT,
+    dir_mtime_ns INTEGER,
+    script_name TEXT,
+    script_mtime_ns INTEGER,
+    script_size INTEGER,
+    script_sha1 TEXT,
+    meta_mtime_ns INTEGER,
+    summary TEXT,
+    idea TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS projects_number ON projects(number);
+"""
+
+_COLUMNS = ("name", "number", "tier", "dir_mtime_ns", "script_name", "script_mtime_ns", "script_size",
+            "script_sha1", "meta_mtime_ns", "summary", "idea", "indexed_at")
+
+PROJECT_DIR_RE = re.compile(r"^(\d+)_")
+
+
+def project_tier(name: str) -> str:
+    """Categoría del proyecto por su sufijo: "v" (viral), "mv" (medio viral) o ""."""
+    if name.endswith("_v"):
+        return "v"
+    if name.endswith("_mv"):
+        return "mv"
+    return ""
+
+
+def first_summary_line(script_text: str) -> str:
+    """Primera línea de contenido real de un guion (sin etiquetas [SPEAKER]/[imagen])."""
+    for line in script_text.splitlines():
+        line = line.strip()
+        if not line or (line.startswith("[") and line.endswith("]")):
+            continue
+        return line
+    return "No se encontró texto de resumen."
+
+
+def _mtime_ns(path: Path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_idea(meta_path: Path) -> str:
+    try:
+        with meta_path.open("r", encoding="utf-8") as f:
+            return json.load(f).get("idea", "") or ""
+    except (OSError, ValueError, AttributeError):
+        return ""
+
+
+@dataclass
+class CatalogChanges:
+    """Resultado de ProjectCatalog.refresh()."""
+    added: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> list:
+        return self.added + self.updated
+
+
+class ProjectCatalog:
+    """Catálogo SQLite de las carpetas de proyecto."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ruta de la base SQLite
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def refresh(self, root: Path, on_change=None) -> CatalogChanges:
+        """
+        Sincroniza el catálogo con las carpetas de proyecto de root.
+
+        Un proyecto sin cambios cuesta tres stat (carpeta, guion y
+        metadata.json); solo los nuevos o modificados se leen y se hashean.
+
+        Args:
+            root: Carpeta que contiene los proyectos
+            on_change: Callback opcional on_change(fila, texto del guion) para
+                cada proyecto nuevo o modificado (índices derivados)
+
+        Returns:
+            CatalogChanges con los proyectos añadidos, actualizados y eliminados
+        """
+        root = Path(root)
+        changes = CatalogChanges()
+        known = {row["name"]: dict(row) for row in self._select("SELECT * FROM projects")}
+        seen = set()
+
+        for folder in root.iterdir():
+            match = PROJECT_DIR_RE.match(folder.name)
+            if not match or not folder.is_dir():
+                continue
+            name = folder.name
+            seen.add(name)
+            old = known.get(name)
+            meta_path = folder / "metadata.json"
+
+            dir_mtime = _mtime_ns(folder)
+            meta_mtime = _mtime_ns(meta_path)
+            if old is not None and old["dir_mtime_ns"] == dir_mtime and old["meta_mtime_ns"] == meta_mtime:
+                # La carpeta no ha cambiado de contenido: basta con mirar el guion conocido
+                if old["script_name"] is None or _mtime_ns(folder / old["script_name"]) == old["script_mtime_ns"]:
+                    changes.unchanged += 1
+                    continue
+
+            script_path = next(iter(sorted(folder.glob("texto*.txt"))), None)
+            row = {
+                "name": name, "number": int(match.group(1)), "tier": project_tier(name),
+                "dir_mtime_ns": dir_mtime, "script_name": None, "script_mtime_ns": None,
+                "script_size": None, "script_sha1": None, "meta_mtime_ns": meta_mtime,
+                "summary": None, "idea": _read_idea(meta_path), "indexed_at": time.time(),
+            }
+            script_text = ""
+            if script_path is not None:
+                try:
+                    data = script_path.read_bytes()
+                    st = script_path.stat()
+                    script_text = data.decode("utf-8", errors="replace")
+                    row.update(script_name=script_path.name, script_mtime_ns=st.st_mtime_ns,
+                               script_size=st.st_size, script_sha1=hashlib.sha1(data).hexdigest(),
+                               summary=first_summary_line(script_text))
+                except OSError as e:
+                    row["summary"] = f"ERROR al leer el archivo: {e}"
+
+            self._upsert(row)
+            if old is not None and old["script_sha1"] == row["script_sha1"] and old["idea"] == row["idea"]:
+                # Solo cambió la fecha (p.ej. se añadieron imágenes): el contenido es el mismo
+                changes.unchanged += 1
+                continue
+            (changes.updated if old is not None else changes.added).append(name)
+            if on_change is not None:
+                on_change(row, script_text)
+
+        changes.removed = sorted(set(known) - seen)
+        if changes.removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM projects WHERE name = ?", [(n,) for n in changes.removed])
+                self._conn.commit()
+        return changes
+
+    def _upsert(self, row: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO projects ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(row[col] for col in _COLUMNS)
+            )
+            self._conn.commit()
+
+    def _select(self, query: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def projects(self, tier: str = None) -> list:
+        """
+        Proyectos del catálogo ordenados por número.
+
+        Args:
+            tier: Filtra por categoría ("v", "mv" o "")
+
+        Returns:
+            Lista de dicts con las columnas del catálogo
+        """
+        if tier is None:
+            rows = self._select("SELECT * FROM projects ORDER BY number, name")
+        else:
+            rows = self._select("SELECT * FROM projects WHERE tier = ? ORDER BY number, name", (tier,))
+        return [dict(row) for row in rows]
+
+    def get(self, name: str):
+        """Fila de un proyecto (dict) o None."""
+        rows = self._select("SELECT * FROM projects WHERE name = ?", (name,))
+        return dict(rows[0]) if rows else None
+
+    def next_number(self) -> int:
+        """Siguiente número de proyecto libre (consulta sobre el índice de number)."""
+        rows = self._select("SELECT MAX(number) FROM projects")
+        return (rows[0][0] or 0) + 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,221 @@
+"""
+Índice invertido de texto completo sobre los guiones de todos los proyectos.
+
+Cada guion se parte en turnos con el mismo parser que usa el render
+([SPEAKER], [imagen:N.png] persistente) y cada turno se tokeniza con
+search_tokens (sin tildes ni mayúsculas). El texto anterior al primer
+[SPEAKER] (título o resumen), que el render ignora, se indexa como un turno
+propio (TITLE_TURN). Las apariciones se guardan en
+SQLite, junto al catálogo de proyectos, y se actualizan solo para los
+proyectos que cambian. Una búsqueda resuelve proyecto, turno e imagen sin
+abrir ningún texto.txt.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+from ..video.parser import _normalize_speaker, parse_script_text
+from .project_catalog import PROJECT_DIR_RE
+from .text_search import SPANISH_STOPWORDS, search_tokens
+
+# Turno y speaker del texto anterior al primer [SPEAKER]
+TITLE_TURN = -1
+TITLE_SPEAKER = "TITULO"
+
+# Versión del formato indexado: si cambia, el índice se vacía y se reconstruye
+_INDEX_VERSION = "2"
+
+_TAG_RE = re.compile(r"^\s*\[(.+?)\]\s*$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS script_turns (
+    project TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    speaker TEXT,
+    image TEXT,
+    text TEXT,
+    PRIMARY KEY (project, turn)
+);
+CREATE TABLE IF NOT EXISTS script_postings (
+    token TEXT NOT NULL,
+    project TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    pos INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS script_postings_token ON script_postings(token);
+CREATE INDEX IF NOT EXISTS script_postings_project ON script_postings(project);
+CREATE TABLE IF NOT EXISTS script_index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def script_preamble(script_text: str) -> str:
+    """Texto anterior a la primera etiqueta [SPEAKER] del guion (sin etiquetas de imagen o meta)."""
+    lines = []
+    for raw in (script_text or "").splitlines():
+        match = _TAG_RE.match(raw)
+        if match:
+            if _normalize_speaker(match.group(1)):
+                break
+            continue
+        lines.append(raw)
+    return "\n".join(lines).strip()
+
+
+def _result_order(key: tuple) -> tuple:
+    """Orden de resultados: número de proyecto y turno."""
+    match = PROJECT_DIR_RE.match(key[0])
+    return (int(match.group(1)) if match else 0, key[0], key[1])
+
+
+class ScriptIndex:
+    """Índice invertido (token -> proyecto, turno, posición) de los guiones."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ruta de la base SQLite (la del catálogo de proyectos)
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute("SELECT value FROM script_index_meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != _INDEX_VERSION:
+            # Formato anterior: los proyectos que falten se reindexan al refrescar el catálogo
+            self._conn.execute("DELETE FROM script_turns")
+            self._conn.execute("DELETE FROM script_postings")
+            self._conn.execute("INSERT OR REPLACE INTO script_index_meta VALUES ('version', ?)", (_INDEX_VERSION,))
+        self._conn.commit()
+
+    def update_project(self, project: str, script_text: str) -> int:
+        """
+        Reindexa un proyecto (borra sus entradas anteriores).
+
+        Args:
+            project: Nombre de la carpeta del proyecto
+            script_text: Texto completo del guion
+
+        Returns:
+            Número de turnos indexados
+        """
+        turns = [(turn.index, turn.speaker, turn.image, turn.text)
+                 for turn in parse_script_text(script_text or "") if turn.speaker != "__CIERRE__"]
+        preamble = script_preamble(script_text)
+        if preamble:
+            turns.insert(0, (TITLE_TURN, TITLE_SPEAKER, None, preamble))
+
+        turn_rows, postings = [], []
+        for index, speaker, image, text in turns:
+            turn_rows.append((project, index, speaker, image, text))
+            postings.extend((token, project, index, pos) for pos, token in enumerate(search_tokens(text)))
+
+        with self._lock:
+            self._conn.execute("DELETE FROM script_turns WHERE project = ?", (project,))
+            self._conn.execute("DELETE FROM script_postings WHERE project = ?", (project,))
+            self._conn.executemany("INSERT INTO script_turns VALUES (?, ?, ?, ?, ?)", turn_rows)
+            self._conn.executemany("INSERT INTO script_postings VALUES (?, ?, ?, ?)", postings)
+            self._conn.commit()
+        return len(turn_rows)
+
+    def remove_projects(self, projects: list) -> None:
+        """Quita del índice los proyectos indicados."""
+        params = [(p,) for p in projects]
+        with self._lock:
+            self._conn.executemany("DELETE FROM script_turns WHERE project = ?", params)
+            self._conn.executemany("DELETE FROM script_postings WHERE project = ?", params)
+            self._conn.commit()
+
+    def projects(self) -> set:
+        """Proyectos presentes en el índice."""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT project FROM script_turns")}
+
+    def _postings(self, token: str, project: str = None) -> dict:
+        """(proyecto, turno) -> posiciones de un token; "token*" busca por prefijo."""
+        if token.endswith("*"):
+            prefix = token[:-1]
+            query = "SELECT project, turn, pos FROM script_postings WHERE token >= ? AND token < ?"
+            params = [prefix, prefix + "\uffff"]
+        else:
+            query = "SELECT project, turn, pos FROM script_postings WHERE token = ?"
+            params = [token]
+        if project:
+            query += " AND project = ?"
+            params.append(project)
+
+        found = {}
+        with self._lock:
+            for proj, turn, pos in self._conn.execute(query, params):
+                found.setdefault((proj, turn), set()).add(pos)
+        return found
+
+    def search(self, query: str, phrase: bool = False, project: str = None, limit: int = 50) -> list:
+        """
+        Busca turnos que contengan todas las palabras de la consulta.
+
+        La consulta se tokeniza igual que los guiones, así que "Estación"
+        encuentra "estacion". Una palabra terminada en * busca por prefijo.
+
+        Args:
+            query: Palabras a buscar
+            phrase: Exige que aparezcan seguidas y en ese orden
+            project: Limita la búsqueda a un proyecto
+            limit: Máximo de turnos devueltos
+
+        Returns:
+            Lista de dicts (project, turn, speaker, image, text, positions)
+            ordenada por número de proyecto y turno
+        """
+        terms = []
+        for word in query.split():
+            wildcard = word.endswith("*")
+            for token in search_tokens(word):
+                terms.append(token + "*" if wildcard else token)
+        if not terms:
+            return []
+        if not phrase:
+            # Sin frase, las palabras vacías solo estorban (salvo que no haya otras)
+            terms = [t for t in terms if t.rstrip("*") not in SPANISH_STOPWORDS] or terms
+
+        # Se intersecta empezando por el término más raro
+        postings = [self._postings(term, project) for term in terms]
+        if phrase:
+            order = list(range(len(terms)))
+        else:
+            order = sorted(range(len(terms)), key=lambda i: len(postings[i]))
+        matches = dict(postings[order[0]])
+        for i in order[1:]:
+            matches = {key: pos for key, pos in matches.items() if key in postings[i]}
+            if not matches:
+                return []
+
+        if phrase:
+            phrase_matches = {}
+            for key, starts in matches.items():
+                hits = {p for p in starts if all(p + i in postings[i][key] for i in range(1, len(terms)))}
+                if hits:
+                    phrase_matches[key] = hits
+            matches = phrase_matches
+        else:
+            matches = {key: set().union(*(postings[i][key] for i in range(len(terms)))) for key in matches}
+
+        results = []
+        with self._lock:
+            for proj, turn in sorted(matches, key=_result_order)[:limit]:
+                row = self._conn.execute(
+                    "SELECT speaker, image, text FROM script_turns WHERE project = ? AND turn = ?", (proj, turn)
+                ).fetchone()
+                if row is None:
+                    continue
+                results.append({"project": proj, "turn": turn, "speaker": row[0], "image": row[1],
+                                "text": row[2], "positions": sorted(matches[(proj, turn)])})
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
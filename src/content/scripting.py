@@ -1,10 +1,23 @@
 """
 Generación de guiones y prompts visuales.
 """
+import hashlib
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from ..config.settings import (
+    SAFETY_SCREEN_CACHE,
+    VISUAL_PROMPT_SHARD_SIZE,
+    VISUAL_PROMPT_SHARD_OVERLAP,
+    VISUAL_PROMPT_SHARD_WORKERS,
+    VISUAL_PROMPT_SHARD_RETRIES
+)
+from ..services.api_ledger import ledger_stage
 from ..services.openai_service import OpenAIService
 
+_SCENE_TAG_RE = re.compile(r'\[imagen:(\d+)\.png\]')
+
 
 def generate_creative_content(idea: str, client: OpenAIService) -> dict:
     """
@@ -60,10 +73,41 @@ El social_post debe:
         return None
 
 
+def _visual_prompts_messages(script_text: str, num_scenes: int) -> list:
+    """Mensajes de la petición de prompts visuales (comunes a la versión en streaming)."""
+    system_prompt = f"""
+Eres Director de Arte y Fotografía.
+Genera {num_scenes} prompts visuales cinematográficos, uno por cada escena [imagen:X.png].
+
+Responde con JSON:
+{{
+  "visual_prompts": ["prompt 1", "prompt 2", ...]
+}}
+
+Cada prompt: 300-600 caracteres, muy cinematográfico y detallado.
+"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Guion:\n\n{script_text}"}
+    ]
+
+
+def _prompt_count_validator(expected: int):
+    """Validador de caché: la respuesta trae exactamente expected prompts no vacíos."""
+    def validate(content) -> bool:
+        prompts = content.get("visual_prompts") if isinstance(content, dict) else None
+        return (isinstance(prompts, list) and len(prompts) == expected
+                and all(isinstance(p, str) and p.strip() for p in prompts))
+    return validate
+
+
 def generate_visual_prompts_for_script(script_text: str, client: OpenAIService) -> list:
     """
     Analiza un guion y genera prompts visuales cinematográficos para cada escena.
 
+    Con más de VISUAL_PROMPT_SHARD_SIZE escenas el guion se reparte en tramos
+    (ver generate_visual_prompts_sharded).
+
     Args:
         script_text: Texto completo del guion
         client: Cliente de OpenAI
@@ -74,16 +118,63 @@ def generate_visual_prompts_for_script(script_text: str, client: OpenAIService)
     # Ver implementación completa en create_project.py líneas 201-329
 
     # Contar cuántas imágenes necesitamos
-    scene_tags = re.findall(r'\[imagen:(\d+)\.png\]', script_text)
-    num_scenes = len(scene_tags)
+    num_scenes = len(_SCENE_TAG_RE.findall(script_text))
 
     if num_scenes == 0:
         print("No se encontraron etiquetas [imagen:X.png]")
         return []
 
+    if num_scenes > VISUAL_PROMPT_SHARD_SIZE > 0:
+        return generate_visual_prompts_sharded(script_text, client)
+
+    try:
+        content = client.chat_completion(
+            messages=_visual_prompts_messages(script_text, num_scenes),
+            model="gpt-5.1",
+            response_format={"type": "json_object"},
+            # Una respuesta cacheada con otro número de prompts se descarta y se pide de nuevo
+            validate=_prompt_count_validator(num_scenes)
+        )
+
+        prompts_list = content.get("visual_prompts", [])
+
+        if len(prompts_list) != num_scenes:
+            print(f"Error: se generaron {len(prompts_list)} prompts, esperados {num_scenes}")
+            return []
+
+        return prompts_list
+    except Exception as e:
+        print(f"Error al generar prompts visuales: {e}")
+        return []
+
+
+def _split_script_scenes(script_text: str) -> tuple:
+    """
+    Parte el guion por sus etiquetas [imagen:X.png].
+
+    Returns:
+        (cabecera previa a la primera etiqueta, lista con el texto de cada escena
+        empezando por su etiqueta)
+    """
+    starts = [m.start() for m in _SCENE_TAG_RE.finditer(script_text)]
+    if not starts:
+        return script_text, []
+    bounds = starts[1:] + [len(script_text)]
+    return script_text[:starts[0]].strip(), [script_text[a:b].strip() for a, b in zip(starts, bounds)]
+
+
+def _visual_prompts_shard_messages(header: str, scenes: list, start: int, end: int, overlap: int) -> list:
+    """Mensajes de la petición de prompts visuales para las escenas [start, end) del guion."""
+    before = scenes[max(0, start - overlap):start]
+    after = scenes[end:end + overlap]
+    count = end - start
+
     system_prompt = f"""
 Eres Director de Arte y Fotografía.
-Genera {num_scenes} prompts visuales cinematográficos, uno por cada escena [imagen:X.png].
+Recibes un tramo de un guion largo. Genera {count} prompts visuales cinematográficos,
+uno por cada escena de la sección ESCENAS ({start + 1} a {end} del guion), en orden.
+Las secciones CONTEXTO son escenas vecinas: úsalas solo para mantener la continuidad,
+no generes prompts para ellas.
 
 Responde con JSON:
 {{
@@ -91,28 +182,323 @@ Responde con JSON:
 }}
 
 Cada prompt: 300-600 caracteres, muy cinematográfico y detallado.
+"""
+    parts = []
+    if header:
+        parts.append(f"CABECERA DEL GUION:\n{header}")
+    if before:
+        parts.append("CONTEXTO (escenas anteriores):\n" + "\n".join(before))
+    parts.append(f"ESCENAS ({count}):\n" + "\n".join(scenes[start:end]))
+    if after:
+        parts.append("CONTEXTO (escenas siguientes):\n" + "\n".join(after))
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": "\n\n".join(parts)}
+    ]
+
+
+def generate_visual_prompts_sharded(script_text: str, client: OpenAIService, shard_size: int = None,
+                                    overlap: int = None, max_workers: int = None) -> list:
+    """
+    Genera los prompts visuales de un guion largo por tramos de escenas.
+
+    Cada tramo se pide por separado (en paralelo) con sus escenas vecinas como
+    contexto, y se valida por su cuenta: si un tramo no devuelve exactamente
+    sus prompts, solo ese tramo se vuelve a pedir.
+
+    Args:
+        script_text: Texto completo del guion
+        client: Cliente de OpenAI
+        shard_size: Escenas por tramo (None = VISUAL_PROMPT_SHARD_SIZE)
+        overlap: Escenas de contexto a cada lado (None = VISUAL_PROMPT_SHARD_OVERLAP)
+        max_workers: Tramos simultáneos (None = VISUAL_PROMPT_SHARD_WORKERS)
+
+    Returns:
+        Lista de prompts visuales (uno por cada [imagen:X.png]), o [] si algún
+        tramo sigue fallando tras los reintentos
+    """
+    shard_size = max(1, shard_size or VISUAL_PROMPT_SHARD_SIZE)
+    overlap = VISUAL_PROMPT_SHARD_OVERLAP if overlap is None else max(0, overlap)
+    max_workers = max(1, max_workers or VISUAL_PROMPT_SHARD_WORKERS)
+
+    header, scenes = _split_script_scenes(script_text)
+    if not scenes:
+        print("No se encontraron etiquetas [imagen:X.png]")
+        return []
+
+    shards = [(start, min(start + shard_size, len(scenes))) for start in range(0, len(scenes), shard_size)]
+    print(f"🧩 Guion largo ({len(scenes)} escenas): prompts visuales en {len(shards)} tramos de hasta {shard_size}")
+
+    results = {}
+
+    def run_shard(shard, use_cache):
+        start, end = shard
+        with ledger_stage("prompts_visuales"):
+            try:
+                content = client.chat_completion(
+                    messages=_visual_prompts_shard_messages(header, scenes, start, end, overlap),
+                    model="gpt-5.1",
+                    response_format={"type": "json_object"},
+                    # En un reintento no sirve la misma respuesta cacheada
+                    use_cache=use_cache,
+                    validate=_prompt_count_validator(end - start)
+                )
+            except Exception as e:
+                print(f"   ⚠️ Tramo {start + 1}-{end}: error en la llamada: {e}")
+                return shard
+        prompts = content.get("visual_prompts", []) if isinstance(content, dict) else []
+        if len(prompts) != end - start or not all(isinstance(p, str) and p.strip() for p in prompts):
+            print(f"   ⚠️ Tramo {start + 1}-{end}: {len(prompts)} prompts, esperados {end - start}")
+            return shard
+        results[start] = prompts
+        return None
+
+    pending = shards
+    for round_no in range(VISUAL_PROMPT_SHARD_RETRIES + 1):
+        if not pending:
+            break
+        if round_no:
+            print(f"   🔁 Reintentando {len(pending)} tramo(s) (ronda {round_no}/{VISUAL_PROMPT_SHARD_RETRIES})")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            outcome = executor.map(lambda shard: run_shard(shard, use_cache=round_no == 0), pending)
+            pending = [shard for shard in outcome if shard is not None]
+
+    if pending:
+        failed = ", ".join(f"{start + 1}-{end}" for start, end in pending)
+        print(f"Error: no se pudieron generar los prompts de los tramos {failed}")
+        return []
+
+    return [prompt for start, _ in shards for prompt in results[start]]
+
+
+def iter_json_string_array(chunks, key: str):
+    """
+    Extrae, según llegan, los strings del array JSON "key" de una respuesta en streaming.
+
+    Cada elemento se devuelve en cuanto su literal se cierra, sin esperar al
+    resto del documento. Solo reconoce arrays de strings (como visual_prompts).
+
+    Args:
+        chunks: Iterable de fragmentos de texto de la respuesta
+        key: Clave del array (ej: "visual_prompts")
+
+    Yields:
+        Cada string del array, ya decodificado
+    """
+    opener = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    buffer = ""
+    pos = 0             # siguiente carácter sin examinar
+    in_array = False
+    start = None        # inicio del literal abierto (comilla incluida)
+    escaped = False
+
+    for chunk in chunks:
+        buffer += chunk
+        if not in_array:
+            match = opener.search(buffer)
+            if not match:
+                continue
+            in_array = True
+            pos = match.end()
+
+        while pos < len(buffer):
+            ch = buffer[pos]
+            if start is None:
+                if ch == '"':
+                    start = pos
+                elif ch == "]":
+                    return
+            elif escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                yield json.loads(buffer[start:pos + 1])
+                # Se descarta lo ya consumido para no reexaminarlo
+                buffer = buffer[pos + 1:]
+                pos = -1
+                start = None
+            pos += 1
+
+
+def stream_visual_prompts_for_script(script_text: str, client: OpenAIService):
+    """
+    Versión en streaming de generate_visual_prompts_for_script.
+
+    Devuelve cada prompt en cuanto el modelo termina de escribirlo, de modo que
+    la generación de imágenes puede empezar con la primera escena mientras se
+    escriben las demás. Usa la misma petición (y la misma caché) que la versión
+    no streaming.
+
+    Args:
+        script_text: Texto completo del guion
+        client: Cliente de OpenAI
+
+    Yields:
+        (índice de escena, prompt visual), en orden; como máximo una por [imagen:X.png]
+    """
+    num_scenes = len(_SCENE_TAG_RE.findall(script_text))
+
+    if num_scenes == 0:
+        print("No se encontraron etiquetas [imagen:X.png]")
+        return
+
+    count = 0
+    try:
+        chunks = client.chat_completion_stream(
+            messages=_visual_prompts_messages(script_text, num_scenes),
+            model="gpt-5.1",
+            response_format={"type": "json_object"},
+            validate=_prompt_count_validator(num_scenes)
+        )
+        for prompt in iter_json_string_array(chunks, "visual_prompts"):
+            if count >= num_scenes:
+                print(f"⚠️ Se ignoran los prompts sobrantes (esperados {num_scenes})")
+                break
+            yield count, prompt
+            count += 1
+    except Exception as e:
+        print(f"Error al generar prompts visuales en streaming: {e}")
+
+    if count < num_scenes:
+        print(f"⚠️ Llegaron {count} prompts, esperados {num_scenes}")
+
+
+_BRIEF_KEYS = ("character", "environment", "lighting", "objects")
+
+# Esquema estricto de la respuesta de generate_project_content
+PROJECT_CONTENT_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "script": {"type": "string"},
+        "social_post": {"type": "string"},
+        "visual_prompts": {"type": "array", "items": {"type": "string"}},
+        "brief": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {key: {"type": "string"} for key in _BRIEF_KEYS},
+            "required": list(_BRIEF_KEYS),
+        },
+    },
+    "required": ["script", "social_post", "visual_prompts", "brief"],
+}
+
+
+def validate_project_content(content: dict) -> list:
+    """
+    Comprueba localmente la respuesta consolidada.
+
+    Args:
+        content: Dict con script, social_post, visual_prompts y brief
+
+    Returns:
+        Lista de problemas encontrados (vacía si es válida)
+    """
+    problems = []
+    script = content.get("script") or ""
+    scene_tags = re.findall(r'\[imagen:(\d+)\.png\]', script)
+    prompts = content.get("visual_prompts") or []
+
+    if not scene_tags:
+        problems.append("el guion no tiene etiquetas [imagen:X.png]")
+    elif len(set(scene_tags)) != len(scene_tags):
+        problems.append("el guion repite números de imagen")
+    if len(prompts) != len(scene_tags):
+        problems.append(f"{len(prompts)} prompts visuales para {len(scene_tags)} escenas")
+    if any(not str(p).strip() for p in prompts):
+        problems.append("hay prompts visuales vacíos")
+    if not content.get("social_post"):
+        problems.append("falta el post para redes")
+    if not isinstance(content.get("brief"), dict):
+        problems.append("falta el brief de consistencia")
+    return problems
+
+
+def _project_content_ok(content) -> bool:
+    """Validador de caché de generate_project_content."""
+    if not isinstance(content, dict):
+        return False
+    script = (content.get("script") or "").replace(".mp4", ".png")
+    return not validate_project_content({**content, "script": script})
+
+
+def generate_project_content(idea: str, client: OpenAIService, model_type: str = "gemini") -> dict:
+    """
+    Genera en una sola llamada guion, post, prompts visuales y brief de consistencia.
+
+    Sustituye a generate_creative_content + generate_visual_prompts_for_script +
+    extract_visual_consistency_brief: el guion no se reenvía dos veces. La
+    respuesta se valida con un esquema JSON estricto y después localmente (un
+    prompt por escena). Si solo fallan los prompts, se piden aparte a partir
+    del guion ya generado.
+
+    Args:
+        idea: Texto con la idea del proyecto
+        client: Cliente de OpenAI
+        model_type: "gemini" (brief detallado) o "qwen" (brief compacto)
+
+    Returns:
+        Dict con "script", "social_post", "visual_prompts" y "brief", o None si falla
+    """
+    brief_rules = (
+        "Brief compacto (límite de tokens): 'character' muy específico (edad, género, rasgos, "
+        "pelo, ropa FIJA con colores exactos); el resto, frases cortas."
+        if model_type == "qwen" else
+        "Brief MUY CONCRETO: personaje principal, escenario recurrente, iluminación/paleta "
+        "y objetos que deban mantenerse. Una sola versión de cada cosa, sin alternativas."
+    )
+
+    system_prompt = f"""
+Eres guionista experto en misterio y terror y, a la vez, director de arte.
+A partir de la idea genera, en un único JSON:
+
+1. "script": el guion.
+   - Entre 8 y 14 bloques, cada bloque de máximo 15 palabras
+   - Formato: [SPEAKER]\n[imagen:X.png]\nTEXTO\n (X empieza en 1 y no se repite)
+   - Terminar con [CIERRE]
+   - Un solo protagonista principal
+2. "social_post": máximo 300 caracteres, incluye #RelatosExtraordinarios.
+3. "visual_prompts": EXACTAMENTE un prompt por cada [imagen:X.png], en el mismo orden.
+   - 300-600 caracteres, muy cinematográfico y detallado
+   - Si el protagonista aparece en la escena, escribe literalmente [PROTAGONISTA] para referirte a él
+4. "brief": {{"character", "environment", "lighting", "objects"}} para mantener la consistencia visual.
+   - {brief_rules}
+   - Si el guion está en primera persona, esa voz es el personaje principal.
 """
 
     try:
         content = client.chat_completion(
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Guion:\n\n{script_text}"}
+                {"role": "user", "content": f"Idea: {idea}"}
             ],
             model="gpt-5.1",
-            response_format={"type": "json_object"}
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "project_content", "strict": True, "schema": PROJECT_CONTENT_SCHEMA},
+            },
+            # Una respuesta incompleta no se cachea (ni se sirve desde la caché)
+            validate=_project_content_ok
         )
+    except Exception as e:
+        print(f"Error al generar el contenido consolidado: {e}")
+        return None
 
-        prompts_list = content.get("visual_prompts", [])
+    # Garantizar que las imágenes se mantengan en PNG
+    content["script"] = (content.get("script") or "").replace(".mp4", ".png")
 
-        if len(prompts_list) != num_scenes:
-            print(f"Error: se generaron {len(prompts_list)} prompts, esperados {num_scenes}")
-            return []
+    problems = validate_project_content(content)
+    if problems:
+        print(f"⚠️ Respuesta consolidada incompleta: {'; '.join(problems)}")
+        if not re.search(r'\[imagen:\d+\.png\]', content["script"]):
+            return None
+        # El guion es utilizable: solo se repiten los prompts visuales
+        print("   ↻ Pidiendo de nuevo solo los prompts visuales a partir del guion generado...")
+        content["visual_prompts"] = generate_visual_prompts_for_script(content["script"], client)
 
-        return prompts_list
-    except Exception as e:
-        print(f"Error al generar prompts visuales: {e}")
-        return []
+    return content
 
 
 def rewrite_prompt_for_safety(prompt_text: str, client: OpenAIService) -> str:
@@ -145,3 +531,102 @@ Responde solo con el prompt reformulado.
     except Exception as e:
         print(f"Error al reescribir prompt: {e}")
         return prompt_text
+
+
+def _load_safety_memo(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_safety_memo(path: str, memo: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(memo, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"   ⚠️ No se pudo guardar la caché de revisión de seguridad: {e}")
+
+
+def screen_visual_prompts_for_safety(prompts: list, client: OpenAIService,
+                                     memo_path: str = None) -> list:
+    """
+    Revisa de antemano todos los prompts visuales y reescribe los arriesgados.
+
+    Envía en una sola llamada los prompts que aún no se han revisado; el
+    resultado se memoriza por hash del prompt, así que en una nueva ejecución
+    no se repite la llamada. Evita la mayoría de rondas bloqueo → reescritura
+    → reintento durante la generación de imágenes.
+
+    Args:
+        prompts: Prompts visuales (uno por escena)
+        client: Cliente de OpenAI
+        memo_path: Archivo JSON de memoria (None = SAFETY_SCREEN_CACHE)
+
+    Returns:
+        Lista de prompts del mismo tamaño, con los arriesgados ya reescritos
+    """
+    memo_path = memo_path or SAFETY_SCREEN_CACHE
+    memo = _load_safety_memo(memo_path)
+    keys = [hashlib.sha1(p.encode("utf-8")).hexdigest() for p in prompts]
+
+    pending = [i for i, k in enumerate(keys) if k not in memo and prompts[i].strip()]
+    if pending:
+        system_prompt = """
+Eres un revisor de prompts para generadores de imágenes con filtros de seguridad estrictos.
+Para cada prompt indica si es probable que sea bloqueado (violencia explícita, sangre,
+sufrimiento, cadáveres, autolesiones, contenido sexual o de menores en peligro).
+Si el riesgo es alto, reescríbelo con lenguaje neutro y seguro conservando la escena,
+la composición y el tono de misterio. Si es bajo, devuélvelo sin cambios.
+
+Responde con JSON:
+{
+  "results": [{"index": 1, "risk": "bajo" | "alto", "prompt": "..."}, ...]
+}
+"""
+        numbered = "\n\n".join(f"{n}. {prompts[i]}" for n, i in enumerate(pending, start=1))
+        try:
+            content = client.chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Prompts:\n\n{numbered}"}
+                ],
+                model="gpt-5.1",
+                response_format={"type": "json_object"}
+            )
+            for item in content.get("results", []):
+                try:
+                    n = int(item["index"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if not 1 <= n <= len(pending):
+                    continue
+                i = pending[n - 1]
+                rewritten = (item.get("prompt") or "").strip()
+                risky = str(item.get("risk", "")).lower().startswith("alt")
+                memo[keys[i]] = {
+                    "risk": "alto" if risky else "bajo",
+                    "prompt": rewritten if risky and rewritten else prompts[i],
+                }
+            _save_safety_memo(memo_path, memo)
+        except Exception as e:
+            print(f"   ⚠️ Revisión de seguridad previa no disponible ({e}); se usarán los prompts originales")
+
+    screened = []
+    rewritten_count = 0
+    for prompt, key in zip(prompts, keys):
+        entry = memo.get(key)
+        if entry and entry.get("risk") == "alto":
+            screened.append(entry["prompt"])
+            rewritten_count += 1
+        else:
+            screened.append(prompt)
+
+    cached = len(prompts) - len(pending)
+    print(f"   🛡️  Revisión de seguridad: {rewritten_count} prompt(s) reescritos "
+          f"({cached} ya revisados en ejecuciones anteriores)")
+    return screened
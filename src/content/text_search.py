@@ -0,0 +1,174 @@
+"""
+Búsqueda local sobre los textos de los proyectos.
+
+La tokenización parte de _tokenize_words (la misma que reparte los tiempos de
+los subtítulos) y normaliza cada palabra: minúsculas, sin puntuación y sin
+tildes (la ñ se conserva). Sobre ella, BM25Index ordena proyectos por
+relevancia para una consulta sin llamar a ningún modelo.
+"""
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+from ..video.subtitles import _tokenize_words
+
+# Palabras vacías del español que no aportan relevancia
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aquel aquella aquellas aquellos aqui asi
+aun cada como con contra cual cuando de del desde donde dos el ella ellas ello ellos en entre era
+eran es esa esas ese eso esos esta estaba estan estas este esto estos fue fueron ha habia han hasta
+hay la las le les lo los mas me mi mis mucho muy nada ni no nos nosotros o otra otras otro otros
+para pero poco por porque que quien se sea ser si sin sobre solo son su sus tambien tan te tiene
+todo todos tras tu un una unas uno unos y ya yo
+""".split())
+
+_NON_VISIBLE_RE = re.compile(r"[^\wáéíóúüñÁÉÍÓÚÜÑ0-9]", flags=re.U)
+_TILDE = "\u0303"  # virgulilla combinante (ñ = n + virgulilla)
+
+
+def normalize_word(word: str) -> str:
+    """
+    Normaliza una palabra para búsqueda: sin puntuación, minúsculas y sin tildes.
+
+    Args:
+        word: Palabra tal como sale de _tokenize_words (puede llevar puntuación)
+
+    Returns:
+        Palabra normalizada (vacía si solo era puntuación)
+    """
+    visible = _NON_VISIBLE_RE.sub("", word).lower()
+    decomposed = unicodedata.normalize("NFD", visible)
+    # Se quitan tildes y diéresis, pero la ñ (n + virgulilla) se mantiene
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch) or ch == _TILDE)
+    return unicodedata.normalize("NFC", stripped).replace("_", "")
+
+
+def search_tokens(text: str, drop_stopwords: bool = False) -> list:
+    """
+    Tokeniza un texto para búsqueda (insensible a tildes y mayúsculas).
+
+    Args:
+        text: Texto a tokenizar
+        drop_stopwords: Descarta las palabras vacías (SPANISH_STOPWORDS)
+
+    Returns:
+        Lista de tokens normalizados, en orden
+    """
+    tokens = []
+    for word in _tokenize_words(text or ""):
+        # "casa-cueva" o "sí/no" cuentan como palabras separadas
+        for part in re.split(r"[-/]", word):
+            token = normalize_word(part)
+            if token and not (drop_stopwords and token in SPANISH_STOPWORDS):
+                tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Índice BM25 en memoria, serializable a JSON."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            k1: Saturación de la frecuencia del término
+            b: Peso de la normalización por longitud del documento
+        """
+        self.k1 = k1
+        self.b = b
+        self.docs = {}   # doc_id -> {"tf": {token: n}, "len": n, "meta": {...}}
+        self.df = Counter()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc_id: str, text: str, **meta) -> None:
+        """
+        Añade (o reemplaza) un documento.
+
+        Args:
+            doc_id: Identificador (ej: nombre de la carpeta del proyecto)
+            text: Texto indexado
+            **meta: Datos que se devuelven con cada resultado (resumen, categoría...)
+        """
+        self.remove(doc_id)
+        tf = Counter(search_tokens(text, drop_stopwords=True))
+        self.docs[doc_id] = {"tf": dict(tf), "len": sum(tf.values()), "meta": meta}
+        self.df.update(tf.keys())
+
+    def remove(self, doc_id: str) -> None:
+        """Quita un documento del índice (si estaba)."""
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for token in doc["tf"]:
+            self.df[token] -= 1
+            if self.df[token] <= 0:
+                del self.df[token]
+
+    def search(self, query: str, k: int = 10, where=None) -> list:
+        """
+        Devuelve los k documentos más relevantes para la consulta.
+
+        Args:
+            query: Texto de la consulta
+            k: Número máximo de resultados
+            where: Filtro opcional where(meta) -> bool
+
+        Returns:
+            Lista de (puntuación, doc_id, meta) de mayor a menor puntuación; los
+            documentos sin ningún término de la consulta no se devuelven
+        """
+        candidates = [(doc_id, doc) for doc_id, doc in self.docs.items() if where is None or where(doc["meta"])]
+        if not candidates:
+            return []
+
+        n_docs = len(self.docs)
+        avg_len = sum(doc["len"] for doc in self.docs.values()) / n_docs or 1.0
+        terms = set(search_tokens(query, drop_stopwords=True))
+
+        results = []
+        for doc_id, doc in candidates:
+            score = 0.0
+            for term in terms:
+                freq = doc["tf"].get(term)
+                if not freq:
+                    continue
+                idf = math.log(1 + (n_docs - self.df[term] + 0.5) / (self.df[term] + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc["len"] / avg_len)
+                score += idf * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                results.append((score, doc_id, doc["meta"]))
+
+        results.sort(key=lambda r: (-r[0], r[1]))
+        return results[:k]
+
+    def save(self, path: str) -> None:
+        """Guarda el índice en JSON (escritura atómica)."""
+        data = {"k1": self.k1, "b": self.b, "docs": self.docs}
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Carga un índice guardado con save().
+
+        Returns:
+            BM25Index, o None si el archivo no existe o no es válido
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        index = cls(data.get("k1", 1.5), data.get("b", 0.75))
+        index.docs = data.get("docs", {})
+        for doc in index.docs.values():
+            index.df.update(doc["tf"].keys())
+        return index
@@ -44,6 +44,97 @@ def concatenate_audio_files(file_paths: list, silence_ms: int = 250, output_path
     return full_audio
 
 
+def probe_audio_duration(path) -> float | None:
+    """
+    Mide la duración de un archivo de audio decodificándolo.
+
+    Args:
+        path: Ruta del archivo
+
+    Returns:
+        Duración en segundos, 0 si el archivo está corrupto/vacío,
+        o None si pydub no está disponible para comprobarlo
+    """
+    if not PYDUB_AVAILABLE:
+        return None
+    try:
+        return len(AudioSegment.from_file(path)) / 1000.0
+    except Exception:
+        return 0
+
+
 def is_pydub_available() -> bool:
     """Verifica si pydub está disponible."""
     return PYDUB_AVAILABLE
+
+
+def find_silence_cut_points(segment, expected_cuts: list, min_silence_ms: int = 120,
+                            threshold_db: float = -40.0, window_ms: int = 10) -> list:
+    """
+    Ajusta puntos de corte esperados al centro del silencio más cercano.
+
+    Calcula el RMS por ventanas con NumPy, detecta tramos por debajo del umbral
+    (relativo al pico) y mueve cada corte esperado al silencio más próximo.
+    Si no hay silencio cerca, conserva el corte esperado.
+
+    Args:
+        segment: AudioSegment a analizar
+        expected_cuts: Cortes estimados en segundos (ordenados)
+        min_silence_ms: Duración mínima de un silencio válido
+        threshold_db: Umbral en dBFS relativo al pico de la señal
+        window_ms: Tamaño de ventana para el RMS
+
+    Returns:
+        Lista de cortes en segundos, misma longitud que expected_cuts
+    """
+    import numpy as np
+
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+
+    win = max(1, int(segment.frame_rate * window_ms / 1000))
+    n_win = len(samples) // win
+    if n_win == 0:
+        return list(expected_cuts)
+
+    frames = samples[:n_win * win].reshape(n_win, win)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    peak = float(rms.max()) or 1.0
+    db = 20 * np.log10(np.maximum(rms, 1e-9) / peak)
+    silent = db < threshold_db
+
+    # Tramos contiguos de ventanas silenciosas -> centros en segundos
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    min_windows = max(1, min_silence_ms // window_ms)
+    centers = [
+        ((s + e) / 2.0) * window_ms / 1000.0
+        for s, e in zip(starts, ends) if (e - s) >= min_windows
+    ]
+    if not centers:
+        return list(expected_cuts)
+
+    centers = np.array(centers)
+    tolerance = 1.5  # segundos máximos de desviación respecto a la estimación
+    cuts = []
+    for expected in expected_cuts:
+        nearest = float(centers[np.argmin(np.abs(centers - expected))])
+        cuts.append(nearest if abs(nearest - expected) <= tolerance else expected)
+    return cuts
+
+
+def split_audio_segment(segment, cut_points: list) -> list:
+    """
+    Corta un AudioSegment en trozos consecutivos.
+
+    Args:
+        segment: AudioSegment completo
+        cut_points: Puntos de corte en segundos (ordenados, sin incluir 0 ni el final)
+
+    Returns:
+        Lista de AudioSegment (len(cut_points) + 1 trozos)
+    """
+    bounds_ms = [0] + [int(round(c * 1000)) for c in cut_points] + [len(segment)]
+    return [segment[a:b] for a, b in zip(bounds_ms, bounds_ms[1:])]
@@ -0,0 +1,101 @@
+"""
+Almacén de imágenes generadas direccionado por contenido.
+
+La clave es un hash del prompt final enviado al modelo más todos los
+parámetros que afectan al resultado (modelo, tamaño, CFG/steps, semilla y
+postproceso). Si una escena se vuelve a generar con el mismo prompt, la imagen
+se copia desde el almacén en lugar de pagar otra llamada a la API.
+
+Se copia y no se enlaza: varias etapas (pixelado, guardado con PIL) reescriben
+images/N.png en el sitio, y con un enlace duro corromperían la entrada
+compartida por otros proyectos.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from ..config.settings import IMAGE_CACHE_DIR, IMAGE_CACHE_ENABLED
+
+
+def image_cache_key(prompt: str, model: str, **params) -> str:
+    """
+    Calcula la clave de caché de una imagen.
+
+    Args:
+        prompt: Prompt final exactamente como se envía al modelo
+        model: Identificador del modelo
+        **params: Resto de parámetros que afectan a la imagen
+            (width, height, aspect_ratio, cfg_scale, steps, seed, postprocess...)
+
+    Returns:
+        Hash SHA-256 en hexadecimal
+    """
+    key = json.dumps({"prompt": prompt, "model": model, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Almacén de imágenes compartido entre proyectos y ejecuciones."""
+
+    def __init__(self, root: str = None, enabled: bool = None):
+        """
+        Args:
+            root: Directorio del almacén (None = IMAGE_CACHE_DIR)
+            enabled: Activa/desactiva la caché (None = IMAGE_CACHE_ENABLED)
+        """
+        self.root = Path(root or IMAGE_CACHE_DIR)
+        self.enabled = IMAGE_CACHE_ENABLED if enabled is None else enabled
+
+    def _path_for(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def fetch(self, key: str, dest_path: str) -> bool:
+        """
+        Copia la imagen cacheada en dest_path si existe.
+
+        Args:
+            key: Clave de caché
+            dest_path: Ruta de destino (ej: images/3.png)
+
+        Returns:
+            True si había acierto y la imagen quedó en dest_path
+        """
+        if not self.enabled:
+            return False
+
+        cached = self._path_for(key, Path(dest_path).suffix)
+        if not cached.exists():
+            return False
+
+        tmp = f"{dest_path}.part"
+        try:
+            shutil.copy2(cached, tmp)
+            os.replace(tmp, dest_path)
+            return True
+        except OSError as e:
+            print(f"   ⚠️ No se pudo usar la imagen cacheada ({e}); se generará de nuevo")
+            return False
+
+    def store(self, key: str, src_path: str) -> None:
+        """
+        Guarda una copia de la imagen final en el almacén.
+
+        Args:
+            key: Clave de caché
+            src_path: Imagen ya generada y postprocesada
+        """
+        if not self.enabled:
+            return
+
+        cached = self._path_for(key, Path(src_path).suffix)
+        if cached.exists():
+            return
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_name(cached.name + ".part")
+            shutil.copy2(src_path, tmp)
+            os.replace(tmp, cached)
+        except OSError as e:
+            print(f"   ⚠️ No se pudo guardar la imagen en la caché: {e}")
@@ -1,40 +1,97 @@
 """
 Procesamiento de imágenes: pixelización, resize, conversiones de color.
+
+Los efectos de postproceso trabajan sobre arrays NumPy (alto, ancho, 3) en
+uint8 y se encadenan en memoria; la imagen solo se codifica una vez al final
+(ver src/media/postprocess.py).
 """
+import numpy as np
 from PIL import Image
 
 
+def pixelize_array(arr: np.ndarray, small_edge: int = 256) -> np.ndarray:
+    """
+    Pixelado retro: media por bloques y ampliación por repetición (NEAREST).
+
+    Args:
+        arr: Imagen RGB (alto, ancho, 3) uint8
+        small_edge: Tamaño aproximado del borde pequeño tras reducir
+            (256 suave; 192/160/128 más "chunky")
+
+    Returns:
+        Imagen pixelada del mismo tamaño
+    """
+    h, w = arr.shape[:2]
+    block = max(1, int(round(min(h, w) / float(small_edge))))
+    if block == 1:
+        return arr
+
+    padded = np.pad(arr, ((0, -h % block), (0, -w % block), (0, 0)), mode="edge")
+    ph, pw = padded.shape[:2]
+    small = padded.reshape(ph // block, block, pw // block, block, -1).mean(axis=(1, 3))
+    up = np.repeat(np.repeat(small, block, axis=0), block, axis=1)[:h, :w]
+    return np.rint(up).astype(np.uint8)
+
+
+def quantize_array(arr: np.ndarray, colors: int = 48) -> np.ndarray:
+    """
+    Reduce la imagen a una paleta adaptativa limitada.
+
+    Args:
+        arr: Imagen RGB (alto, ancho, 3) uint8
+        colors: Número de colores de la paleta
+
+    Returns:
+        Imagen cuantizada
+    """
+    im = Image.fromarray(arr, "RGB").convert("P", palette=Image.ADAPTIVE, colors=colors)
+    return np.asarray(im.convert("RGB"))
+
+
+# Efectos disponibles para el postproceso: nombre -> función(array, **params)
+EFFECTS = {
+    "pixelize": pixelize_array,
+    "quantize": quantize_array,
+}
+
+
+def apply_effects(arr: np.ndarray, steps: list) -> np.ndarray:
+    """
+    Aplica en orden una cadena de efectos sobre la imagen en memoria.
+
+    Args:
+        arr: Imagen RGB (alto, ancho, 3) uint8
+        steps: Lista de (nombre del efecto, dict de parámetros)
+
+    Returns:
+        Imagen procesada
+
+    Raises:
+        ValueError: Si algún efecto no existe
+    """
+    for name, params in steps:
+        effect = EFFECTS.get(name)
+        if effect is None:
+            raise ValueError(f"Efecto de postproceso desconocido: {name}")
+        arr = effect(arr, **(params or {}))
+    return arr
+
+
 def pixelize_image(path: str, small_edge: int = 256):
     """
     Aplica efecto de pixelado estilo retro a una imagen.
 
-    Downscale fuerte y upscale con NEAREST para píxel gordo retro.
-    Ajusta small_edge: 256 (suave), 192/160/128 (más "chunky").
+    Pixelado por bloques más paleta adaptativa de 48 colores, sobre el
+    archivo ya guardado. Ajusta small_edge: 256 (suave), 192/160/128 (más "chunky").
 
     Args:
         path: Ruta a la imagen
         small_edge: Tamaño del borde pequeño para el downscale
     """
     try:
-        im = Image.open(path).convert("RGBA")
-        w, h = im.size
-
-        if w < h:
-            new_w = small_edge
-            new_h = int(h * (small_edge / w))
-        else:
-            new_h = small_edge
-            new_w = int(w * (small_edge / h))
-
-        small = im.resize((max(1, new_w), max(1, new_h)), Image.BILINEAR)
-        up = small.resize((w, h), Image.NEAREST)
-
-        try:
-            up = up.convert("P", palette=Image.ADAPTIVE, colors=48).convert("RGBA")
-        except Exception:
-            pass
-
-        up.save(path)
+        arr = np.asarray(Image.open(path).convert("RGB"))
+        arr = apply_effects(arr, [("pixelize", {"small_edge": small_edge}), ("quantize", {"colors": 48})])
+        Image.fromarray(arr, "RGB").save(path)
     except Exception as e:
         print(f"  (postproceso pixelize falló: {e})")
 
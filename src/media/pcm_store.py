@@ -0,0 +1,267 @@
+"""
+Almacenamiento sin pérdidas de los audios TTS (PCM de ElevenLabs -> WAV/FLAC).
+
+Los audios se guardan como WAV (PCM 16 bits) o FLAC y se describen en un
+índice lateral Out/audio_index.json (frecuencia, canales, muestras y, para
+WAV, el offset de los datos). Así el renderizador puede mapear las muestras
+de un WAV en memoria sin decodificar MP3 ni pasar por los lectores de FFmpeg;
+un FLAC se decodifica una sola vez a memoria y se sirve por el mismo camino.
+"""
+import io
+import json
+import os
+import struct
+import threading
+import wave
+from pathlib import Path
+from typing import Optional
+
+from .audio_proc import AudioSegment, is_pydub_available
+
+AUDIO_INDEX_FILENAME = "audio_index.json"
+
+# ElevenLabs devuelve PCM lineal 16 bits little-endian, mono
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+LOSSLESS_FORMATS = ("wav", "flac")
+
+
+def pcm_to_wav_bytes(pcm: bytes, sample_rate: int, channels: int = PCM_CHANNELS,
+                     sample_width: int = PCM_SAMPLE_WIDTH) -> bytes:
+    """
+    Envuelve muestras PCM crudas en un contenedor WAV.
+
+    Args:
+        pcm: Muestras PCM sin cabecera
+        sample_rate: Frecuencia de muestreo en Hz
+        channels: Número de canales
+        sample_width: Bytes por muestra
+
+    Returns:
+        Bytes del archivo WAV
+    """
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def encode_pcm(pcm: bytes, sample_rate: int, fmt: str) -> bytes:
+    """
+    Codifica PCM crudo al formato de almacenamiento.
+
+    Args:
+        pcm: Muestras PCM 16 bits mono
+        sample_rate: Frecuencia de muestreo en Hz
+        fmt: "wav" o "flac"
+
+    Returns:
+        Bytes del archivo codificado
+
+    Raises:
+        ImportError: Si se pide FLAC y pydub no está instalado
+        ValueError: Si el formato no es soportado
+    """
+    if fmt == "wav":
+        return pcm_to_wav_bytes(pcm, sample_rate)
+    if fmt == "flac":
+        if not is_pydub_available():
+            raise ImportError("pydub no está instalado. Ejecuta: pip install pydub")
+        segment = AudioSegment(data=pcm, sample_width=PCM_SAMPLE_WIDTH,
+                               frame_rate=sample_rate, channels=PCM_CHANNELS)
+        buf = io.BytesIO()
+        segment.export(buf, format="flac")
+        return buf.getvalue()
+    raise ValueError(f"Formato sin pérdidas no soportado: {fmt}")
+
+
+def _wav_info(path: Path) -> Optional[dict]:
+    """Lee la cabecera RIFF y devuelve parámetros y offset del chunk 'data'."""
+    with path.open("rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        info = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            cid, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if cid == b"fmt ":
+                fmt = f.read(size)
+                _, channels, rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+                info.update(channels=channels, sample_rate=rate, sample_width=bits // 8)
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif cid == b"data":
+                if "sample_rate" not in info:
+                    return None
+                info["data_offset"] = f.tell()
+                available = path.stat().st_size - info["data_offset"]
+                info["frames"] = min(size, available) // (info["channels"] * info["sample_width"])
+                return info
+            else:
+                f.seek(size + (size % 2), os.SEEK_CUR)
+
+
+def _flac_info(path: Path) -> Optional[dict]:
+    """Lee el bloque STREAMINFO de un FLAC (frecuencia, canales y total de muestras)."""
+    with path.open("rb") as f:
+        head = f.read(4 + 4 + 34)
+    if len(head) < 42 or head[:4] != b"fLaC" or (head[4] & 0x7F) != 0:
+        return None
+    bits = int.from_bytes(head[18:26], "big")
+    sample_rate = bits >> 44
+    channels = ((bits >> 41) & 0x7) + 1
+    bits_per_sample = ((bits >> 36) & 0x1F) + 1
+    frames = bits & 0xFFFFFFFFF
+    return {
+        "channels": channels,
+        "sample_rate": sample_rate,
+        "sample_width": (bits_per_sample + 7) // 8,
+        "frames": frames,
+    }
+
+
+def probe_lossless(path: Path) -> Optional[dict]:
+    """
+    Obtiene los parámetros de un WAV/FLAC leyendo solo su cabecera.
+
+    Args:
+        path: Ruta del archivo
+
+    Returns:
+        Dict con format, sample_rate, channels, sample_width, frames, duration
+        (y data_offset en WAV), o None si no es un WAV/FLAC válido
+    """
+    fmt = path.suffix.lower().lstrip(".")
+    if fmt not in LOSSLESS_FORMATS or not path.exists():
+        return None
+    info = _wav_info(path) if fmt == "wav" else _flac_info(path)
+    if not info or not info["sample_rate"]:
+        return None
+    info["format"] = fmt
+    info["duration"] = info["frames"] / float(info["sample_rate"])
+    return info
+
+
+def load_pcm_memmap(path: Path, entry: dict):
+    """
+    Mapea en memoria las muestras de un WAV PCM 16 bits.
+
+    Args:
+        path: Ruta del WAV
+        entry: Entrada del índice (data_offset, frames, channels)
+
+    Returns:
+        np.memmap de forma (frames, channels) y tipo int16
+    """
+    import numpy as np
+
+    return np.memmap(str(path), dtype="<i2", mode="r", offset=entry["data_offset"],
+                     shape=(entry["frames"], entry["channels"]))
+
+
+def load_pcm_samples(path: Path, entry: dict):
+    """
+    Devuelve las muestras PCM 16 bits de un audio del índice.
+
+    Los WAV se mapean en memoria; los FLAC se decodifican una vez (con pydub)
+    a un array en memoria, sin lector de FFmpeg abierto durante el render.
+
+    Args:
+        path: Ruta del WAV/FLAC
+        entry: Entrada del índice (format, frames, channels, data_offset en WAV)
+
+    Returns:
+        Array de forma (frames, channels) y tipo int16, o None si no se puede
+        obtener (FLAC sin pydub, o muestras que no coinciden con el índice)
+    """
+    import numpy as np
+
+    if entry.get("format") == "wav":
+        return load_pcm_memmap(path, entry)
+    if entry.get("format") != "flac" or not is_pydub_available():
+        return None
+    try:
+        segment = AudioSegment.from_file(str(path), format="flac")
+    except Exception:
+        return None
+    if segment.sample_width != PCM_SAMPLE_WIDTH or segment.channels != entry["channels"]:
+        return None
+    samples = np.frombuffer(segment.raw_data, dtype="<i2").reshape(-1, entry["channels"])
+    if len(samples) != entry["frames"]:
+        return None
+    return samples
+
+
+class AudioIndex:
+    """
+    Índice lateral con los parámetros de cada audio sin pérdidas.
+
+    Es seguro usarlo desde varios hilos (en modo tubería el TTS registra
+    audios mientras el renderizador los consulta).
+    """
+
+    def __init__(self, outdir: Path):
+        """
+        Carga el índice existente (si lo hay).
+
+        Args:
+            outdir: Directorio de salida del render (Out/)
+        """
+        self.path = Path(outdir) / AUDIO_INDEX_FILENAME
+        self.entries = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                self.entries = {}
+
+    def register(self, path: Path) -> Optional[dict]:
+        """
+        Añade (o actualiza) la entrada de un audio ya escrito.
+
+        Args:
+            path: Ruta del WAV/FLAC
+
+        Returns:
+            Entrada registrada, o None si el archivo no es válido
+        """
+        info = probe_lossless(path)
+        with self._lock:
+            if info is None:
+                self.entries.pop(path.name, None)
+                return None
+            info["bytes"] = path.stat().st_size
+            self.entries[path.name] = info
+        return info
+
+    def get(self, path: Path) -> Optional[dict]:
+        """
+        Devuelve la entrada de un audio si sigue coincidiendo con el archivo en disco.
+
+        Args:
+            path: Ruta del audio
+
+        Returns:
+            Entrada del índice, o None si falta o el archivo cambió
+        """
+        with self._lock:
+            entry = self.entries.get(path.name)
+        if entry is None or not path.exists() or path.stat().st_size != entry.get("bytes"):
+            return None
+        return entry
+
+    def save(self) -> None:
+        """Escribe el índice de forma atómica."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".part")
+        with self._lock:
+            tmp.write_text(json.dumps(self.entries, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
@@ -0,0 +1,162 @@
+"""
+Etapa de postproceso de imágenes fuera del camino de red.
+
+Los bytes recibidos de la API se decodifican una sola vez, se les aplica la
+cadena de efectos (ver image_proc.EFFECTS) en memoria y se escriben una única
+vez en su ruta final. El trabajo se hace en un pool de procesos, de modo que
+el hilo o la corrutina que habla con la API queda libre para la siguiente
+petición.
+"""
+import atexit
+import io
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from ..config.settings import IMAGE_POSTPROCESS_WORKERS
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def postprocess_steps_for_style(style_slug: str) -> list:
+    """
+    Cadena de efectos por defecto para un estilo visual.
+
+    Args:
+        style_slug: Slug del estilo (ej: "pixel_art")
+
+    Returns:
+        Lista de (efecto, parámetros); vacía si el estilo no necesita postproceso
+    """
+    if "pixel" in (style_slug or ""):
+        return [("pixelize", {"small_edge": 256}), ("quantize", {"colors": 48})]
+    return []
+
+
+def describe_steps(steps: list) -> str:
+    """
+    Descripción estable de la cadena de efectos (para la clave de caché).
+
+    Args:
+        steps: Lista de (efecto, parámetros)
+
+    Returns:
+        Cadena vacía si no hay efectos, o JSON canónico de la cadena
+    """
+    if not steps:
+        return ""
+    return json.dumps([[name, params or {}] for name, params in steps], sort_keys=True)
+
+
+def render_image(data: bytes, dest_path: str, steps: list) -> str:
+    """
+    Decodifica, aplica los efectos y escribe la imagen final una sola vez.
+
+    Se escribe a un temporal y se renombra, para no dejar nunca una imagen a
+    medias en images/ si el proceso se interrumpe.
+
+    Args:
+        data: Bytes de la imagen tal como los devolvió la API
+        dest_path: Ruta final (ej: images/3.png)
+        steps: Lista de (efecto, parámetros)
+
+    Returns:
+        dest_path
+    """
+    tmp_path = f"{dest_path}.part"
+    if not steps and data[:8] == _PNG_SIGNATURE:
+        # Ya es PNG y no hay efectos: se guarda tal cual, sin recodificar
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    else:
+        import numpy as np
+        from PIL import Image
+        from .image_proc import apply_effects
+
+        arr = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+        arr = apply_effects(arr, steps)
+        Image.fromarray(arr, "RGB").save(tmp_path, format="PNG")
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+class PostProcessPool:
+    """Pool de procesos para el postproceso de imágenes."""
+
+    def __init__(self, max_workers: int = None):
+        """
+        Args:
+            max_workers: Procesos del pool (None = IMAGE_POSTPROCESS_WORKERS)
+        """
+        self.max_workers = max(1, max_workers or IMAGE_POSTPROCESS_WORKERS)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                except (OSError, NotImplementedError) as e:
+                    print(f"   ⚠️ Pool de procesos no disponible ({e}); postproceso en hilos")
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, data: bytes, dest_path: str, steps: list) -> Future:
+        """
+        Encola el postproceso y la escritura final de una imagen.
+
+        Sin efectos que aplicar, la imagen se escribe directamente en el hilo
+        actual (no compensa enviarla a otro proceso).
+
+        Args:
+            data: Bytes de la imagen devuelta por la API
+            dest_path: Ruta final
+            steps: Lista de (efecto, parámetros)
+
+        Returns:
+            Future que se resuelve con dest_path (o con la excepción del postproceso)
+        """
+        if not steps:
+            future = Future()
+            try:
+                future.set_result(render_image(data, dest_path, steps))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._get_executor().submit(render_image, data, dest_path, steps)
+
+    def shutdown(self) -> None:
+        """Espera a los trabajos pendientes y cierra el pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def get_postprocess_pool() -> PostProcessPool:
+    """
+    Devuelve el pool de postproceso compartido del proceso (lo crea la primera vez).
+
+    Returns:
+        PostProcessPool compartido
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = PostProcessPool()
+        return _shared_pool
+
+
+@atexit.register
+def shutdown_postprocess_pool() -> None:
+    """Cierra el pool compartido (se llama también al salir)."""
+    global _shared_pool
+    with _shared_lock:
+        pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        pool.shutdown()
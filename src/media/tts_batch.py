@@ -0,0 +1,186 @@
+"""
+Agrupación de turnos TTS consecutivos del mismo hablante en una sola petición.
+
+El audio devuelto se vuelve a cortar en un clip por turno usando los
+timestamps por carácter de ElevenLabs (o detección de silencios como
+fallback), de modo que el renderizador sigue recibiendo un archivo por turno.
+Las peticiones agrupadas se piden siempre en PCM: cada clip se codifica una
+sola vez, igual que al sintetizar turno a turno.
+"""
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List
+
+from .audio_proc import (
+    AudioSegment, is_pydub_available, find_silence_cut_points, split_audio_segment
+)
+from .pcm_store import PCM_SAMPLE_WIDTH, PCM_CHANNELS
+from ..config.settings import ELEVEN_PCM_FORMATS, DEFAULT_PCM_FORMAT
+
+# Separador entre turnos al unirlos en una sola petición
+BATCH_SEPARATOR = " "
+# Bitrate de los clips MP3 exportados (el mismo que el MP3 por defecto de ElevenLabs)
+MP3_BITRATE = "128k"
+
+
+@dataclass
+class TtsUnit:
+    """Un trozo de texto que acaba en su propio archivo de audio."""
+    block: int      # índice del bloque en el guion (1-based)
+    speaker: str
+    text: str
+    path: Path
+
+
+def group_units_by_speaker(units: List[TtsUnit], max_chars: int) -> List[List[TtsUnit]]:
+    """
+    Agrupa unidades consecutivas del mismo hablante sin superar max_chars.
+
+    Args:
+        units: Unidades en orden de guion
+        max_chars: Máximo de caracteres por petición (texto unido)
+
+    Returns:
+        Lista de grupos; cada grupo conserva el orden original
+    """
+    groups: List[List[TtsUnit]] = []
+    current: List[TtsUnit] = []
+    current_len = 0
+
+    for unit in units:
+        extra = len(unit.text) + (len(BATCH_SEPARATOR) if current else 0)
+        same_speaker = current and current[-1].speaker == unit.speaker
+        if same_speaker and current_len + extra <= max_chars:
+            current.append(unit)
+            current_len += extra
+            continue
+
+        if current:
+            groups.append(current)
+        current = [unit]
+        current_len = len(unit.text)
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+def pending_runs(group: List[TtsUnit], is_done: Callable[[TtsUnit], bool]) -> List[List[TtsUnit]]:
+    """
+    Parte un grupo en tramos contiguos de unidades pendientes.
+
+    Dos turnos separados por uno ya terminado no se unen en la misma
+    petición: el texto unido no sería el que se lee seguido en el guion.
+
+    Args:
+        group: Unidades de un grupo, en orden de guion
+        is_done: is_done(unit) -> True si el clip ya existe y no hay que sintetizarlo
+
+    Returns:
+        Lista de tramos (listas no vacías), en orden
+    """
+    runs: List[List[TtsUnit]] = []
+    current: List[TtsUnit] = []
+    for unit in group:
+        if is_done(unit):
+            if current:
+                runs.append(current)
+            current = []
+        else:
+            current.append(unit)
+    if current:
+        runs.append(current)
+    return runs
+
+
+def _char_spans(texts: List[str]) -> List[tuple]:
+    """Devuelve (inicio, fin) de cada texto dentro del texto unido."""
+    spans, pos = [], 0
+    for i, t in enumerate(texts):
+        if i:
+            pos += len(BATCH_SEPARATOR)
+        spans.append((pos, pos + len(t)))
+        pos += len(t)
+    return spans
+
+
+def _cuts_from_alignment(alignment: dict, spans: List[tuple], total_chars: int):
+    """
+    Calcula los cortes entre turnos a partir del alineamiento por carácter.
+
+    Returns:
+        Lista de cortes en segundos, o None si el alineamiento no es utilizable
+    """
+    chars = alignment.get("characters") or []
+    starts = alignment.get("character_start_times_seconds") or []
+    ends = alignment.get("character_end_times_seconds") or []
+    if len(chars) != total_chars or len(starts) != total_chars or len(ends) != total_chars:
+        return None
+
+    cuts = []
+    for (_, prev_end), (next_start, _) in zip(spans, spans[1:]):
+        # Punto medio del hueco entre el último carácter de un turno y el primero del siguiente
+        cuts.append((ends[prev_end - 1] + starts[next_start]) / 2.0)
+    return cuts
+
+
+def synthesize_group(service, group: List[TtsUnit], voice_id: str, model_id: str,
+                     speed: float, output_format: str = None) -> tuple[str, list]:
+    """
+    Sintetiza un grupo de turnos en una sola petición y escribe un archivo por turno.
+
+    Args:
+        service: ElevenLabsService
+        group: Unidades del mismo hablante (len >= 2)
+        voice_id: ID de la voz
+        model_id: ID del modelo
+        speed: Velocidad de habla
+        output_format: Formato PCM de ElevenLabs (ej: pcm_44100) con el que se
+            guardan los clips sin pérdidas, o None para clips MP3 (la petición
+            se hace igualmente en DEFAULT_PCM_FORMAT y se codifica una sola vez)
+
+    Returns:
+        Tupla (método usado para cortar: "timestamps" o "silencios",
+        duración en segundos de cada clip)
+
+    Raises:
+        ImportError: Si pydub no está instalado
+        RuntimeError: Si la llamada a la API falla
+    """
+    if not is_pydub_available():
+        raise ImportError("pydub no está instalado. Ejecuta: pip install pydub")
+
+    texts = [u.text for u in group]
+    joined = BATCH_SEPARATOR.join(texts)
+    spans = _char_spans(texts)
+
+    # Siempre PCM: decodificar un MP3 y volver a exportarlo añadiría una segunda pérdida
+    request_format = output_format if output_format in ELEVEN_PCM_FORMATS else DEFAULT_PCM_FORMAT
+    audio_bytes, alignment = service.create_speech_with_timestamps(
+        text=joined, voice_id=voice_id, model_id=model_id, speed=speed,
+        output_format=request_format
+    )
+    # PCM crudo: se corta a nivel de muestra, sin decodificar nada
+    segment = AudioSegment(data=audio_bytes, sample_width=PCM_SAMPLE_WIDTH,
+                           frame_rate=ELEVEN_PCM_FORMATS[request_format], channels=PCM_CHANNELS)
+
+    cuts = _cuts_from_alignment(alignment, spans, len(joined))
+    method = "timestamps"
+    if cuts is None:
+        # Fallback: estimación proporcional a caracteres ajustada a silencios reales
+        total_s = len(segment) / 1000.0
+        expected = [total_s * start / len(joined) for start, _ in spans[1:]]
+        cuts = find_silence_cut_points(segment, expected)
+        method = "silencios"
+
+    durations = []
+    for unit, piece in zip(group, split_audio_segment(segment, cuts)):
+        # Exporta a temporal y renombra: nunca queda un clip a medio escribir
+        tmp = unit.path.with_name(unit.path.name + ".part")
+        fmt = unit.path.suffix.lstrip(".") or "mp3"
+        piece.export(str(tmp), format=fmt, bitrate=MP3_BITRATE if fmt == "mp3" else None)
+        os.replace(tmp, unit.path)
+        durations.append(len(piece) / 1000.0)
+
+    return method, durations
@@ -0,0 +1,135 @@
+"""
+Journal de TTS para reanudar ejecuciones interrumpidas.
+
+Cada petición completada se añade como una línea JSON a Out/tts_journal.jsonl
+(hash de la petición, ruta, tamaño en bytes y duración). Al reanudar, un archivo
+solo se da por bueno si coincide con su entrada del journal y se puede
+decodificar; si falta, está truncado o corrupto, se vuelve a encolar.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from .audio_proc import probe_audio_duration
+
+JOURNAL_FILENAME = "tts_journal.jsonl"
+
+
+def request_hash(text: str, voice_id: str, model_id: str, speed: float, fmt: str) -> str:
+    """
+    Hash estable de una petición TTS.
+
+    Args:
+        text: Texto sintetizado
+        voice_id: ID de la voz
+        model_id: ID del modelo
+        speed: Velocidad de habla
+        fmt: Formato de salida (accept/extensión)
+
+    Returns:
+        Hash SHA-1 en hexadecimal
+    """
+    key = json.dumps([text, voice_id, model_id, round(float(speed), 3), fmt], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Escribe a un archivo temporal y lo renombra, para no dejar nunca un audio a medias."""
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class TtsJournal:
+    """Registro append-only de peticiones TTS completadas."""
+
+    def __init__(self, outdir: Path):
+        """
+        Carga el journal existente (si lo hay).
+
+        Args:
+            outdir: Directorio de salida del render (Out/)
+        """
+        self.path = Path(outdir) / JOURNAL_FILENAME
+        self.entries = {}
+        # Archivos escritos (o ya decodificados) en esta ejecución: no hace falta volver a medirlos
+        self._verified = set()
+
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última línea truncada por una interrupción: se ignora
+                        continue
+                    # La última entrada de cada archivo es la que vale
+                    self.entries[entry["file"]] = entry
+
+    def is_complete(self, path: Path, req_hash: str) -> bool:
+        """
+        ¿El archivo existe y coincide con lo registrado para esta petición?
+
+        Las entradas de una ejecución anterior se comprueban además
+        decodificando el archivo (duración positiva): un crash o un disco
+        lleno pueden dejar un audio con el tamaño esperado pero corrupto. Sin
+        pydub se confía en el hash y el tamaño.
+
+        Los archivos anteriores al journal (sin entrada) se adoptan solo si se
+        pueden decodificar y tienen duración positiva; así no se regenera un
+        proyecto entero al actualizar. Sin pydub no se puede comprobar nada y
+        se regeneran.
+
+        Args:
+            path: Ruta del audio
+            req_hash: Hash de la petición esperada
+
+        Returns:
+            True si el archivo es válido y no hay que regenerarlo
+        """
+        if not path.exists():
+            return False
+
+        entry = self.entries.get(path.name)
+        if entry is None:
+            duration = probe_audio_duration(path)
+            if not duration or duration <= 0:
+                return False
+            self.record(path, req_hash, duration)
+            return True
+
+        if entry["hash"] != req_hash or entry["bytes"] != path.stat().st_size:
+            return False
+
+        if path.name not in self._verified:
+            duration = probe_audio_duration(path)
+            if duration is not None and duration <= 0:
+                return False
+            self._verified.add(path.name)
+        return True
+
+    def record(self, path: Path, req_hash: str, duration: Optional[float] = None) -> None:
+        """
+        Añade una petición completada al journal.
+
+        Args:
+            path: Ruta del audio ya escrito
+            req_hash: Hash de la petición
+            duration: Duración en segundos (None si no se pudo medir)
+        """
+        entry = {
+            "file": path.name,
+            "hash": req_hash,
+            "bytes": path.stat().st_size,
+            "duration": duration,
+            "ts": time.time(),
+        }
+        self.entries[path.name] = entry
+        self._verified.add(path.name)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
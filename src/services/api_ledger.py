@@ -0,0 +1,256 @@
+"""
+Registro persistente de coste y latencia de cada llamada a APIs externas.
+
+Cada llamada a OpenAI, Gemini, Runware o ElevenLabs deja una fila en una base
+SQLite local (API_LEDGER_PATH) con proveedor, modelo, operación, latencia,
+bytes, reintentos, unidades (tokens/caracteres), coste y, en las respuestas
+en streaming, el tiempo hasta el primer token. El informe
+(main_ledger_report.py) agrega p50/p95 y coste por proyecto y etapa.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from ..config.settings import (
+    API_LEDGER_PATH, API_LEDGER_ENABLED, LLM_PRICES_PER_MTOKEN, ELEVEN_COST_PER_1K_CHARS
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    run_id TEXT,
+    project TEXT,
+    stage TEXT,
+    provider TEXT NOT NULL,
+    model TEXT,
+    operation TEXT,
+    latency_s REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    retries INTEGER DEFAULT 0,
+    bytes_in INTEGER DEFAULT 0,
+    bytes_out INTEGER DEFAULT 0,
+    units INTEGER DEFAULT 0,
+    unit_kind TEXT,
+    cost_usd REAL,
+    error TEXT,
+    ttft_s REAL
+)
+"""
+
+_COLUMNS = ("ts", "run_id", "project", "stage", "provider", "model", "operation", "latency_s", "ok",
+            "retries", "bytes_in", "bytes_out", "units", "unit_kind", "cost_usd", "error", "ttft_s")
+
+# Identifica las llamadas de esta ejecución (para asignarles el proyecto cuando se conozca)
+RUN_ID = uuid.uuid4().hex
+
+_context = {"project": None, "stage": None}
+# Etapa propia de un hilo (etapas que corren en paralelo)
+_thread_stage = threading.local()
+_shared_ledger = None
+_shared_lock = threading.Lock()
+
+
+def estimate_llm_cost(model: str, prompt_tokens: int, completion_tokens: int):
+    """
+    Coste estimado de una llamada de texto según LLM_PRICES_PER_MTOKEN.
+
+    Returns:
+        USD, o None si el modelo no tiene precio configurado
+    """
+    prices = LLM_PRICES_PER_MTOKEN.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def estimate_tts_cost(characters: int) -> float:
+    """Coste estimado de ElevenLabs para un número de caracteres."""
+    return characters * ELEVEN_COST_PER_1K_CHARS / 1000.0
+
+
+class ApiLedger:
+    """Base SQLite con una fila por llamada (segura entre hilos y procesos)."""
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: Ruta de la base (None = API_LEDGER_PATH)
+        """
+        self.path = path or API_LEDGER_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        # WAL: el generador y el renderizador pueden escribir a la vez
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        # Registros creados antes de medir el primer token en streaming
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(calls)")}
+        if "ttft_s" not in columns:
+            self._conn.execute("ALTER TABLE calls ADD COLUMN ttft_s REAL")
+        self._conn.commit()
+
+    def record(self, **fields) -> None:
+        """
+        Inserta una llamada.
+
+        Args:
+            **fields: Columnas de la tabla calls (ver _COLUMNS)
+        """
+        row = tuple(fields.get(col) for col in _COLUMNS)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO calls ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", row
+            )
+            self._conn.commit()
+
+    def assign_project(self, run_id: str, project: str) -> None:
+        """Asigna el proyecto a las llamadas de la ejecución que aún no lo tenían."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE calls SET project = ? WHERE run_id = ? AND project IS NULL", (project, run_id)
+            )
+            self._conn.commit()
+
+    def rows(self, project: str = None, since: float = None) -> list:
+        """
+        Devuelve las llamadas registradas como dicts.
+
+        Args:
+            project: Filtra por proyecto
+            since: Solo llamadas posteriores a este timestamp (epoch)
+
+        Returns:
+            Lista de dicts con las columnas de calls
+        """
+        query, params = f"SELECT {', '.join(_COLUMNS)} FROM calls WHERE 1=1", []
+        if project:
+            query += " AND project = ?"
+            params.append(project)
+        if since:
+            query += " AND ts >= ?"
+            params.append(since)
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY ts", params)
+            return [dict(zip(_COLUMNS, r)) for r in cursor.fetchall()]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_ledger():
+    """
+    Devuelve el registro compartido del proceso (None si está desactivado o no se puede abrir).
+    """
+    global _shared_ledger
+    if not API_LEDGER_ENABLED:
+        return None
+    with _shared_lock:
+        if _shared_ledger is None:
+            try:
+                _shared_ledger = ApiLedger()
+            except (OSError, sqlite3.Error) as e:
+                print(f"   ⚠️ Registro de llamadas desactivado ({e})")
+                return None
+        return _shared_ledger
+
+
+def set_ledger_context(project: str = None, stage: str = None) -> None:
+    """
+    Fija el proyecto y/o la etapa con los que se etiquetan las siguientes llamadas.
+
+    Al fijar el proyecto, las llamadas anteriores de esta ejecución sin
+    proyecto (idea, guion...) se asignan también a él.
+
+    Args:
+        project: Nombre del proyecto
+        stage: Etapa del pipeline ("guion", "imagenes", "tts"...)
+    """
+    if stage is not None:
+        _context["stage"] = stage
+    if project is not None:
+        _context["project"] = project
+        ledger = get_ledger()
+        if ledger is not None:
+            try:
+                ledger.assign_project(RUN_ID, project)
+            except sqlite3.Error as e:
+                print(f"   ⚠️ No se pudo actualizar el registro de llamadas: {e}")
+
+
+@contextlib.contextmanager
+def ledger_stage(stage: str):
+    """
+    Etiqueta con stage las llamadas hechas desde el hilo actual dentro del bloque.
+
+    A diferencia de set_ledger_context, no afecta a otros hilos: sirve para
+    etapas que se ejecutan a la vez.
+
+    Args:
+        stage: Etapa del pipeline
+    """
+    previous = getattr(_thread_stage, "stage", None)
+    _thread_stage.stage = stage
+    try:
+        yield
+    finally:
+        _thread_stage.stage = previous
+
+
+def record_call(provider: str, model: str, operation: str, latency_s: float, ok: bool = True,
+                **fields) -> None:
+    """
+    Registra una llamada ya terminada. Nunca lanza: un fallo del registro no
+    debe interrumpir la generación.
+
+    Args:
+        provider: "openai", "gemini", "runware", "elevenlabs"
+        model: Modelo usado
+        operation: Operación ("chat", "image", "video", "tts"...)
+        latency_s: Duración de la llamada en segundos
+        ok: ¿Terminó bien?
+        **fields: retries, bytes_in, bytes_out, units, unit_kind, cost_usd, error, ttft_s, stage
+    """
+    ledger = get_ledger()
+    if ledger is None:
+        return
+    fields.setdefault("stage", getattr(_thread_stage, "stage", None) or _context["stage"])
+    try:
+        ledger.record(ts=time.time(), run_id=RUN_ID, project=_context["project"], provider=provider,
+                      model=model, operation=operation, latency_s=latency_s, ok=int(ok), **fields)
+    except sqlite3.Error as e:
+        print(f"   ⚠️ No se pudo registrar la llamada en el registro: {e}")
+
+
+@contextlib.contextmanager
+def track_call(provider: str, model: str, operation: str, **fields):
+    """
+    Mide una llamada y la registra al salir del bloque (también si falla).
+
+    Dentro del bloque se pueden completar los campos del dict devuelto
+    (bytes_out, units, unit_kind, cost_usd, retries...).
+
+    Ejemplo:
+        with track_call("openai", model, "chat", bytes_in=n) as call:
+            response = ...
+            call["units"] = response.usage.total_tokens
+
+    Args:
+        provider: Proveedor
+        model: Modelo
+        operation: Operación
+        **fields: Campos iniciales
+    """
+    call = dict(fields)
+    start = time.monotonic()
+    try:
+        yield call
+    except BaseException as e:
+        call["error"] = str(e)[:500]
+        record_call(provider, model, operation, time.monotonic() - start, ok=False, **call)
+        raise
+    record_call(provider, model, operation, time.monotonic() - start, ok=True, **call)
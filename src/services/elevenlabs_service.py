@@ -1,8 +1,12 @@
 """
 Servicio para interactuar con la API de ElevenLabs (Text-to-Speech).
 """
+import base64
 import requests
-from ..config.settings import ELEVEN_API_URL, DEFAULT_VOICE_SETTINGS, ELEVENLABS_API_KEY
+from ..config.settings import (
+    ELEVEN_API_URL, ELEVEN_API_URL_TIMESTAMPS, DEFAULT_VOICE_SETTINGS, ELEVENLABS_API_KEY
+)
+from .api_ledger import estimate_tts_cost, track_call
 
 
 class ElevenLabsService:
@@ -19,8 +23,45 @@ class ElevenLabsService:
         if not self.api_key:
             raise ValueError("ELEVENLABS_API_KEY no configurada")
 
+    def _post(self, url: str, text: str, model_id: str, speed: float, accept: str,
+              output_format: str = None):
+        """Envía la petición TTS y lanza RuntimeError si la API responde con error."""
+        headers = {
+            "Accept": accept,
+            "Content-Type": "application/json",
+            "xi-api-key": self.api_key
+        }
+
+        settings = dict(DEFAULT_VOICE_SETTINGS)
+        settings["speed"] = speed
+
+        payload = {
+            "text": text,
+            "model_id": model_id,
+            "voice_settings": settings
+        }
+
+        params = {"output_format": output_format} if output_format else None
+        operation = "tts_timestamps" if url.endswith("/with-timestamps") else "tts"
+        with track_call("elevenlabs", model_id, operation, units=len(text), unit_kind="chars",
+                        bytes_in=len(text.encode("utf-8"))) as call:
+            response = requests.post(url, headers=headers, json=payload, params=params, timeout=120)
+
+            if response.status_code >= 400:
+                try:
+                    detail = response.json()
+                except Exception:
+                    detail = response.text
+                raise RuntimeError(f"ElevenLabs error {response.status_code}: {detail}")
+
+            call["bytes_out"] = len(response.content)
+            call["cost_usd"] = estimate_tts_cost(len(text))
+
+        return response
+
     def create_speech(self, text: str, voice_id: str, model_id: str,
-                     speed: float = 1.0, accept: str = "audio/mpeg") -> bytes:
+                     speed: float = 1.0, accept: str = "audio/mpeg",
+                     output_format: str = None) -> bytes:
         """
         Genera audio a partir de texto.
 
@@ -30,6 +71,8 @@ class ElevenLabsService:
             model_id: ID del modelo (ej: eleven_multilingual_v2)
             speed: Velocidad de habla (0.7 - 1.2)
             accept: Tipo de audio a generar (audio/mpeg, audio/wav, etc.)
+            output_format: Formato de salida de ElevenLabs (ej: pcm_44100).
+                Con pcm_* se devuelven muestras PCM 16 bits mono sin cabecera.
 
         Returns:
             Bytes del archivo de audio generado
@@ -38,28 +81,32 @@ class ElevenLabsService:
             RuntimeError: Si la llamada a la API falla
         """
         url = ELEVEN_API_URL.format(voice_id=voice_id)
-        headers = {
-            "Accept": accept,
-            "Content-Type": "application/json",
-            "xi-api-key": self.api_key
-        }
+        return self._post(url, text, model_id, speed, accept, output_format).content
 
-        settings = dict(DEFAULT_VOICE_SETTINGS)
-        settings["speed"] = speed
+    def create_speech_with_timestamps(self, text: str, voice_id: str, model_id: str,
+                                      speed: float = 1.0,
+                                      output_format: str = None) -> tuple[bytes, dict]:
+        """
+        Genera audio junto con el alineamiento por carácter (endpoint with-timestamps).
 
-        payload = {
-            "text": text,
-            "model_id": model_id,
-            "voice_settings": settings
-        }
+        Args:
+            text: Texto a convertir en audio
+            voice_id: ID de la voz a usar
+            model_id: ID del modelo (ej: eleven_multilingual_v2)
+            speed: Velocidad de habla (0.7 - 1.2)
+            output_format: Formato de salida de ElevenLabs (None = MP3 por defecto)
 
-        response = requests.post(url, headers=headers, json=payload, timeout=120)
+        Returns:
+            Tupla (bytes de audio, alignment). alignment es un dict con las listas
+            "characters", "character_start_times_seconds" y
+            "character_end_times_seconds", o {} si la API no lo devuelve.
 
-        if response.status_code >= 400:
-            try:
-                detail = response.json()
-            except Exception:
-                detail = response.text
-            raise RuntimeError(f"ElevenLabs error {response.status_code}: {detail}")
+        Raises:
+            RuntimeError: Si la llamada a la API falla
+        """
+        url = ELEVEN_API_URL_TIMESTAMPS.format(voice_id=voice_id)
+        data = self._post(url, text, model_id, speed, "application/json", output_format).json()
 
-        return response.content
+        audio_bytes = base64.b64decode(data.get("audio_base64", ""))
+        alignment = data.get("alignment") or {}
+        return audio_bytes, alignment
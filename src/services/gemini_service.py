@@ -1,12 +1,20 @@
 """
 Servicio para interactuar con Google Gemini (generación de imágenes).
 """
+import os
 import time
 from google import genai
 from google.genai import types
-from ..config.settings import GEMINI_API_KEY
+from ..config.settings import (
+    GEMINI_API_KEY, GEMINI_IMAGE_CONCURRENCY, GEMINI_IMAGE_RPM, IMAGE_COST_ESTIMATES
+)
 from ..config.styles import build_master_prompt
-from ..media.image_proc import pixelize_image
+from ..media.image_cache import ImageCache, image_cache_key
+from ..media.postprocess import describe_steps, get_postprocess_pool, postprocess_steps_for_style
+from .api_ledger import track_call
+from .image_backends import GeminiBackend, SceneRequest
+from .rate_limit import get_rate_limiter
+from .scene_scheduler import SceneGenerationError, SceneReport, run_scenes_threaded
 
 
 class GeminiService:
@@ -24,6 +32,9 @@ class GeminiService:
             raise ValueError("GEMINI_API_KEY no configurada")
 
         self.client = genai.Client(api_key=self.api_key)
+        self.rate_limiter = get_rate_limiter(self.api_key, GEMINI_IMAGE_RPM)
+        self.image_cache = ImageCache()
+        self.postprocess = get_postprocess_pool()
 
     def generate_image(self, prompt: str, aspect_ratio: str = "9:16",
                       number_of_images: int = 1, **kwargs):
@@ -40,21 +51,127 @@ class GeminiService:
             Respuesta de la API con las imágenes generadas
         """
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=[prompt],
-                config=types.GenerateContentConfig(
-                    response_modalities=["IMAGE"],
-                    image_config=types.ImageConfig(
-                        aspect_ratio=aspect_ratio,
-                    ),
-                    **kwargs
+            self.rate_limiter.acquire()
+            with track_call("gemini", "gemini-2.5-flash-image", "image",
+                            bytes_in=len(prompt.encode("utf-8"))) as call:
+                response = self.client.models.generate_content(
+                    model="gemini-2.5-flash-image",
+                    contents=[prompt],
+                    config=types.GenerateContentConfig(
+                        response_modalities=["IMAGE"],
+                        image_config=types.ImageConfig(
+                            aspect_ratio=aspect_ratio,
+                        ),
+                        **kwargs
+                    )
                 )
-            )
+                call["cost_usd"] = IMAGE_COST_ESTIMATES["gemini"] * number_of_images
             return response
         except Exception as e:
             raise RuntimeError(f"Error al generar imagen con Gemini: {e}")
 
+    def _generate_scene(self, idx: int, visual_prompt: str, audio_text: str, scene_ctx: str,
+                        total_scenes: int, image_path: str, client_openai, style_block: str,
+                        image_model: str, style_slug_for_pixelize: str, max_retries: int,
+                        use_cache: bool = True, pending: list = None) -> str:
+        """
+        Genera y guarda la imagen de una escena, con reintentos y reescritura por seguridad.
+
+        Se ejecuta en un hilo del pool: los reintentos y esperas de una escena
+        no bloquean a las demás. Si se pasa pending, el postproceso y la
+        escritura final se encolan en el pool de procesos y el hilo queda libre
+        para la siguiente petición; (escena, ruta, clave, future) se añade a pending.
+
+        Returns:
+            "generada" o "caché" según el origen de la imagen
+
+        Raises:
+            SceneGenerationError: Si la escena no se pudo generar
+        """
+        from ..content.scripting import rewrite_prompt_for_safety
+
+        clean_text = visual_prompt.strip()
+        print(f"🖼️  Generando imagen para escena {idx+1}: '{audio_text[:60]}...'")
+        steps = postprocess_steps_for_style(style_slug_for_pixelize)
+
+        for attempt in range(max_retries):
+            try:
+                # Prompt final: contexto de consistencia + estilo + prompt visual
+                final_prompt = scene_ctx + "\n\n" + build_master_prompt(style_block, clean_text)
+                final_prompt += f"\n\nEscena {idx+1} de {total_scenes} en la narrativa."
+                print(f"   → Escena {idx+1}/{total_scenes} con contexto narrativo específico")
+
+                cache_key = image_cache_key(
+                    final_prompt, image_model, aspect_ratio="9:16",
+                    postprocess=describe_steps(steps)
+                )
+                if use_cache and self.image_cache.fetch(cache_key, image_path):
+                    print(f"   ♻️  Escena {idx+1}: mismo prompt ya generado, imagen reutilizada de la caché")
+                    return "caché"
+
+                self.rate_limiter.acquire()
+                with track_call("gemini", image_model, "image", retries=attempt,
+                                bytes_in=len(final_prompt.encode("utf-8"))) as call:
+                    response = self.client.models.generate_content(
+                        model=image_model,
+                        contents=[final_prompt],
+                        config=types.GenerateContentConfig(
+                            response_modalities=["IMAGE"],
+                            image_config=types.ImageConfig(
+                                aspect_ratio="9:16",
+                            ),
+                        ),
+                    )
+
+                    image_data = None
+                    if hasattr(response, 'parts'):
+                        for part in response.parts:
+                            if getattr(part, 'inline_data', None) is not None and part.inline_data.data:
+                                image_data = part.inline_data.data
+                                break
+
+                    if image_data is None:
+                        raise RuntimeError("Gemini no devolvió datos de imagen válidos en response.parts")
+                    call["bytes_out"] = len(image_data)
+                    call["cost_usd"] = IMAGE_COST_ESTIMATES["gemini"]
+
+                # Postproceso en memoria y una única escritura (temporal + renombrado)
+                future = self.postprocess.submit(image_data, image_path, steps)
+                if steps:
+                    print(f"   ↳ Escena {idx+1}: postproceso en segundo plano "
+                          f"({', '.join(name for name, _ in steps)})")
+                if pending is not None:
+                    pending.append((idx + 1, image_path, cache_key, future))
+                    return "generada"
+
+                future.result()
+                self.image_cache.store(cache_key, image_path)
+
+                print(f"   ✔ Guardada: {image_path}")
+                return "generada"
+
+            except Exception as e:
+                error_message = str(e)
+                if "SAFETY" in error_message or "BLOCKED" in error_message:
+                    print(f"⚠️ Escena {idx+1}: prompt bloqueado por seguridad (intento {attempt + 1}). Reescribiendo...")
+                    rewritten_prompt = rewrite_prompt_for_safety(clean_text, client_openai)
+                    if rewritten_prompt:
+                        clean_text = rewritten_prompt
+                        continue
+                    raise SceneGenerationError("bloqueada por seguridad y sin reescritura posible",
+                                               retryable=False)
+                elif attempt < max_retries - 1:
+                    wait_time = (attempt + 1) * 2
+                    print(f"⚠️ Escena {idx+1}: error temporal (intento {attempt + 1}/{max_retries}): {error_message[:100]}")
+                    print(f"   Reintentando escena {idx+1} en {wait_time}s...")
+                    time.sleep(wait_time)
+                    continue
+                else:
+                    print(f"❌ Escena {idx+1}: error después de {max_retries} intentos: {error_message}")
+                    raise SceneGenerationError(error_message)
+
+        raise SceneGenerationError(f"bloqueada por seguridad tras {max_retries} intentos")
+
     def generate_visuals_for_script(
         self,
         visual_prompts_list: list,
@@ -65,7 +182,11 @@ class GeminiService:
         style_block: str,
         overwrite: bool,
         image_model: str = "gemini-2.5-flash-image",
-        style_slug_for_pixelize: str = ""
+        style_slug_for_pixelize: str = "",
+        max_workers: int = None,
+        use_cache: bool = True,
+        hedge=None,
+        scene_stream=None
     ) -> bool:
         """
         Genera imágenes con Google Gemini usando:
@@ -73,6 +194,12 @@ class GeminiService:
         - audio_scenes_list: texto de audio original (solo para logs)
         - scene_contexts_list: brief de consistencia específico por escena
 
+        Las escenas se generan en paralelo (hasta max_workers a la vez) y el
+        limitador por API key mantiene el ritmo dentro de GEMINI_IMAGE_RPM.
+        Una escena fallida no detiene a las demás: se reintenta al final y se
+        imprime una tabla con el estado de cada escena. Con hedge, las escenas
+        que se retrasan se duplican en el backend secundario.
+
         Args:
             visual_prompts_list: Lista de prompts visuales
             audio_scenes_list: Lista de textos de audio (para logs)
@@ -83,104 +210,89 @@ class GeminiService:
             overwrite: ¿Sobrescribir imágenes existentes?
             image_model: Modelo de Gemini a usar
             style_slug_for_pixelize: Slug del estilo (para detectar pixel art)
+            max_workers: Escenas simultáneas (None = GEMINI_IMAGE_CONCURRENCY)
+            use_cache: Reutiliza imágenes de la caché si el prompt final no cambió
+            hedge: HedgedImageGenerator opcional (duplicados en otro backend)
+            scene_stream: Iterable opcional de (índice, prompt visual, contexto) que
+                sustituye a visual_prompts_list/scene_contexts_list; cada escena
+                se lanza en cuanto el iterable la produce (prompts en streaming)
 
         Returns:
             True si todas las imágenes se generaron correctamente
         """
-        import os
-        from ..content.scripting import rewrite_prompt_for_safety
-
         print(f"🎨 Generando imágenes con Google Gemini (Opción alta calidad)...")
         print(f"   Modelo: {image_model}")
 
-        all_images_successful = True
         MAX_RETRIES = 5
+        workers = max(1, max_workers or GEMINI_IMAGE_CONCURRENCY)
+        print(f"   Concurrencia: {workers} escenas, límite {self.rate_limiter.rpm} peticiones/min")
 
-        total_scenes = len(visual_prompts_list)
-
-        for idx, visual_prompt in enumerate(visual_prompts_list):
-            clean_text = visual_prompt.strip()
-            if not clean_text:
-                continue
+        total_scenes = len(audio_scenes_list) if scene_stream is not None else len(visual_prompts_list)
+        if scene_stream is None:
+            scene_stream = (
+                (idx, visual_prompt,
+                 scene_contexts_list[idx] if scene_contexts_list and idx < len(scene_contexts_list) else "")
+                for idx, visual_prompt in enumerate(visual_prompts_list)
+            )
+        report = SceneReport()
+        pending = []
+        jobs_by_scene = {}
+        primary = GeminiBackend(self, client_openai, style_block, image_model,
+                                style_slug_for_pixelize, MAX_RETRIES, use_cache=use_cache)
 
+        def run_scene(job, defer_postprocess: bool = True) -> str:
+            idx, visual_prompt, scene_ctx = job
+            jobs_by_scene[idx + 1] = job
             audio_text = audio_scenes_list[idx] if idx < len(audio_scenes_list) else ""
-            scene_ctx = scene_contexts_list[idx] if scene_contexts_list and idx < len(scene_contexts_list) else ""
-
-            print(f"🖼️  Generando imagen para escena {idx+1}: '{audio_text[:60]}...'")
             image_path = os.path.join(project_path, "images", f"{idx+1}.png")
-            os.makedirs(os.path.dirname(image_path), exist_ok=True)
-
-            if os.path.exists(image_path) and not overwrite:
-                print(f"   ✓ Imagen {idx+1}.png ya existe, saltando generación.")
-                continue
 
-            image_generated = False
+            try:
+                if hedge is not None:
+                    scene = SceneRequest(idx, visual_prompt, audio_text, scene_ctx, total_scenes)
+                    return hedge.generate_scene(primary, scene, image_path)
+                return self._generate_scene(
+                    idx, visual_prompt, audio_text, scene_ctx, total_scenes, image_path,
+                    client_openai, style_block, image_model, style_slug_for_pixelize, MAX_RETRIES,
+                    use_cache=use_cache, pending=pending if defer_postprocess else None
+                )
+            except Exception:
+                print(f"🚫 Falló la generación de la imagen para la escena {idx+1}; se reintentará al final.")
+                raise
 
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Prompt final: contexto de consistencia + estilo + prompt visual
-                    final_prompt = scene_ctx + "\n\n" + build_master_prompt(style_block, clean_text)
-                    final_prompt += f"\n\nEscena {idx+1} de {total_scenes} en la narrativa."
-                    print(f"   → Escena {idx+1}/{total_scenes} con contexto narrativo específico")
+        def iter_jobs():
+            for idx, visual_prompt, scene_ctx in scene_stream:
+                if not visual_prompt.strip():
+                    continue
 
-                    response = self.client.models.generate_content(
-                        model=image_model,
-                        contents=[final_prompt],
-                        config=types.GenerateContentConfig(
-                            response_modalities=["IMAGE"],
-                            image_config=types.ImageConfig(
-                                aspect_ratio="9:16",
-                            ),
-                        ),
-                    )
+                image_path = os.path.join(project_path, "images", f"{idx+1}.png")
+                os.makedirs(os.path.dirname(image_path), exist_ok=True)
 
-                    image_saved = False
-                    if hasattr(response, 'parts'):
-                        for part in response.parts:
-                            if hasattr(part, 'inline_data') and part.inline_data is not None:
-                                pil_image = part.as_image()
-                                pil_image.save(image_path)
-                                image_saved = True
-                                break
+                if os.path.exists(image_path) and not overwrite:
+                    print(f"   ✓ Imagen {idx+1}.png ya existe, saltando generación.")
+                    report.mark(idx + 1, "existente")
+                    continue
 
-                    if not image_saved:
-                        raise RuntimeError("Gemini no devolvió datos de imagen válidos en response.parts")
+                yield (idx + 1, (idx, visual_prompt, scene_ctx))
 
-                    if "pixel" in style_slug_for_pixelize:
-                        pixelize_image(image_path, small_edge=256)
-                        print("   ↳ postproceso: pixelize aplicado (downscale + NEAREST)")
-
-                    print(f"   ✔ Guardada: {image_path}")
-                    image_generated = True
-                    break
-
-                except Exception as e:
-                    error_message = str(e)
-                    if "SAFETY" in error_message or "BLOCKED" in error_message:
-                        print(f"⚠️ Prompt bloqueado por seguridad (intento {attempt + 1}). Reescribiendo...")
-                        rewritten_prompt = rewrite_prompt_for_safety(clean_text, client_openai)
-                        if rewritten_prompt:
-                            clean_text = rewritten_prompt
-                            continue
-                        else:
-                            all_images_successful = False
-                            break
-                    elif attempt < MAX_RETRIES - 1:
-                        wait_time = (attempt + 1) * 2
-                        print(f"⚠️ Error temporal (intento {attempt + 1}/{MAX_RETRIES}): {error_message[:100]}")
-                        print(f"   Reintentando en {wait_time}s...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"❌ Error después de {MAX_RETRIES} intentos: {error_message}")
-                        all_images_successful = False
-                        break
+        all_ok = run_scenes_threaded(iter_jobs(), run_scene, report, max_workers=workers)
 
-            if not image_generated:
-                print(f"🚫 Falló la generación de la imagen para la escena {idx+1} después de {MAX_RETRIES} intentos.")
-                all_images_successful = False
-                break
+        # Esperar a los postprocesos encolados y guardar en la caché las imágenes finales
+        retry = []
+        for scene, image_path, cache_key, future in pending:
+            try:
+                future.result()
+                self.image_cache.store(cache_key, image_path)
+                print(f"   ✔ Guardada: {image_path}")
+            except Exception as e:
+                print(f"❌ Escena {scene}: falló el postproceso: {e}; se reintentará")
+                report.mark(scene, "fallida", f"postproceso: {e}")
+                retry.append((scene, jobs_by_scene[scene]))
 
-            time.sleep(1)
+        if retry:
+            # Se regeneran con el postproceso dentro del trabajo: sus fallos entran en las rondas de reintento
+            retry_ok = run_scenes_threaded(retry, lambda job: run_scene(job, defer_postprocess=False),
+                                           report, max_workers=workers)
+            all_ok = all_ok and retry_ok
 
-        return all_images_successful
+        report.print_table("Estado de las imágenes por escena")
+        return all_ok
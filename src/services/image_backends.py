@@ -0,0 +1,360 @@
+"""
+Backends de imagen intercambiables y peticiones duplicadas (hedging).
+
+Una escena se pide primero al backend principal. Si tarda más que el
+percentil HEDGE_PERCENTILE de su histograma de latencias (o falla), se lanza
+la misma escena en el backend secundario y se queda la primera imagen que
+termine bien. Los duplicados se limitan con un presupuesto de gasto.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from ..config.settings import (
+    RUNWARE_API_KEY, GEMINI_IMAGE_CONCURRENCY, RUNWARE_IMAGE_CONCURRENCY, HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES, HEDGE_DEFAULT_DELAY, HEDGE_BUDGET_USD, IMAGE_COST_ESTIMATES, LATENCY_STATS_PATH
+)
+from .scene_scheduler import SceneGenerationError
+
+# Cubetas logarítmicas: 0.5 s * 1.2^k (hasta ~1 hora)
+_BUCKET_BASE = 0.5
+_BUCKET_GROWTH = 1.2
+_BUCKET_COUNT = 50
+
+
+@dataclass
+class SceneRequest:
+    """Datos de una escena, comunes a todos los backends."""
+    idx: int
+    visual_prompt: str
+    audio_text: str = ""
+    scene_ctx: str = ""
+    total_scenes: int = 0
+
+
+class LatencyHistogram:
+    """Histograma de latencias con cubetas logarítmicas."""
+
+    def __init__(self, counts: list = None):
+        self.counts = list(counts or [0] * _BUCKET_COUNT)
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        if seconds <= _BUCKET_BASE:
+            return 0
+        k = int(math.ceil(math.log(seconds / _BUCKET_BASE, _BUCKET_GROWTH)))
+        return min(k, _BUCKET_COUNT - 1)
+
+    @staticmethod
+    def _upper_edge(bucket: int) -> float:
+        return _BUCKET_BASE * (_BUCKET_GROWTH ** bucket)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def record(self, seconds: float) -> None:
+        """Añade una muestra (segundos)."""
+        self.counts[self._bucket(seconds)] += 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Latencia del percentil p (límite superior de su cubeta).
+
+        Args:
+            p: Percentil entre 0 y 100
+
+        Returns:
+            Segundos, o 0.0 si no hay muestras
+        """
+        total = self.total
+        if not total:
+            return 0.0
+        target = total * p / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self._upper_edge(bucket)
+        return self._upper_edge(_BUCKET_COUNT - 1)
+
+
+class LatencyStats:
+    """Histogramas de latencia por backend, persistidos entre ejecuciones."""
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: Archivo JSON de histogramas (None = LATENCY_STATS_PATH)
+        """
+        self.path = path or LATENCY_STATS_PATH
+        self.histograms = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for name, counts in json.load(f).items():
+                    if len(counts) == _BUCKET_COUNT:
+                        self.histograms[name] = LatencyHistogram(counts)
+        except (OSError, json.JSONDecodeError, TypeError, AttributeError):
+            self.histograms = {}
+
+    def record(self, backend: str, seconds: float) -> None:
+        """Añade una latencia al histograma del backend."""
+        with self._lock:
+            self.histograms.setdefault(backend, LatencyHistogram()).record(seconds)
+
+    def percentile(self, backend: str, p: float, min_samples: int = 1):
+        """
+        Percentil p del backend, o None si hay menos de min_samples muestras.
+        """
+        with self._lock:
+            hist = self.histograms.get(backend)
+            if hist is None or hist.total < min_samples:
+                return None
+            return hist.percentile(p)
+
+    def save(self) -> None:
+        """Escribe los histogramas de forma atómica."""
+        with self._lock:
+            data = {name: hist.counts for name, hist in self.histograms.items()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".part"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"   ⚠️ No se pudieron guardar los histogramas de latencia: {e}")
+
+    def print_summary(self) -> None:
+        """Imprime p50/p90/p99 por backend."""
+        with self._lock:
+            items = sorted(self.histograms.items())
+        for name, hist in items:
+            print(f"   ⏱️  {name}: p50 {hist.percentile(50):.0f}s · p90 {hist.percentile(90):.0f}s · "
+                  f"p99 {hist.percentile(99):.0f}s ({hist.total} muestras)")
+
+
+class ImageBackend:
+    """Interfaz común de los backends de imagen."""
+
+    name = ""
+
+    @property
+    def cost_per_image(self) -> float:
+        return IMAGE_COST_ESTIMATES.get(self.name, 0.0)
+
+    def generate_scene(self, scene: SceneRequest, dest_path: str) -> str:
+        """
+        Genera la imagen de una escena en dest_path (bloqueante).
+
+        Returns:
+            Estado ("generada", "caché"...)
+
+        Raises:
+            SceneGenerationError: Si la escena no se pudo generar
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Libera los recursos del backend."""
+
+
+class GeminiBackend(ImageBackend):
+    """Backend sobre GeminiService."""
+
+    name = "gemini"
+
+    def __init__(self, service, client_openai, style_block: str, image_model: str,
+                 style_slug_for_pixelize: str = "", max_retries: int = 5, use_cache: bool = True):
+        self.service = service
+        self.client_openai = client_openai
+        self.style_block = style_block
+        self.image_model = image_model
+        self.style_slug_for_pixelize = style_slug_for_pixelize
+        self.max_retries = max_retries
+        self.use_cache = use_cache
+
+    def generate_scene(self, scene: SceneRequest, dest_path: str) -> str:
+        return self.service._generate_scene(
+            scene.idx, scene.visual_prompt, scene.audio_text, scene.scene_ctx, scene.total_scenes,
+            dest_path, self.client_openai, self.style_block, self.image_model,
+            self.style_slug_for_pixelize, self.max_retries, use_cache=self.use_cache
+        )
+
+
+class RunwareBackend(ImageBackend):
+    """
+    Backend sobre RunwareService con conexión propia.
+
+    La conexión vive en un event loop dedicado en un hilo aparte, de modo que
+    se puede llamar desde los hilos del planificador de escenas.
+    """
+
+    name = "runware"
+
+    def __init__(self, style_block: str, style_slug_for_pixelize: str = "",
+                 use_cache: bool = True, api_key: str = None):
+        from .runware_connection import RunwareConnection
+        from .runware_service import RunwareService
+
+        api_key = api_key or RUNWARE_API_KEY
+        self.service = RunwareService(api_key, connection=RunwareConnection(api_key))
+        self.style_block = style_block
+        self.style_slug_for_pixelize = style_slug_for_pixelize
+        self.use_cache = use_cache
+        self._slots = threading.BoundedSemaphore(max(1, RUNWARE_IMAGE_CONCURRENCY))
+        self._loop = self.service.connection.loop
+        self._thread = threading.Thread(target=self._loop.run_forever, name="runware-backend", daemon=True)
+        self._thread.start()
+
+    def generate_scene(self, scene: SceneRequest, dest_path: str) -> str:
+        with self._slots:
+            coro = self.service._generate_scene(
+                scene.idx, scene.visual_prompt, scene.audio_text, scene.scene_ctx, dest_path,
+                self.style_block, self.style_slug_for_pixelize, use_cache=self.use_cache
+            )
+            return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self.service.close()
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class HedgedImageGenerator:
+    """Lanza duplicados de las escenas lentas en un backend secundario."""
+
+    def __init__(self, secondary: ImageBackend, stats: LatencyStats = None,
+                 percentile: float = None, budget_usd: float = None, max_workers: int = None):
+        """
+        Args:
+            secondary: Backend para los duplicados
+            stats: Histogramas de latencia (None = cargar de LATENCY_STATS_PATH)
+            percentile: Percentil que dispara el duplicado (None = HEDGE_PERCENTILE)
+            budget_usd: Gasto máximo en duplicados (None = HEDGE_BUDGET_USD)
+            max_workers: Hilos para los intentos en vuelo
+        """
+        self.secondary = secondary
+        self.stats = stats or LatencyStats()
+        self.percentile = HEDGE_PERCENTILE if percentile is None else percentile
+        self.budget_usd = HEDGE_BUDGET_USD if budget_usd is None else budget_usd
+        self.spent_usd = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        workers = max_workers or 2 * GEMINI_IMAGE_CONCURRENCY + RUNWARE_IMAGE_CONCURRENCY
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def hedge_delay(self, backend: str) -> float:
+        """Segundos de espera antes de duplicar una escena del backend."""
+        delay = self.stats.percentile(backend, self.percentile, min_samples=HEDGE_MIN_SAMPLES)
+        return HEDGE_DEFAULT_DELAY if delay is None else delay
+
+    def _reserve_hedge(self) -> bool:
+        with self._lock:
+            cost = self.secondary.cost_per_image
+            if self.spent_usd + cost > self.budget_usd:
+                return False
+            self.spent_usd += cost
+            self.hedges += 1
+            return True
+
+    def _attempt(self, backend: ImageBackend, scene: SceneRequest, dest_path: str) -> str:
+        start = time.monotonic()
+        status = backend.generate_scene(scene, dest_path)
+        if status == "generada":
+            # Los aciertos de caché no dicen nada de la latencia del backend
+            self.stats.record(backend.name, time.monotonic() - start)
+        return status
+
+    def generate_scene(self, primary: ImageBackend, scene: SceneRequest, image_path: str) -> str:
+        """
+        Genera una escena en el backend principal, duplicándola si se retrasa.
+
+        Cada intento escribe en su propio temporal; el ganador se renombra a
+        image_path y el temporal del perdedor se borra cuando termina.
+
+        Args:
+            primary: Backend principal
+            scene: Datos de la escena
+            image_path: Ruta final de la imagen
+
+        Returns:
+            Estado de la escena, con el backend ganador entre paréntesis
+
+        Raises:
+            SceneGenerationError: Si fallan todos los intentos
+        """
+        attempts = {}
+
+        def launch(backend: ImageBackend):
+            tmp_path = os.path.join(os.path.dirname(image_path), f".{scene.idx+1}.{backend.name}.png")
+            future = self._executor.submit(self._attempt, backend, scene, tmp_path)
+            attempts[future] = (backend, tmp_path)
+            return future
+
+        pending = {launch(primary)}
+        delay = self.hedge_delay(primary.name)
+        deadline = time.monotonic() + delay
+        hedged = False
+        errors = []
+        retryable = False
+
+        while pending:
+            timeout = None if hedged else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend, tmp_path = attempts[future]
+                try:
+                    status = future.result()
+                except Exception as e:
+                    errors.append(f"{backend.name}: {e}")
+                    retryable = retryable or getattr(e, "retryable", True)
+                    continue
+                os.replace(tmp_path, image_path)
+                for other in pending:
+                    other.add_done_callback(lambda _f, p=attempts[other][1]: _remove_quietly(p))
+                if backend is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return f"{status} ({backend.name})"
+
+            if not hedged:
+                hedged = True
+                reason = "falló" if errors else f"supera {delay:.0f}s (p{self.percentile:.0f})"
+                if self._reserve_hedge():
+                    print(f"   🔀 Escena {scene.idx+1}: {primary.name} {reason}; "
+                          f"duplicando en {self.secondary.name}")
+                    pending.add(launch(self.secondary))
+                elif not errors:
+                    print(f"   💸 Escena {scene.idx+1}: {primary.name} {reason}, "
+                          f"pero el presupuesto de duplicados está agotado")
+
+        # Solo es definitivo si todos los backends fallaron de forma definitiva
+        raise SceneGenerationError("; ".join(errors) or "sin resultado", retryable=retryable or not errors)
+
+    def print_summary(self) -> None:
+        """Imprime duplicados lanzados/ganados, gasto y latencias por backend."""
+        print(f"\n🔀 Duplicados: {self.hedges} lanzados, {self.hedge_wins} ganados "
+              f"(gasto estimado ${self.spent_usd:.3f} de ${self.budget_usd:.2f})")
+        self.stats.print_summary()
+
+    def close(self) -> None:
+        """Espera a los intentos en vuelo, guarda los histogramas y cierra el secundario."""
+        self._executor.shutdown(wait=True)
+        self.stats.save()
+        self.secondary.close()
@@ -0,0 +1,155 @@
+"""
+Caché en disco de respuestas de chat (opcional).
+
+La clave es un hash del modelo, los mensajes, el response_format y el resto
+de parámetros de la llamada: si una nueva ejecución repite exactamente la
+misma petición (mismo guion, mismo prompt), la respuesta se sirve desde el
+disco sin llamar a la API. Las entradas caducan a los LLM_CACHE_TTL segundos
+y, si el total supera LLM_CACHE_MAX_MB, se borran las menos usadas. El
+directorio solo se recorre al primer guardado, cada _EVICT_EVERY guardados o
+cuando el tamaño estimado supera el límite.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from ..config.settings import LLM_CACHE_DIR, LLM_CACHE_TTL, LLM_CACHE_MAX_MB
+
+# Guardados entre dos recorridos completos del almacén (limpieza de caducadas)
+_EVICT_EVERY = 50
+
+
+def llm_cache_key(model: str, messages: list, response_format: dict = None, **params) -> str:
+    """
+    Calcula la clave de caché de una petición de chat.
+
+    Args:
+        model: Modelo
+        messages: Mensajes exactamente como se envían
+        response_format: Formato de respuesta
+        **params: Resto de parámetros de la API
+
+    Returns:
+        Hash SHA-256 en hexadecimal
+    """
+    key = json.dumps(
+        {"model": model, "messages": messages, "response_format": response_format, "params": params},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Almacén de respuestas de chat con caducidad y tamaño máximo."""
+
+    def __init__(self, root: str = None, ttl: float = None, max_mb: float = None):
+        """
+        Args:
+            root: Directorio del almacén (None = LLM_CACHE_DIR)
+            ttl: Segundos de validez de una entrada (None = LLM_CACHE_TTL)
+            max_mb: Tamaño máximo del almacén en MB (None = LLM_CACHE_MAX_MB)
+        """
+        self.root = Path(root or LLM_CACHE_DIR)
+        self.ttl = LLM_CACHE_TTL if ttl is None else ttl
+        self.max_bytes = int((LLM_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        # Tamaño estimado del almacén (None = aún no se ha recorrido) y guardados desde el último recorrido
+        self._total_bytes = None
+        self._puts_since_evict = 0
+
+    def _path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        """
+        Devuelve el contenido cacheado, o None si no existe o ha caducado.
+
+        Args:
+            key: Clave de caché
+
+        Returns:
+            Contenido de la respuesta (str) o None
+        """
+        path = self._path_for(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if self.ttl > 0 and time.time() - entry.get("created", 0) > self.ttl:
+            self._remove(path)
+            return None
+
+        # Marca de uso reciente para la expulsión por tamaño
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry.get("content")
+
+    def put(self, key: str, content: str) -> None:
+        """
+        Guarda una respuesta y aplica el límite de tamaño.
+
+        Args:
+            key: Clave de caché
+            content: Contenido de la respuesta
+        """
+        path = self._path_for(key)
+        data = json.dumps({"created": time.time(), "content": content}, ensure_ascii=False).encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".part")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"   ⚠️ No se pudo guardar la respuesta en la caché: {e}")
+            return
+
+        self._puts_since_evict += 1
+        if self._total_bytes is not None:
+            self._total_bytes += len(data)
+        if (self._total_bytes is None or self._total_bytes > self.max_bytes
+                or self._puts_since_evict >= _EVICT_EVERY):
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        """
+        Borra una entrada (p.ej. una respuesta cacheada que el llamador ha rechazado).
+
+        Args:
+            key: Clave de caché
+        """
+        self._remove(self._path_for(key))
+
+    def _evict(self) -> None:
+        """Borra entradas caducadas y, si se supera el tamaño, las menos usadas."""
+        entries = []
+        now = time.time()
+        for path in self.root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if self.ttl > 0 and now - st.st_mtime > self.ttl:
+                self._remove(path)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._total_bytes = total
+        self._puts_since_evict = 0
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -2,28 +2,35 @@
 Servicio para interactuar con la API de OpenAI (GPT-5.1 y modelos de imagen).
 """
 import json
+import time
 from openai import OpenAI
-from ..config.settings import OPENAI_API_KEY
+from ..config.settings import OPENAI_API_KEY, LLM_CACHE_ENABLED
+from .api_ledger import estimate_llm_cost, record_call, track_call
+from .llm_cache import LLMCache, llm_cache_key
 
 
 class OpenAIService:
     """Cliente para servicios de OpenAI."""
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, use_cache: bool = None):
         """
         Inicializa el cliente de OpenAI.
 
         Args:
             api_key: Clave API de OpenAI. Si no se proporciona, usa la del config.
+            use_cache: Sirve desde disco las respuestas de peticiones idénticas
+                (None = LLM_CACHE_ENABLED)
         """
         self.api_key = api_key or OPENAI_API_KEY
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY no configurada")
 
         self.client = OpenAI(api_key=self.api_key)
+        self.use_cache = LLM_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = LLMCache() if self.use_cache else None
 
     def chat_completion(self, messages: list, model: str = "gpt-5.1",
-                       response_format: dict = None, **kwargs) -> dict:
+                       response_format: dict = None, use_cache: bool = True, validate=None, **kwargs) -> dict:
         """
         Realiza una llamada de chat completion.
 
@@ -31,10 +38,16 @@ class OpenAIService:
             messages: Lista de mensajes del chat
             model: Modelo a usar (default: gpt-5.1)
             response_format: Formato de respuesta (ej: {"type": "json_object"})
+            use_cache: False para saltarse la caché en esta llamada (p.ej. cuando
+                se busca una respuesta distinta cada vez); solo aplica si el
+                servicio se creó con la caché activada
+            validate: Función opcional validate(respuesta parseada) -> bool. Una
+                respuesta cacheada que no la supera se descarta y se pide de nuevo
+                a la API; una nueva que no la supera no se guarda en la caché
             **kwargs: Argumentos adicionales para la API
 
         Returns:
-            Contenido de la respuesta parseado como dict (si es JSON) o str
+            Contenido de la respuesta parseado como dict (si es JSON o esquema JSON) o str
         """
         params = {"model": model, "messages": messages}
 
@@ -43,13 +56,142 @@ class OpenAIService:
 
         params.update(kwargs)
 
-        response = self.client.chat.completions.create(**params)
-        content = response.choices[0].message.content
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = llm_cache_key(model, messages, response_format, **kwargs)
+            cached = self._cached_response(cache_key, response_format, validate)
+            if cached is not None:
+                record_call("openai", model, "chat_cached", 0.0, cost_usd=0.0,
+                            bytes_out=len(cached[0].encode("utf-8")))
+                return cached[1]
+
+        bytes_in = len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+        with track_call("openai", model, "chat", bytes_in=bytes_in) as call:
+            response = self.client.chat.completions.create(**params)
+            content = response.choices[0].message.content
+            call["bytes_out"] = len((content or "").encode("utf-8"))
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                call["units"] = usage.total_tokens
+                call["unit_kind"] = "tokens"
+                call["cost_usd"] = estimate_llm_cost(model, usage.prompt_tokens, usage.completion_tokens)
+
+        parsed = self._parse(content, response_format)
+        # Solo se cachean respuestas válidas (el JSON ya se ha podido parsear y,
+        # si se indicó, la respuesta supera validate)
+        if cache_key is not None and content and (validate is None or validate(parsed)):
+            self.cache.put(cache_key, content)
+        return parsed
+
+    def _cached_response(self, cache_key: str, response_format: dict, validate):
+        """
+        Busca una respuesta en la caché y la valida.
 
-        # Si esperamos JSON, parsearlo
-        if response_format and response_format.get("type") == "json_object":
-            return json.loads(content)
+        Returns:
+            (contenido, contenido parseado), o None si no hay entrada válida
+            (las que no se pueden parsear o no superan validate se borran)
+        """
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        try:
+            parsed = self._parse(cached, response_format)
+            if validate is None or validate(parsed):
+                return cached, parsed
+        except (TypeError, ValueError):
+            pass
+        print("   ♻️ Respuesta cacheada no válida: se descarta y se pide de nuevo")
+        self.cache.delete(cache_key)
+        return None
+
+    def chat_completion_stream(self, messages: list, model: str = "gpt-5.1",
+                               response_format: dict = None, use_cache: bool = True, validate=None, **kwargs):
+        """
+        Variante en streaming de chat_completion: va devolviendo el texto según llega.
+
+        Comparte caché con chat_completion (misma clave): si la respuesta está
+        cacheada se devuelve entera en un único fragmento.
 
+        La latencia registrada es el tiempo esperando a la API (sin contar lo
+        que tarda el consumidor entre fragmento y fragmento), junto con el
+        tiempo hasta el primer token (ttft_s).
+
+        Args:
+            messages: Lista de mensajes del chat
+            model: Modelo a usar (default: gpt-5.1)
+            response_format: Formato de respuesta (ej: {"type": "json_object"})
+            use_cache: False para saltarse la caché en esta llamada
+            validate: Como en chat_completion (se aplica a la respuesta completa)
+            **kwargs: Argumentos adicionales para la API
+
+        Yields:
+            Fragmentos de texto (str) de la respuesta, sin parsear
+        """
+        params = {"model": model, "messages": messages, "stream": True,
+                  "stream_options": {"include_usage": True}}
+
+        if response_format:
+            params["response_format"] = response_format
+
+        params.update(kwargs)
+
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = llm_cache_key(model, messages, response_format, **kwargs)
+            cached = self._cached_response(cache_key, response_format, validate)
+            if cached is not None:
+                record_call("openai", model, "chat_cached", 0.0, cost_usd=0.0,
+                            bytes_out=len(cached[0].encode("utf-8")))
+                yield cached[0]
+                return
+
+        parts = []
+        call = {"bytes_in": len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))}
+        start = time.monotonic()
+        waited = 0.0
+        try:
+            stream = iter(self.client.chat.completions.create(**params))
+            waited = time.monotonic() - start
+            while True:
+                # Solo cuenta el tiempo bloqueado esperando al siguiente fragmento
+                t0 = time.monotonic()
+                chunk = next(stream, None)
+                waited += time.monotonic() - t0
+                if chunk is None:
+                    break
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            call["ttft_s"] = waited
+                        parts.append(delta)
+                        yield delta
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    call["units"] = usage.total_tokens
+                    call["unit_kind"] = "tokens"
+                    call["cost_usd"] = estimate_llm_cost(model, usage.prompt_tokens, usage.completion_tokens)
+        except BaseException as e:
+            call["error"] = str(e)[:500]
+            record_call("openai", model, "chat_stream", waited, ok=False, **call)
+            raise
+        content = "".join(parts)
+        call["bytes_out"] = len(content.encode("utf-8"))
+        record_call("openai", model, "chat_stream", waited, ok=True, **call)
+
+        if cache_key is not None and content:
+            try:
+                parsed = self._parse(content, response_format)
+            except json.JSONDecodeError:
+                return
+            if validate is None or validate(parsed):
+                self.cache.put(cache_key, content)
+
+    @staticmethod
+    def _parse(content: str, response_format: dict = None):
+        """Parsea la respuesta como JSON si se pidió json_object o json_schema."""
+        if response_format and response_format.get("type") in ("json_object", "json_schema"):
+            return json.loads(content)
         return content
 
     def generate_image(self, prompt: str, model: str = "gpt-image-1-mini",
@@ -0,0 +1,72 @@
+"""
+Limitadores de peticiones por minuto compartidos entre hilos.
+
+Cada API key tiene su propio limitador (ventana deslizante de 60 s), de modo
+que varios servicios o ejecuciones concurrentes dentro del mismo proceso
+respetan juntos la cuota del proveedor.
+"""
+import threading
+import time
+from collections import deque
+
+_WINDOW_SECONDS = 60.0
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Limitador de ventana deslizante (máximo rpm peticiones cada 60 s)."""
+
+    def __init__(self, rpm: int):
+        """
+        Args:
+            rpm: Peticiones por minuto permitidas (0 o negativo = sin límite)
+        """
+        self.rpm = rpm
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Bloquea hasta que haya hueco en la ventana y reserva una petición.
+
+        Returns:
+            Segundos esperados
+        """
+        if self.rpm <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= _WINDOW_SECONDS:
+                    self._calls.popleft()
+                if len(self._calls) < self.rpm:
+                    self._calls.append(now)
+                    return waited
+                wait = _WINDOW_SECONDS - (now - self._calls[0])
+            time.sleep(wait)
+            waited += wait
+
+
+def get_rate_limiter(api_key: str, rpm: int) -> RateLimiter:
+    """
+    Devuelve el limitador compartido de una API key.
+
+    Args:
+        api_key: Clave de la API (identifica la cuota)
+        rpm: Peticiones por minuto; si cambia, se actualiza el limitador existente
+
+    Returns:
+        RateLimiter asociado a la clave
+    """
+    with _registry_lock:
+        limiter = _registry.get(api_key)
+        if limiter is None:
+            limiter = RateLimiter(rpm)
+            _registry[api_key] = limiter
+        else:
+            limiter.rpm = rpm
+        return limiter
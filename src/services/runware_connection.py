@@ -0,0 +1,194 @@
+"""
+Conexión persistente a Runware compartida entre etapas (imágenes, animación, lotes).
+
+La conexión websocket se abre una sola vez por API key y se reutiliza en todas
+las llamadas del proceso. Antes de cada uso se comprueba su estado y, si se ha
+caído, se reconecta automáticamente.
+"""
+import asyncio
+import atexit
+import threading
+
+try:
+    from runware import Runware
+    RUNWARE_AVAILABLE = True
+except ImportError:
+    RUNWARE_AVAILABLE = False
+    Runware = None
+
+# Fragmentos de mensajes de error que indican una conexión caída
+_CONNECTION_ERROR_HINTS = ("websocket", "connection", "not connected", "closed", "disconnected")
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _looks_like_connection_error(error: Exception) -> bool:
+    """¿El error se debe a la conexión (y no a la petición en sí)?"""
+    if isinstance(error, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    message = str(error).lower()
+    return any(hint in message for hint in _CONNECTION_ERROR_HINTS)
+
+
+class RunwareConnection:
+    """Conexión reutilizable a Runware con comprobación de estado y reconexión."""
+
+    def __init__(self, api_key: str):
+        """
+        Args:
+            api_key: Clave API de Runware
+        """
+        if not RUNWARE_AVAILABLE:
+            raise ImportError("Runware no está instalado. Ejecuta: pip install runware")
+
+        self.api_key = api_key
+        # Event loop propio: el websocket queda ligado a él y sobrevive entre etapas
+        self.loop = asyncio.new_event_loop()
+        self._client = None
+        self._client_loop = None
+        self._lock = None
+        self._lock_loop = None
+        self.connects = 0
+
+    def run(self, coro):
+        """
+        Ejecuta una corrutina en el event loop de la conexión.
+
+        Usar este método en lugar de asyncio.run() permite reutilizar el mismo
+        websocket entre llamadas sucesivas.
+
+        Args:
+            coro: Corrutina a ejecutar
+
+        Returns:
+            Resultado de la corrutina
+        """
+        return self.loop.run_until_complete(coro)
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _is_healthy(self) -> bool:
+        """Comprueba que el cliente existe, pertenece a este loop y sigue conectado."""
+        if self._client is None or self._client_loop is not asyncio.get_running_loop():
+            return False
+        for name in ("connected", "isWebsocketReadyState"):
+            check = getattr(self._client, name, None)
+            if isinstance(check, bool):
+                return check
+            if callable(check):
+                try:
+                    return bool(check())
+                except Exception:
+                    return False
+        return True
+
+    async def get(self):
+        """
+        Devuelve el cliente conectado, conectando o reconectando si hace falta.
+
+        Returns:
+            Instancia de Runware conectada
+        """
+        async with self._get_lock():
+            if self._is_healthy():
+                return self._client
+
+            if self._client is not None and self._client_loop is asyncio.get_running_loop():
+                print("   🔄 Conexión con Runware perdida, reconectando...")
+                await self._disconnect_quietly(self._client)
+
+            client = Runware(api_key=self.api_key)
+            await client.connect()
+            self._client = client
+            self._client_loop = asyncio.get_running_loop()
+            self.connects += 1
+            print("✅ Conectado a Runware API (conexión compartida).")
+            return client
+
+    async def invalidate(self, client=None) -> None:
+        """
+        Marca la conexión como caída para que la próxima llamada reconecte.
+
+        Args:
+            client: Cliente que falló (si ya se sustituyó por otro, no hace nada)
+        """
+        async with self._get_lock():
+            if self._client is None or (client is not None and client is not self._client):
+                return
+            stale, self._client = self._client, None
+            await self._disconnect_quietly(stale)
+
+    async def call(self, fn):
+        """
+        Ejecuta fn(cliente) reintentando una vez tras reconectar si falla la conexión.
+
+        Args:
+            fn: Función que recibe el cliente y devuelve una corrutina
+
+        Returns:
+            Resultado de la llamada
+        """
+        client = await self.get()
+        try:
+            return await fn(client)
+        except Exception as e:
+            if not _looks_like_connection_error(e):
+                raise
+            print(f"   ⚠️  Error de conexión con Runware ({e}); reintentando tras reconectar")
+            await self.invalidate(client)
+            client = await self.get()
+            return await fn(client)
+
+    @staticmethod
+    async def _disconnect_quietly(client) -> None:
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """Cierra el websocket (si está abierto en el loop propio) y el event loop."""
+        if self.loop.is_closed():
+            return
+        if self._client is not None and self._client_loop is self.loop:
+            self.loop.run_until_complete(self._disconnect_quietly(self._client))
+            print("🔌 Desconectado de Runware API.")
+        self._client = None
+        self.loop.close()
+
+
+def get_shared_connection(api_key: str) -> RunwareConnection:
+    """
+    Devuelve la conexión compartida de una API key (la crea la primera vez).
+
+    Args:
+        api_key: Clave API de Runware
+
+    Returns:
+        RunwareConnection reutilizable en todo el proceso
+    """
+    with _registry_lock:
+        conn = _registry.get(api_key)
+        if conn is None or conn.loop.is_closed():
+            conn = RunwareConnection(api_key)
+            _registry[api_key] = conn
+        return conn
+
+
+@atexit.register
+def close_shared_connections() -> None:
+    """Cierra todas las conexiones compartidas (se llama también al salir)."""
+    with _registry_lock:
+        conns = list(_registry.values())
+        _registry.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
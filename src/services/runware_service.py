@@ -3,17 +3,25 @@ Servicio para interactuar con Runware (generación y animación de imágenes).
 """
 import os
 import re
-import time
 import base64
 import io
 import asyncio
+import contextlib
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageOps
 
-from ..config.settings import RUNWARE_API_KEY, QWEN_AIR_ID, NEGATIVE_PROMPT
+from ..config.settings import (
+    RUNWARE_API_KEY, QWEN_AIR_ID, NEGATIVE_PROMPT, RUNWARE_IMAGE_CONCURRENCY,
+    RUNWARE_ANIMATION_CONCURRENCY, ANIMATION_UPLOAD_FORMAT, ANIMATION_UPLOAD_QUALITY
+)
 from ..config.styles import _build_runware_prompt
-from ..media.image_proc import pixelize_image
+from ..media.image_cache import ImageCache, image_cache_key
+from ..media.postprocess import describe_steps, get_postprocess_pool, postprocess_steps_for_style
+from .api_ledger import track_call
+from .runware_connection import get_shared_connection
+from .scene_scheduler import SceneGenerationError, SceneReport, run_scenes_async
 
 # Intentar importar Runware
 try:
@@ -27,15 +35,63 @@ except ImportError:
     IImageInference = None
 
 
+# Dimensiones soportadas por Seedance 1.0 Pro Fast (bytedance:2@2): (ancho, alto, ratio, nombre)
+SEEDANCE_DIMENSIONS = [
+    (864, 480, 1.800, "16:9 landscape"),
+    (736, 544, 1.353, "4:3 landscape"),
+    (640, 640, 1.000, "1:1 square"),
+    (544, 736, 0.739, "3:4 portrait"),
+    (480, 864, 0.556, "9:16 portrait"),
+    (416, 960, 0.433, "9:21 portrait"),
+    (960, 416, 2.308, "21:9 landscape"),
+]
+
+
+class _SharedBudget:
+    """
+    Presupuesto de concurrencia compartido entre etapas (imágenes y animaciones).
+
+    Funciona como un semáforo, pero los waiters con prioridad se atienden
+    antes que el resto aunque hayan llegado más tarde.
+    """
+
+    def __init__(self, size: int):
+        self.free = size
+        self.priority_waiting = 0
+        self.cond = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: bool = False):
+        async with self.cond:
+            if priority:
+                self.priority_waiting += 1
+            try:
+                await self.cond.wait_for(
+                    lambda: self.free > 0 and (priority or self.priority_waiting == 0)
+                )
+            finally:
+                if priority:
+                    self.priority_waiting -= 1
+                    self.cond.notify_all()
+            self.free -= 1
+        try:
+            yield
+        finally:
+            async with self.cond:
+                self.free += 1
+                self.cond.notify_all()
+
+
 class RunwareService:
     """Cliente para Runware."""
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, connection=None):
         """
         Inicializa el servicio de Runware.
 
         Args:
             api_key: Clave API de Runware. Si no se proporciona, usa la del config.
+            connection: RunwareConnection propia (None = la compartida del proceso)
         """
         if not RUNWARE_AVAILABLE:
             raise ImportError(
@@ -46,6 +102,160 @@ class RunwareService:
         if not self.api_key:
             raise ValueError("RUNWARE_API_KEY no configurada")
 
+        # Conexión websocket compartida por todas las etapas y proyectos del proceso
+        self.connection = connection or get_shared_connection(self.api_key)
+        self.image_cache = ImageCache()
+        self.postprocess = get_postprocess_pool()
+        # Entradas de animación ya codificadas: (ruta, mtime, tamaño) -> (data URI, ancho, alto, nombre)
+        self._animation_inputs = {}
+
+    def run(self, coro):
+        """
+        Ejecuta una corrutina del servicio reutilizando la conexión compartida.
+
+        Sustituye a asyncio.run(): el websocket no se cierra entre etapas.
+
+        Args:
+            coro: Corrutina a ejecutar (p.ej. generate_visuals_for_script(...))
+
+        Returns:
+            Resultado de la corrutina
+        """
+        if self.connection.loop.is_closed():
+            self.connection = get_shared_connection(self.api_key)
+        return self.connection.run(coro)
+
+    def close(self) -> None:
+        """Cierra la conexión compartida con Runware."""
+        self.connection.close()
+
+    async def _fetch_bytes(self, url: str) -> bytes:
+        """Descarga un archivo a memoria en un hilo aparte para no bloquear el event loop."""
+        def fetch():
+            response = requests.get(url, timeout=120)
+            response.raise_for_status()
+            return response.content
+        return await asyncio.to_thread(fetch)
+
+    async def _download(self, url: str, dest_path: str) -> None:
+        """Descarga un archivo en un hilo aparte para no bloquear el event loop."""
+        def fetch():
+            response = requests.get(url, timeout=120)
+            response.raise_for_status()
+            # Temporal + renombrado: nunca se escribe dentro de un enlace a la caché
+            tmp_path = f"{dest_path}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(response.content)
+            os.replace(tmp_path, dest_path)
+        await asyncio.to_thread(fetch)
+
+    async def _generate_scene(
+        self,
+        i: int,
+        visual_prompt: str,
+        audio_text: str,
+        scene_context: str,
+        image_path: str,
+        style_block: str,
+        style_slug_for_pixelize: str,
+        use_cache: bool = True,
+        slot=None
+    ) -> str:
+        """
+        Genera y guarda la imagen de una escena sobre la conexión compartida.
+
+        Si el prompt final y los parámetros coinciden con una imagen ya
+        generada (en cualquier proyecto), se reutiliza desde la caché. slot()
+        (si se da) solo envuelve la inferencia: la descarga y el postproceso
+        (en el pool de procesos) no ocupan hueco de concurrencia en Runware.
+
+        Returns:
+            "generada" o "caché" según el origen de la imagen
+
+        Raises:
+            SceneGenerationError: Si la escena no se pudo generar
+        """
+        image_id = os.path.basename(image_path)
+        print(f"🖼️  Generando imagen {image_id} (Audio: '{audio_text[:40]}...'):")
+        print(f"   Llamando con Visual Prompt: '{visual_prompt[:60]}...'")
+
+        try:
+            # Construir prompt con contexto de consistencia
+            final_prompt = _build_runware_prompt(style_block, visual_prompt, scene_context, max_length=1850)
+
+            # Log de depuración
+            prompt_length = len(final_prompt)
+            print("\n" + "="*80)
+            print(f"   DEBUG: Preparando prompt para Qwen (Escena {i+1})")
+            print(f"   LONGITUD TOTAL: {prompt_length} caracteres (Límite: 1900)")
+            if prompt_length > 1900:
+                print("   !!!!!!!!!! ALERTA: EL PROMPT SUPERA EL LÍMITE !!!!!!!!!")
+            print("="*80)
+            print(final_prompt)
+            print("="*80 + "\n")
+
+            # Parámetros de Runware
+            params = {
+                "positivePrompt": final_prompt,
+                "negativePrompt": NEGATIVE_PROMPT,
+                "model": QWEN_AIR_ID,
+                "width": 768,   # 9:16
+                "height": 1344, # 9:16
+                "numberResults": 1,
+                "includeCost": True,
+                "CFGScale": 2.5,
+                "steps": 20
+            }
+
+            steps = postprocess_steps_for_style(style_slug_for_pixelize)
+            cache_key = image_cache_key(
+                final_prompt, QWEN_AIR_ID, negative_prompt=NEGATIVE_PROMPT,
+                width=params["width"], height=params["height"],
+                cfg_scale=params["CFGScale"], steps=params["steps"], seed=params.get("seed"),
+                postprocess=describe_steps(steps)
+            )
+            if use_cache and self.image_cache.fetch(cache_key, image_path):
+                print(f"   ♻️  Escena {i+1}: mismo prompt ya generado, imagen reutilizada de la caché")
+                return "caché"
+
+            request = IImageInference(**params)
+            async with (slot() if slot else contextlib.nullcontext()):
+                with track_call("runware", QWEN_AIR_ID, "image",
+                                bytes_in=len(final_prompt.encode("utf-8"))) as call:
+                    images = await self.connection.call(lambda rw: rw.imageInference(requestImage=request))
+                    if images and getattr(images[0], "cost", None):
+                        call["cost_usd"] = float(images[0].cost)
+
+            if not images:
+                raise RuntimeError("La API de Runware no devolvió imágenes.")
+
+            # Procesar respuesta
+            image_res = images[0]
+            image_url = image_res.imageURL
+            cost = image_res.cost if hasattr(image_res, 'cost') and image_res.cost else "N/A"
+
+            # Descargar a memoria, postprocesar en el pool de procesos y escribir una sola vez
+            image_data = await self._fetch_bytes(image_url)
+            if steps:
+                print(f"   ↳ Escena {i+1}: postproceso en segundo plano "
+                      f"({', '.join(name for name, _ in steps)})")
+            await asyncio.wrap_future(self.postprocess.submit(image_data, image_path, steps))
+            await asyncio.to_thread(self.image_cache.store, cache_key, image_path)
+
+            cost_str = f" (Coste: ${cost})" if cost != "N/A" else ""
+            print(f"   ✔ Guardada: {image_path}{cost_str}")
+            return "generada"
+
+        except Exception as e:
+            print(f"❌ Error en escena {i+1} (Runware): {e}")
+            if "1900 characters" in str(e):
+                print("   !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+                print("   ERROR: El prompt ha superado los 1900 caracteres.")
+                print("   Revisa la longitud del brief.txt y de los estilos.")
+                print("   !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+            # Un prompt demasiado largo fallará igual en cada ronda
+            raise SceneGenerationError(str(e), retryable="1900 characters" not in str(e)) from e
+
     async def generate_visuals_for_script(
         self,
         visual_prompts_list: list,
@@ -54,134 +264,173 @@ class RunwareService:
         project_path: str,
         style_block: str,
         overwrite: bool,
-        style_slug_for_pixelize: str = ""
+        style_slug_for_pixelize: str = "",
+        max_concurrency: int = None,
+        animate: bool = False,
+        use_cache: bool = True,
+        scene_stream=None
     ) -> bool:
         """
         Genera imágenes con Runware (Qwen-Image) de forma async.
 
+        Las escenas se lanzan a la vez sobre una única conexión, con un máximo
+        de max_concurrency inferencias en vuelo. Con animate=True, la animación
+        de cada escena se encola en cuanto su N.png está guardado, compartiendo
+        conexión y presupuesto de concurrencia con las imágenes pendientes.
+        Una escena fallida no detiene a las demás: se reintenta al final y se
+        imprime una tabla con el estado de cada escena.
+
         Args:
             visual_prompts_list: Lista de prompts visuales
             audio_scenes_list: Lista de textos de audio (para logs)
             scene_contexts_list: Lista de contextos de consistencia
             project_path: Ruta del proyecto
             style_block: Bloque de estilo visual
-            overwrite: ¿Sobrescribir imágenes existentes?
+            overwrite: ¿Sobrescribir imágenes (y videos) existentes?
             style_slug_for_pixelize: Slug del estilo (para detectar pixel art)
+            max_concurrency: Inferencias simultáneas (None = RUNWARE_IMAGE_CONCURRENCY,
+                más RUNWARE_ANIMATION_CONCURRENCY si se anima)
+            animate: Anima cada imagen con Seedance en cuanto está lista (N.mp4)
+            use_cache: Reutiliza imágenes de la caché si el prompt final no cambió
+            scene_stream: Iterable opcional de (índice, prompt visual, contexto) que
+                sustituye a visual_prompts_list/scene_contexts_list; cada escena
+                se lanza en cuanto el iterable la produce (prompts en streaming)
 
         Returns:
-            True si todas las imágenes se generaron correctamente
+            True si todas las imágenes (y animaciones) se generaron correctamente
         """
         print(f"🎨 Generando imágenes con Runware (Opción ahorro: Qwen-Image)...")
         print(f"   Modelo: Qwen-Image ({QWEN_AIR_ID})")
         print(f"   Parámetros: CFGScale=2.5, Steps=20")
 
-        runware = None
+        default_concurrency = RUNWARE_IMAGE_CONCURRENCY
+        if animate:
+            default_concurrency += RUNWARE_ANIMATION_CONCURRENCY
+        concurrency = max(1, max_concurrency or default_concurrency)
+        print(f"   Concurrencia: {concurrency} inferencias simultáneas"
+              f"{' (imágenes + animaciones)' if animate else ''}")
+
         all_images_successful = True
 
         try:
-            # Conectar a Runware
-            runware = Runware(api_key=self.api_key)
-            await runware.connect()
-            print("\n✅ Conectado a Runware API para generación de imágenes.")
-
-            # Iterar sobre la lista de prompts visuales
-            for i, visual_prompt in enumerate(visual_prompts_list):
-
-                # Obtenemos datos de la escena para los logs y el nombre de archivo
-                image_id = f"{i+1}.png"
-                audio_text = audio_scenes_list[i] if i < len(audio_scenes_list) else ""
-
-                print(f"🖼️  Generando imagen {image_id} (Audio: '{audio_text[:40]}...'):")
-                print(f"   Llamando con Visual Prompt: '{visual_prompt[:60]}...'")
-                image_path = os.path.join(project_path, "images", image_id)
-                os.makedirs(os.path.dirname(image_path), exist_ok=True)
-
-                if os.path.exists(image_path) and not overwrite:
-                    print(f"   ✓ Imagen {image_id} ya existe, saltando generación.")
-                    continue
+            # Conexión compartida (se abre solo la primera vez)
+            await self.connection.get()
+
+            budget = _SharedBudget(concurrency)
+            report = SceneReport()
+            images_done = {}
+
+            async def run_animation(i: int, image_path: str) -> str:
+                video_path = os.path.join(os.path.dirname(image_path), f"{i+1}.mp4")
+                if os.path.exists(video_path) and not overwrite:
+                    print(f"✓ Video {i+1}.mp4 ya existe, saltando animación.")
+                    return "existente"
+                # Las animaciones tienen prioridad: la escena N no espera a que acaben todas las imágenes
+                async with budget.slot(priority=True):
+                    ok = await self.animate_single_image(None, image_path, video_path, str(i + 1))
+                if not ok:
+                    raise SceneGenerationError("la animación falló")
+                return "animada"
+
+            async def run_scene(job) -> str:
+                i, visual_prompt, scene_context, image_path = job
+                # En un reintento no se regenera la imagen si ya salió bien (solo falló la animación)
+                status = images_done.get(i)
+                if status is None:
+                    audio_text = audio_scenes_list[i] if i < len(audio_scenes_list) else ""
+                    status = await self._generate_scene(
+                        i, visual_prompt, audio_text, scene_context,
+                        image_path, style_block, style_slug_for_pixelize, use_cache=use_cache,
+                        slot=budget.slot
+                    )
+                    images_done[i] = status
+                if animate:
+                    return f"{status}+{await run_animation(i, image_path)}"
+                return status
+
+            if scene_stream is None:
+                scene_stream = (
+                    (i, visual_prompt,
+                     scene_contexts_list[i] if scene_contexts_list and i < len(scene_contexts_list) else "")
+                    for i, visual_prompt in enumerate(visual_prompts_list)
+                )
 
-                image_generated = False
-
-                try:
-                    # Construir prompt con contexto de consistencia
-                    scene_context = ""
-                    if scene_contexts_list and i < len(scene_contexts_list):
-                        scene_context = scene_contexts_list[i]
-
-                    final_prompt = _build_runware_prompt(style_block, visual_prompt, scene_context, max_length=1850)
-
-                    # Log de depuración
-                    prompt_length = len(final_prompt)
-                    print("\n" + "="*80)
-                    print(f"   DEBUG: Preparando prompt para Qwen (Escena {i+1})")
-                    print(f"   LONGITUD TOTAL: {prompt_length} caracteres (Límite: 1900)")
-                    if prompt_length > 1900:
-                        print("   !!!!!!!!!! ALERTA: EL PROMPT SUPERA EL LÍMITE !!!!!!!!!")
-                    print("="*80)
-                    print(final_prompt)
-                    print("="*80 + "\n")
-
-                    # Parámetros de Runware
-                    params = {
-                        "positivePrompt": final_prompt,
-                        "negativePrompt": NEGATIVE_PROMPT,
-                        "model": QWEN_AIR_ID,
-                        "width": 768,   # 9:16
-                        "height": 1344, # 9:16
-                        "numberResults": 1,
-                        "includeCost": True,
-                        "CFGScale": 2.5,
-                        "steps": 20
-                    }
-
-                    request = IImageInference(**params)
-                    images = await runware.imageInference(requestImage=request)
-
-                    if not images:
-                        raise RuntimeError("La API de Runware no devolvió imágenes.")
-
-                    # Procesar respuesta
-                    image_res = images[0]
-                    image_url = image_res.imageURL
-                    cost = image_res.cost if hasattr(image_res, 'cost') and image_res.cost else "N/A"
-
-                    # Descargar y guardar la imagen
-                    response = requests.get(image_url, timeout=120)
-                    response.raise_for_status()
-                    with open(image_path, "wb") as f:
-                        f.write(response.content)
-
-                    # Postproceso: Pixel Art
-                    if "pixel" in style_slug_for_pixelize:
-                        pixelize_image(image_path, small_edge=256)
-                        print("   ↳ postproceso: pixelize aplicado (downscale + NEAREST)")
-
-                    cost_str = f" (Coste: ${cost})" if cost != "N/A" else ""
-                    print(f"   ✔ Guardada: {image_path}{cost_str}")
-                    image_generated = True
-
-                except Exception as e:
-                    print(f"❌ Error en escena {i+1} (Runware): {e}")
-                    if "1900 characters" in str(e):
-                        print("   !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-                        print("   ERROR: El prompt ha superado los 1900 caracteres.")
-                        print("   Revisa la longitud del brief.txt y de los estilos.")
-                        print("   !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-                    all_images_successful = False
-                    break  # Detener en caso de error
-
-                time.sleep(1)  # Pausa entre imágenes
+            async def iter_jobs():
+                scenes = iter(scene_stream)
+                loop = asyncio.get_running_loop()
+                # El iterable puede bloquear (prompts en streaming): se consume fuera del
+                # bucle de eventos, siempre en el mismo hilo (su estado por hilo se conserva)
+                with ThreadPoolExecutor(max_workers=1) as reader:
+                    while True:
+                        scene = await loop.run_in_executor(reader, next, scenes, None)
+                        if scene is None:
+                            break
+                        i, visual_prompt, scene_context = scene
+                        image_id = f"{i+1}.png"
+                        image_path = os.path.join(project_path, "images", image_id)
+                        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+
+                        if os.path.exists(image_path) and not overwrite:
+                            print(f"   ✓ Imagen {image_id} ya existe, saltando generación.")
+                            images_done[i] = "existente"
+                            if not animate:
+                                report.mark(i + 1, "existente")
+                                continue
+
+                        yield (i + 1, (i, visual_prompt, scene_context, image_path))
+
+            all_images_successful = await run_scenes_async(iter_jobs(), run_scene, report)
+            report.print_table("Estado de las escenas (Runware)")
 
         except Exception as e:
             print(f"❌ Error fatal conectando o generando con Runware: {e}")
             all_images_successful = False
-        finally:
-            if runware:
-                await runware.disconnect()
-                print("\n🔌 Desconectado de Runware API (imágenes).")
 
         return all_images_successful
 
+    def _prepare_animation_input(self, image_path: str) -> tuple:
+        """
+        Reduce la imagen a la resolución de Seedance y la codifica una sola vez.
+
+        El resultado se memoriza por ruta, fecha de modificación y tamaño: los
+        reintentos y las re-animaciones de la misma imagen no vuelven a codificar.
+
+        Args:
+            image_path: Ruta a la imagen PNG
+
+        Returns:
+            (data URI, ancho, alto, nombre del formato)
+        """
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+        cached = self._animation_inputs.get(key)
+        if cached is not None:
+            return cached
+
+        with Image.open(image_path) as img:
+            width, height = img.size
+            aspect_ratio = width / height
+            print(f"   📐 Imagen original: {width}x{height} (ratio: {aspect_ratio:.3f})")
+
+            # Encontrar dimensión más cercana
+            output_width, output_height, _, format_name = min(
+                SEEDANCE_DIMENSIONS, key=lambda d: abs(d[2] - aspect_ratio)
+            )
+            print(f"   → Usando dimensión: {output_width}x{output_height} ({format_name})")
+
+            # Recorte centrado + reducción a la resolución de salida (no se sube más de lo que se usa)
+            frame = ImageOps.fit(img.convert("RGB"), (output_width, output_height), Image.LANCZOS)
+
+        fmt = "webp" if ANIMATION_UPLOAD_FORMAT == "webp" else "jpeg"
+        buffer = io.BytesIO()
+        frame.save(buffer, format=fmt.upper(), quality=ANIMATION_UPLOAD_QUALITY)
+        image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        print(f"   📦 Entrada codificada: {fmt.upper()} {len(buffer.getvalue()) // 1024} KB")
+
+        result = (f"data:image/{fmt};base64,{image_data}", output_width, output_height, format_name)
+        self._animation_inputs[key] = result
+        return result
+
     async def animate_single_image(
         self,
         runware_instance,
@@ -193,7 +442,8 @@ class RunwareService:
         Anima una imagen estática con Seedance 1.0 Pro Fast.
 
         Args:
-            runware_instance: Instancia de Runware ya conectada
+            runware_instance: Instancia de Runware ya conectada, o None para usar
+                la conexión compartida del servicio (con reconexión automática)
             image_path: Ruta a la imagen PNG
             video_path: Ruta de salida del video MP4
             image_number: Número de imagen (para logs)
@@ -207,35 +457,10 @@ class RunwareService:
             try:
                 print(f"🎥 Animando imagen {image_number}...")
 
-                # Leer y procesar la imagen
-                img = Image.open(image_path)
-                width, height = img.size
-                aspect_ratio = width / height
-
-                print(f"   📐 Imagen original: {width}x{height} (ratio: {aspect_ratio:.3f})")
-
-                # Dimensiones soportadas por Seedance 1.0 Pro Fast (bytedance:2@2)
-                SUPPORTED_DIMENSIONS = [
-                    (864, 480, 1.800, "16:9 landscape"),
-                    (736, 544, 1.353, "4:3 landscape"),
-                    (640, 640, 1.000, "1:1 square"),
-                    (544, 736, 0.739, "3:4 portrait"),
-                    (480, 864, 0.556, "9:16 portrait"),
-                    (416, 960, 0.433, "9:21 portrait"),
-                    (960, 416, 2.308, "21:9 landscape"),
-                ]
-
-                # Encontrar dimensión más cercana
-                best_match = min(SUPPORTED_DIMENSIONS, key=lambda d: abs(d[2] - aspect_ratio))
-                output_width, output_height, _, format_name = best_match
-
-                print(f"   → Usando dimensión: {output_width}x{output_height} ({format_name})")
-
-                # Convertir imagen a base64
-                buffer = io.BytesIO()
-                img.save(buffer, format='PNG')
-                image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                image_uri = f"data:image/png;base64,{image_data}"
+                # Imagen reducida y codificada una sola vez (se reutiliza en reintentos)
+                image_uri, output_width, output_height, format_name = await asyncio.to_thread(
+                    self._prepare_animation_input, image_path
+                )
 
                 # Crear request para Runware usando Seedance 1.0 Pro Fast
                 request = IVideoInference(
@@ -255,18 +480,21 @@ class RunwareService:
                 )
 
                 # Generar video
-                videos = await runware_instance.videoInference(requestVideo=request)
+                with track_call("runware", "bytedance:2@2", "video", retries=attempt,
+                                bytes_in=len(image_uri), units=6, unit_kind="seconds") as call:
+                    if runware_instance is not None:
+                        videos = await runware_instance.videoInference(requestVideo=request)
+                    else:
+                        videos = await self.connection.call(lambda rw: rw.videoInference(requestVideo=request))
+                    if videos and getattr(videos[0], "cost", None):
+                        call["cost_usd"] = float(videos[0].cost)
 
                 if videos and len(videos) > 0:
                     video = videos[0]
 
                     # Descargar el video desde la URL
                     print(f"   📥 Descargando video desde Runware...")
-                    response = requests.get(video.videoURL, timeout=120)
-                    response.raise_for_status()
-
-                    with open(video_path, "wb") as video_file:
-                        video_file.write(response.content)
+                    await self._download(video.videoURL, video_path)
 
                     # Mostrar información de costo
                     if hasattr(video, 'cost') and video.cost:
@@ -290,13 +518,18 @@ class RunwareService:
 
         return False
 
-    def animate_images(self, project_path: str, overwrite: bool = False) -> bool:
+    def animate_images(self, project_path: str, overwrite: bool = False,
+                       max_concurrency: int = None) -> bool:
         """
         Anima todas las imágenes PNG del proyecto usando Seedance 1.0 Pro Fast.
 
+        Los trabajos se lanzan en paralelo sobre la misma conexión (hasta
+        max_concurrency a la vez); cada uno conserva sus propios reintentos.
+
         Args:
             project_path: Ruta al directorio del proyecto
             overwrite: Si es True, regenera videos existentes
+            max_concurrency: Animaciones simultáneas (None = RUNWARE_ANIMATION_CONCURRENCY)
 
         Returns:
             True si todas las animaciones se generaron correctamente
@@ -327,47 +560,42 @@ class RunwareService:
         image_files.sort(key=lambda x: int(x.split('.')[0]))
         print(f"📁 Encontradas {len(image_files)} imágenes para animar: {', '.join(image_files)}\n")
 
-        # Función async principal
-        async def animate_all():
-            runware = Runware(api_key=self.api_key)
-            await runware.connect()
-            print("✅ Conectado a Runware API\n")
+        concurrency = max(1, max_concurrency or RUNWARE_ANIMATION_CONCURRENCY)
 
-            all_videos_successful = True
+        # Trabajos pendientes (los videos existentes se saltan salvo overwrite)
+        jobs = []
+        for image_file in image_files:
+            image_number = image_file.split('.')[0]
+            video_path = os.path.join(images_path, f"{image_number}.mp4")
+            if os.path.exists(video_path) and not overwrite:
+                print(f"✓ Video {image_number}.mp4 ya existe, saltando animación.")
+                continue
+            jobs.append((image_file, image_number, os.path.join(images_path, image_file), video_path))
 
-            try:
-                for image_file in image_files:
-                    image_number = image_file.split('.')[0]
-                    image_path = os.path.join(images_path, image_file)
-                    video_path = os.path.join(images_path, f"{image_number}.mp4")
+        # Función async principal
+        async def animate_all():
+            await self.connection.get()
+            print(f"   {concurrency} animaciones simultáneas\n")
 
-                    # Si ya existe y no queremos sobrescribir
-                    if os.path.exists(video_path) and not overwrite:
-                        print(f"✓ Video {image_number}.mp4 ya existe, saltando animación.")
-                        continue
+            semaphore = asyncio.Semaphore(concurrency)
+            progress = {"done": 0}
 
-                    # Animar imagen
+            async def run_job(image_file, image_number, image_path, video_path) -> bool:
+                async with semaphore:
                     success = await self.animate_single_image(
-                        runware, image_path, video_path, image_number
+                        None, image_path, video_path, image_number
                     )
+                progress["done"] += 1
+                status = "✔" if success else "🚫"
+                print(f"   {status} [{progress['done']}/{len(jobs)}] Animación de {image_file} "
+                      f"{'completada' if success else 'fallida'}")
+                return success
 
-                    if not success:
-                        print(f"🚫 Falló la animación de {image_file}")
-                        all_videos_successful = False
-
-                    # Pequeña pausa entre llamadas
-                    await asyncio.sleep(1)
-
-            finally:
-                try:
-                    await runware.disconnect()
-                except Exception as e:
-                    print(f"   ⚠️  Advertencia al cerrar conexión: {e}")
-
-            return all_videos_successful
+            results = await asyncio.gather(*(run_job(*job) for job in jobs))
+            return all(results)
 
-        # Ejecutar el loop async
-        all_successful = asyncio.run(animate_all())
+        # Ejecutar en el loop de la conexión compartida (sin reconectar)
+        all_successful = self.run(animate_all())
 
         if all_successful:
             print("\n✅ Todas las imágenes han sido animadas con éxito.")
@@ -0,0 +1,209 @@
+"""
+Planificador de escenas con aislamiento de fallos.
+
+Una escena que falla no detiene al resto: se aparca en una cola de
+reintentos y se vuelve a lanzar al final, tras una espera creciente. Los
+fallos permanentes (SceneGenerationError con retryable=False) no se
+reintentan. Al terminar se imprime una tabla con el estado de cada escena.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from ..config.settings import SCENE_RETRY_ROUNDS, SCENE_RETRY_BACKOFF
+
+
+class SceneGenerationError(RuntimeError):
+    """La escena no se pudo generar tras agotar sus intentos internos."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        """
+        Args:
+            message: Motivo del fallo
+            retryable: False si repetir la escena no puede cambiar el resultado
+                (p.ej. prompt bloqueado sin reescritura posible)
+        """
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _is_retryable(error: Exception) -> bool:
+    return getattr(error, "retryable", True)
+
+
+def _failure_detail(error: Exception) -> str:
+    return str(error) if _is_retryable(error) else f"{error} (sin reintento)"
+
+
+@dataclass
+class SceneStatus:
+    """Estado final de una escena."""
+    scene: int
+    status: str = "pendiente"
+    rounds: int = 0
+    seconds: float = 0.0
+    detail: str = ""
+
+
+class SceneReport:
+    """Tabla de estados por escena (segura entre hilos)."""
+
+    def __init__(self):
+        self.scenes = {}
+        self._lock = threading.Lock()
+
+    def mark(self, scene: int, status: str, detail: str = "", seconds: float = 0.0,
+             new_round: bool = False) -> None:
+        """
+        Actualiza el estado de una escena.
+
+        Args:
+            scene: Número de escena (1-based)
+            status: Estado ("generada", "caché", "existente", "fallida"...)
+            detail: Detalle opcional (error, coste...)
+            seconds: Tiempo empleado en esta ronda
+            new_round: Cuenta una ronda más de intentos
+        """
+        with self._lock:
+            entry = self.scenes.setdefault(scene, SceneStatus(scene))
+            entry.status = status
+            entry.detail = detail
+            entry.seconds += seconds
+            if new_round:
+                entry.rounds += 1
+
+    def failed(self) -> list:
+        """Escenas cuyo último estado es un fallo."""
+        return sorted(s.scene for s in self.scenes.values() if s.status == "fallida")
+
+    def print_table(self, title: str = "Estado por escena") -> None:
+        """Imprime la tabla de estados."""
+        if not self.scenes:
+            return
+        print(f"\n📋 {title}:")
+        print(f"   {'Escena':>6}  {'Estado':<18}  {'Rondas':>6}  {'Tiempo':>7}  Detalle")
+        for s in sorted(self.scenes.values(), key=lambda x: x.scene):
+            icon = "❌" if s.status == "fallida" else "✅"
+            print(f"   {s.scene:>6}  {s.status:<18}  {s.rounds:>6}  {s.seconds:>6.1f}s  {icon} {s.detail[:80]}")
+        failed = self.failed()
+        if failed:
+            print(f"   ⚠️ Escenas fallidas: {', '.join(str(n) for n in failed)} "
+                  f"(vuelve a ejecutar para reintentarlas; las completadas se reutilizan)")
+
+
+def _backoff(round_no: int, backoff: float) -> float:
+    return backoff * (2 ** (round_no - 1))
+
+
+def run_scenes_threaded(jobs: list, work, report: SceneReport, max_workers: int,
+                        retry_rounds: int = None, backoff: float = None) -> bool:
+    """
+    Ejecuta escenas en un pool de hilos, reintentando las fallidas al final.
+
+    jobs puede ser un generador: cada escena se lanza en cuanto se produce,
+    sin esperar a las siguientes (p.ej. prompts que llegan en streaming).
+
+    Args:
+        jobs: Lista o iterable de (número de escena, argumento) a procesar
+        work: work(argumento) -> estado (str); lanza una excepción si la escena
+            falla (SceneGenerationError con retryable=False: no se reintenta)
+        report: Tabla de estados a rellenar
+        max_workers: Escenas simultáneas
+        retry_rounds: Rondas de reintento para las fallidas (None = SCENE_RETRY_ROUNDS)
+        backoff: Espera base en segundos antes de cada ronda (None = SCENE_RETRY_BACKOFF)
+
+    Returns:
+        True si todas las escenas terminaron bien
+    """
+    retry_rounds = SCENE_RETRY_ROUNDS if retry_rounds is None else retry_rounds
+    backoff = SCENE_RETRY_BACKOFF if backoff is None else backoff
+    permanent = []
+
+    def attempt(job):
+        scene, arg = job
+        start = time.monotonic()
+        try:
+            status = work(arg)
+            report.mark(scene, status, seconds=time.monotonic() - start, new_round=True)
+            return None
+        except Exception as e:
+            report.mark(scene, "fallida", _failure_detail(e), seconds=time.monotonic() - start, new_round=True)
+            if not _is_retryable(e):
+                permanent.append(job)
+                return None
+            return job
+
+    pending = jobs
+    for round_no in range(retry_rounds + 1):
+        if round_no:
+            if not pending:
+                break
+            wait = _backoff(round_no, backoff)
+            print(f"\n🔁 Reintentando {len(pending)} escena(s) fallida(s) "
+                  f"(ronda {round_no}/{retry_rounds}) en {wait:.0f}s...")
+            time.sleep(wait)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # executor.map envía cada trabajo en cuanto el iterable lo produce
+            pending = [job for job in executor.map(attempt, pending) if job is not None]
+
+    return not pending and not permanent
+
+
+async def run_scenes_async(jobs: list, work, report: SceneReport,
+                           retry_rounds: int = None, backoff: float = None) -> bool:
+    """
+    Versión async de run_scenes_threaded (la concurrencia la limita work).
+
+    Args:
+        jobs: Lista o iterable async de (número de escena, argumento) a procesar;
+            con un iterable async cada escena se lanza en cuanto llega
+        work: Corrutina work(argumento) -> estado (str); lanza si la escena falla
+            (SceneGenerationError con retryable=False: no se reintenta)
+        report: Tabla de estados a rellenar
+        retry_rounds: Rondas de reintento para las fallidas (None = SCENE_RETRY_ROUNDS)
+        backoff: Espera base en segundos antes de cada ronda (None = SCENE_RETRY_BACKOFF)
+
+    Returns:
+        True si todas las escenas terminaron bien
+    """
+    retry_rounds = SCENE_RETRY_ROUNDS if retry_rounds is None else retry_rounds
+    backoff = SCENE_RETRY_BACKOFF if backoff is None else backoff
+    permanent = []
+
+    async def attempt(job):
+        scene, arg = job
+        start = time.monotonic()
+        try:
+            status = await work(arg)
+            report.mark(scene, status, seconds=time.monotonic() - start, new_round=True)
+            return None
+        except Exception as e:
+            report.mark(scene, "fallida", _failure_detail(e), seconds=time.monotonic() - start, new_round=True)
+            if not _is_retryable(e):
+                permanent.append(job)
+                return None
+            return job
+
+    if hasattr(jobs, "__aiter__"):
+        tasks = [asyncio.ensure_future(attempt(job)) async for job in jobs]
+        results = await asyncio.gather(*tasks)
+        pending = [job for job in results if job is not None]
+        first_round = 1
+    else:
+        pending = list(jobs)
+        first_round = 0
+
+    for round_no in range(first_round, retry_rounds + 1):
+        if not pending:
+            break
+        if round_no:
+            wait = _backoff(round_no, backoff)
+            print(f"\n🔁 Reintentando {len(pending)} escena(s) fallida(s) "
+                  f"(ronda {round_no}/{retry_rounds}) en {wait:.0f}s...")
+            await asyncio.sleep(wait)
+        results = await asyncio.gather(*(attempt(job) for job in pending))
+        pending = [job for job in results if job is not None]
+
+    return not pending and not permanent
@@ -110,7 +110,20 @@ def parse_script_with_images(path: Path) -> List[Turn]:
     Returns:
         Lista de objetos Turn con los bloques parseados
     """
-    lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
+    return parse_script_text(path.read_text(encoding="utf-8", errors="ignore"))
+
+
+def parse_script_text(script_text: str) -> List[Turn]:
+    """
+    Igual que parse_script_with_images, pero sobre el texto ya leído.
+
+    Args:
+        script_text: Contenido del script
+
+    Returns:
+        Lista de objetos Turn con los bloques parseados
+    """
+    lines = script_text.splitlines()
     turns: List[Turn] = []
     tag_re = re.compile(r"^\s*\[(.+?)\]\s*$")
 
@@ -0,0 +1,324 @@
+"""
+Renderizado en tubería (productor/consumidor).
+
+El TTS produce los audios en orden de guion; cada segmento del timeline se
+codifica a un .mkv temporal en cuanto su audio está terminado y medido,
+mientras se siguen sintetizando las líneas siguientes. Los segmentos llevan
+el audio en PCM y duran un número exacto de fotogramas: al unirlos con el
+demuxer concat de FFmpeg el vídeo se copia sin recodificar y el audio se
+codifica a AAC una sola vez (junto con la música), sin huecos ni clics en
+las uniones ni deriva respecto a la imagen.
+"""
+import math
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from moviepy.audio.AudioClip import AudioClip, CompositeAudioClip
+from proglog import ProgressBarLogger
+
+from .composition import parse_resolution
+from .renderer import (
+    resolve_image_file, build_sticky_group_clip, build_frame_clip,
+    build_cierre_clips, uses_sticky_groups, open_audio_clip
+)
+from ..media.image_proc import parse_color
+
+try:
+    import imageio_ffmpeg
+    FFMPEG_EXE = imageio_ffmpeg.get_ffmpeg_exe()
+except Exception:
+    FFMPEG_EXE = shutil.which("ffmpeg") or "ffmpeg"
+
+# Todos los segmentos deben compartir parámetros de audio para poder concatenar sin recodificar
+SEGMENT_AUDIO_FPS = 44100
+# Audio de los segmentos sin pérdidas: el AAC se codifica una sola vez al unirlos
+SEGMENT_AUDIO_CODEC = "pcm_s16le"
+FINAL_AUDIO_BITRATE = "192k"
+
+_DONE = object()
+
+
+def _silent_audio(duration: float):
+    """Pista estéreo silenciosa (el concat exige que todos los segmentos tengan audio)."""
+    def make_frame(t):
+        if np.ndim(t):
+            return np.zeros((len(t), 2))
+        return np.zeros(2)
+    return AudioClip(make_frame, duration=duration, fps=SEGMENT_AUDIO_FPS)
+
+
+def frame_aligned_duration(duration: float, fps: int) -> float:
+    """
+    Recorta una duración al último fotograma completo.
+
+    Vídeo y audio de cada segmento miden así lo mismo y la suma de segmentos
+    no deriva. Se recorta (no se redondea hacia arriba) dentro del padding
+    visual del final del turno.
+
+    Args:
+        duration: Duración en segundos
+        fps: Fotogramas por segundo
+
+    Returns:
+        Duración múltiplo de 1/fps (al menos un fotograma)
+    """
+    return max(1, math.floor(duration * fps + 1e-6)) / float(fps)
+
+
+class _StopLogger(ProgressBarLogger):
+    """Logger de MoviePy que interrumpe la codificación en curso si se pide parar."""
+
+    def __init__(self, stop: threading.Event):
+        super().__init__()
+        self._stop = stop
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # Se llama en cada fotograma / bloque de audio escrito
+        if self._stop.is_set():
+            raise CancelledError("renderizado cancelado")
+
+
+class SegmentEncoder:
+    """Codifica segmentos del timeline en paralelo y los une al terminar."""
+
+    def __init__(self, workdir: Path, args, max_workers: int = 2):
+        """
+        Args:
+            workdir: Directorio temporal para los segmentos
+            args: Argumentos de renderizado (resolución, fps, fit, Ken Burns...)
+            max_workers: Codificaciones simultáneas
+        """
+        self.workdir = workdir
+        self.args = args
+        self.W, self.H = parse_resolution(args.resolution)
+        self.fps = int(args.fps)
+        self.bg_color = parse_color(args.bg_color)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self.futures = []
+        # Al activarse, los segmentos pendientes no empiezan y los que están en curso se interrumpen
+        self.stop = threading.Event()
+
+    def _encode(self, index: int, build_clip, audio_refs: list) -> Path:
+        seg_path = self.workdir / f"seg_{index:05d}.mkv"
+        if self.stop.is_set():
+            raise CancelledError("renderizado cancelado")
+        clip = build_clip()
+        try:
+            duration = frame_aligned_duration(clip.duration, self.fps)
+            clip = clip.set_duration(duration)
+            audio = clip.audio if clip.audio is not None else _silent_audio(duration)
+            # Audio exactamente igual de largo que el vídeo (con silencio al final si es más corto)
+            clip = clip.set_audio(CompositeAudioClip([audio]).set_duration(duration))
+            clip.write_videofile(
+                str(seg_path),
+                fps=self.fps,
+                codec="libx264",
+                audio_codec=SEGMENT_AUDIO_CODEC,
+                audio_fps=SEGMENT_AUDIO_FPS,
+                temp_audiofile=str(self.workdir / f"seg_{index:05d}_audio.wav"),
+                logger=_StopLogger(self.stop)
+            )
+        finally:
+            try:
+                clip.close()
+            except Exception:
+                pass
+            for ac in audio_refs:
+                try:
+                    ac.close()
+                except Exception:
+                    pass
+        print(f"   🎞️  Segmento {index} codificado ({clip.duration:.2f}s)")
+        return seg_path
+
+    def submit_frames(self, frames: list, sticky: bool) -> None:
+        """Encola la codificación de un grupo de frames (o de un único frame)."""
+        index = len(self.futures) + 1
+        if sticky:
+            build = lambda: build_sticky_group_clip(frames, self.args, self.W, self.H, self.bg_color)
+        else:
+            build = lambda: build_frame_clip(frames[0], self.args, self.W, self.H, self.bg_color)
+        audio_refs = [f["audio"] for f in frames]
+        self.futures.append(self.executor.submit(self._encode, index, build, audio_refs))
+
+    def submit_clip(self, clip) -> None:
+        """Encola la codificación de un clip ya construido (p.ej. el cierre)."""
+        index = len(self.futures) + 1
+        self.futures.append(self.executor.submit(self._encode, index, lambda: clip, []))
+
+    def cancel(self) -> None:
+        """
+        Detiene la codificación: los segmentos en cola no empiezan y los que
+        están en curso se interrumpen en su siguiente fotograma.
+        """
+        self.stop.set()
+        for fut in self.futures:
+            fut.cancel()
+        self.executor.shutdown(wait=True)
+
+    def finish(self, video_out: Path) -> bool:
+        """
+        Espera a todos los segmentos, los concatena y añade la música de fondo.
+
+        El vídeo se copia tal cual; el audio PCM de los segmentos (mezclado con
+        la música si se pidió) se codifica a AAC una sola vez.
+
+        Returns:
+            True si el vídeo final se generó correctamente
+        """
+        self.executor.shutdown(wait=True)
+        segments = []
+        for fut in self.futures:
+            try:
+                segments.append(fut.result())
+            except Exception as e:
+                print(f"❌ Error codificando un segmento: {e}")
+                return False
+
+        if not segments:
+            print("❌ No hay clips de vídeo creados.")
+            return False
+
+        list_file = self.workdir / "concat.txt"
+        list_file.write_text("".join(f"file '{p.name}'\n" for p in segments), encoding="utf-8")
+
+        video_out.parent.mkdir(parents=True, exist_ok=True)
+        music_path = self.args.images_dir / "musica.mp3"
+        use_music = getattr(self.args, "music_audio", False)
+        if use_music and not music_path.exists():
+            print(f"⚠️ Aviso: musica.mp3 no encontrado en {self.args.images_dir}")
+            use_music = False
+
+        cmd = [FFMPEG_EXE, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(list_file)]
+        if use_music:
+            vol = max(0.0, min(1.0, self.args.music_audio_vol))
+            cmd += ["-stream_loop", "-1", "-i", str(music_path),
+                    "-filter_complex",
+                    f"[1:a]volume={vol}[m];[0:a][m]amix=inputs=2:duration=first:normalize=0[a]",
+                    "-map", "0:v", "-map", "[a]"]
+        else:
+            cmd += ["-map", "0:v", "-map", "0:a"]
+        cmd += ["-c:v", "copy", "-c:a", "aac", "-b:a", FINAL_AUDIO_BITRATE,
+                "-movflags", "+faststart", str(video_out)]
+
+        try:
+            subprocess.run(cmd, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ FFmpeg falló al unir los segmentos: {e}")
+            return False
+
+        if use_music:
+            print(f"✅ Música añadida desde {music_path.name} (vol={self.args.music_audio_vol})")
+        print(f"✅ Vídeo exportado -> {video_out} ({len(segments)} segmentos)")
+        return True
+
+
+def render_pipelined(produce, turns: list, args, images_dir: Path, workers: int = 2,
+                     audio_index=None) -> bool:
+    """
+    Ejecuta TTS y renderizado solapados.
+
+    Si el TTS o el renderizado fallan se activa una señal de parada común: el
+    productor deja de sintetizar, los segmentos en cola no se codifican y los
+    que están en curso se interrumpen en su siguiente fotograma. La llamada a
+    la API de TTS que esté en vuelo sí termina antes de parar.
+
+    Args:
+        produce: Función produce(on_ready, stop) que sintetiza los audios y
+            llama a on_ready(unit) por cada clip terminado, en orden de guion.
+            Debe dejar de sintetizar en cuanto stop (threading.Event) esté
+            activo. Cada unit expone block (1-based), speaker, text y path.
+        turns: Lista de Turn objects del parser
+        args: Argumentos de renderizado
+        images_dir: Directorio de imágenes
+        workers: Codificaciones de segmentos simultáneas
+        audio_index: AudioIndex de los audios sin pérdidas (opcional)
+
+    Returns:
+        True si el vídeo final se generó correctamente
+    """
+    ready = queue.Queue()
+    producer_errors = []
+
+    args.video_out.parent.mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix="segments_", dir=str(args.video_out.parent)))
+    encoder = SegmentEncoder(workdir, args, max_workers=workers)
+    stop = encoder.stop
+
+    def producer():
+        try:
+            produce(ready.put, stop)
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            ready.put(_DONE)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+
+    sticky = uses_sticky_groups(args)
+    bg_color = parse_color(args.bg_color)
+    group = []
+
+    try:
+        try:
+            while True:
+                unit = ready.get()
+                if unit is _DONE:
+                    break
+
+                turn = turns[unit.block - 1]
+                img_file = resolve_image_file(images_dir, turn.image)
+                img_key = str(img_file.resolve()) if img_file else f"COLOR:{bg_color}"
+
+                audio_clip = open_audio_clip(unit.path, audio_index)
+                frame = {
+                    "img_key": img_key,
+                    "img_file": img_file,
+                    "dur": audio_clip.duration + (args.pad_ms / 1000.0),
+                    "audio": audio_clip,
+                    "text": unit.text.strip(),
+                    "speaker": unit.speaker
+                }
+
+                if not sticky:
+                    encoder.submit_frames([frame], sticky=False)
+                    continue
+
+                # Un grupo sticky solo está completo cuando llega una imagen distinta
+                if group and group[-1]["img_key"] != img_key:
+                    encoder.submit_frames(group, sticky=True)
+                    group = []
+                group.append(frame)
+
+            if group:
+                encoder.submit_frames(group, sticky=True)
+        except Exception as e:
+            print(f"❌ Error preparando los segmentos: {e}")
+            encoder.cancel()
+            return False
+
+        thread.join()
+        if producer_errors:
+            # Sin todos los audios el vídeo quedaría truncado: no se concatena nada
+            print(f"❌ El TTS terminó con errores: {producer_errors[0]}")
+            encoder.cancel()
+            return False
+
+        W, H = parse_resolution(args.resolution)
+        for clip in build_cierre_clips(turns, images_dir, args, W, H, bg_color):
+            encoder.submit_clip(clip)
+
+        return encoder.finish(args.video_out)
+    finally:
+        # El productor no debe seguir escribiendo en el directorio de trabajo al borrarlo
+        stop.set()
+        thread.join()
+        encoder.executor.shutdown(wait=True)
+        shutil.rmtree(workdir, ignore_errors=True)
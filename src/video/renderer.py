@@ -16,6 +16,227 @@ from .composition import (
 from .subtitles import generate_srt_subtitles, generate_ass_subtitles
 from ..config.settings import VIDEO_EXTS
 from ..media.image_proc import parse_color
+from ..media.pcm_store import load_pcm_samples
+
+
+def resolve_image_file(images_dir: Path, t_image: str):
+    """
+    Localiza el archivo visual de un bloque, probando extensiones alternativas.
+
+    Args:
+        images_dir: Directorio de imágenes
+        t_image: Nombre indicado en el guion (ej: "3.png")
+
+    Returns:
+        Path del archivo encontrado o None
+    """
+    if not t_image:
+        return None
+    cand = [images_dir / t_image]
+    if not cand[0].exists() and "." in t_image:
+        stem, ext = Path(t_image).stem, Path(t_image).suffix
+        alts = [images_dir / (stem + alt) for alt in [ext, ".png", ".jpg", ".jpeg", ".webp", ".mp4", ".mov", ".m4v", ".webm"]]
+        for c in alts:
+            if c.exists():
+                cand = [c]
+                break
+    for c in cand:
+        if c.exists():
+            return c
+    return None
+
+
+def open_audio_clip(path: Path, audio_index=None):
+    """
+    Abre el audio de un turno para el mezclador.
+
+    Los WAV registrados en el índice de audio se sirven directamente desde un
+    mapa en memoria (sin decodificar con FFmpeg) y los FLAC registrados se
+    decodifican una vez a memoria; el resto usa AudioFileClip.
+
+    Args:
+        path: Ruta del audio
+        audio_index: AudioIndex del proyecto (opcional)
+
+    Returns:
+        Clip de audio de MoviePy
+    """
+    entry = audio_index.get(path) if audio_index is not None else None
+    if not entry or entry.get("sample_width") != 2 or not entry.get("frames"):
+        return AudioFileClip(str(path))
+    samples = load_pcm_samples(path, entry)
+    if samples is None:
+        return AudioFileClip(str(path))
+
+    import numpy as np
+    from moviepy.audio.AudioClip import AudioClip
+
+    rate = entry["sample_rate"]
+    last = max(0, entry["frames"] - 1)
+
+    def make_frame(t):
+        # Índice de muestra exacto para cada instante pedido; salida estéreo como AudioFileClip
+        idx = np.clip((np.asarray(t) * rate).astype(np.int64), 0, last)
+        data = samples[idx].astype(np.float32) / 32768.0
+        if data.shape[-1] == 1:
+            data = np.repeat(data, 2, axis=-1)
+        return data
+
+    return AudioClip(make_frame, duration=entry["frames"] / float(rate), fps=rate)
+
+
+def build_sticky_group_clip(g: list, args, W: int, H: int, bg_color):
+    """
+    Construye un único clip para frames consecutivos que comparten imagen (Ken Burns sticky).
+
+    Args:
+        g: Frames del grupo
+        args: Argumentos de renderizado
+        W, H: Dimensiones del canvas
+        bg_color: Color de fondo
+
+    Returns:
+        Clip de vídeo con el audio del grupo
+    """
+    total_dur = sum(f["dur"] for f in g)
+    img_file = g[0]["img_file"]
+
+    # Clip visual base (una sola vez por grupo)
+    if img_file and img_file.exists():
+        suffix = img_file.suffix.lower()
+        if suffix in VIDEO_EXTS:
+            # VIDEO STICKY
+            base = VideoFileClip(str(img_file))
+            if not args.media_keep_audio:
+                base = base.without_audio()
+            base = ensure_duration(base, total_dur, args.video_fill, W=W, H=H, bg_color=bg_color)
+            base = fit_to_canvas(base, W, H, args.fit, bg_color)
+            visual = apply_ken_burns(base, W, H, total_dur, args, key=str(img_file)) if args.kenburns != "none" else base
+        else:
+            # IMAGEN STICKY
+            base = ImageClip(str(img_file)).set_duration(total_dur)
+            if args.kenburns != "none":
+                visual = apply_ken_burns(base, W, H, total_dur, args, key=str(img_file))
+            else:
+                visual = fit_to_canvas(base, W, H, args.fit, bg_color)
+    else:
+        visual = ColorClip(size=(W, H), color=bg_color, duration=total_dur)
+
+    # Audio: cada parte con su offset dentro del grupo
+    offs = 0.0
+    tracks = []
+    for f in g:
+        tracks.append(f["audio"].set_start(offs))
+        offs += f["dur"]
+    comp_audio = CompositeAudioClip(tracks)
+
+    # Mezcla con audio de fondo del vídeo si se solicitó
+    final_audio = comp_audio
+    try:
+        if args.media_keep_audio and getattr(visual, "audio", None) is not None:
+            bg = visual.audio.volumex(max(0.0, min(1.0, args.media_audio_vol))).set_duration(total_dur)
+            final_audio = CompositeAudioClip([bg, comp_audio])
+    except Exception:
+        pass
+
+    return visual.set_audio(final_audio)
+
+
+def build_frame_clip(f: dict, args, W: int, H: int, bg_color):
+    """
+    Construye el clip de un único frame (modo sin sticky).
+
+    Args:
+        f: Frame con {img_file, dur, audio}
+        args: Argumentos de renderizado
+        W, H: Dimensiones del canvas
+        bg_color: Color de fondo
+
+    Returns:
+        Clip de vídeo con el audio del frame
+    """
+    dur = f["dur"]
+    img_file = f["img_file"]
+
+    if img_file and img_file.exists():
+        suffix = img_file.suffix.lower()
+        if suffix in VIDEO_EXTS:
+            # TRATAR COMO VIDEO
+            base_vid = VideoFileClip(str(img_file))
+            if not args.media_keep_audio:
+                base_vid = base_vid.without_audio()
+            base_vid = ensure_duration(base_vid, dur, args.video_fill, W=W, H=H, bg_color=bg_color)
+            base_vid = fit_to_canvas(base_vid, W, H, args.fit, bg_color)
+
+            if getattr(args, "kenburns", "none") != "none":
+                final_video_clip = apply_ken_burns(base_vid, W, H, dur, args, key=str(img_file))
+            else:
+                final_video_clip = base_vid
+        else:
+            # TRATAR COMO IMAGEN
+            base_img = ImageClip(str(img_file)).set_duration(dur)
+            if getattr(args, "kenburns", "none") != "none":
+                final_video_clip = apply_ken_burns(base_img, W, H, dur, args, key=str(img_file))
+            else:
+                if args.fit == "contain":
+                    img_resized = base_img.resize(
+                        height=H if base_img.h / base_img.w >= H / W else None,
+                        width=W if base_img.h / base_img.w < H / W else None
+                    ).set_position(("center", "center"))
+                    bg = ColorClip(size=(W, H), color=bg_color, duration=dur)
+                    final_video_clip = CompositeVideoClip([bg, img_resized])
+                else:
+                    scale = max(W / base_img.w, H / base_img.h)
+                    final_video_clip = base_img.resize(scale).crop(
+                        x_center=base_img.w * scale / 2,
+                        y_center=base_img.h * scale / 2,
+                        width=W, height=H
+                    )
+    else:
+        final_video_clip = ColorClip(size=(W, H), color=bg_color, duration=dur)
+
+    # Mezcla narración + posible audio del vídeo
+    final_audio = f["audio"]
+    try:
+        if args.media_keep_audio and getattr(final_video_clip, "audio", None) is not None:
+            bg = final_video_clip.audio.volumex(max(0.0, min(1.0, args.media_audio_vol))).set_duration(dur)
+            final_audio = CompositeAudioClip([bg, f["audio"]])
+    except Exception:
+        pass
+
+    return final_video_clip.set_audio(final_audio)
+
+
+def build_cierre_clips(turns: list, images_dir: Path, args, W: int, H: int, bg_color) -> list:
+    """
+    Devuelve los clips de cierre (cierre.mp4) correspondientes a los bloques [CIERRE].
+
+    Args:
+        turns: Lista de Turn objects del parser
+        images_dir: Directorio de imágenes
+        args: Argumentos de renderizado
+        W, H: Dimensiones del canvas
+        bg_color: Color de fondo
+
+    Returns:
+        Lista de clips de cierre
+    """
+    clips = []
+    for t in turns:
+        if t.speaker == "__CIERRE__":
+            cierre_path = images_dir / "cierre.mp4"
+            if cierre_path.exists():
+                cierre_clip = VideoFileClip(str(cierre_path))
+                cierre_clip = fit_to_canvas(cierre_clip, W, H, args.fit, bg_color)
+                clips.append(cierre_clip)
+            else:
+                print("⚠️ Aviso: cierre.mp4 no encontrado en /images")
+    return clips
+
+
+def uses_sticky_groups(args) -> bool:
+    """¿Se agrupan frames consecutivos con la misma imagen en un solo clip?"""
+    return args.kenburns != "none" and args.kb_sticky
 
 
 def render_video_from_frames(
@@ -49,119 +270,24 @@ def render_video_from_frames(
     video_clips = []
 
     # Renderizar con Ken Burns sticky o normal
-    if args.kenburns != "none" and args.kb_sticky:
+    if uses_sticky_groups(args):
         # Agrupación sticky por imagen consecutiva
         group = []
-
-        def flush_group(g):
-            if not g:
-                return
-            total_dur = sum(f["dur"] for f in g)
-            img_file = g[0]["img_file"]
-
-            # Clip visual base (una sola vez por grupo)
-            if img_file and img_file.exists():
-                suffix = img_file.suffix.lower()
-                if suffix in VIDEO_EXTS:
-                    # VIDEO STICKY
-                    base = VideoFileClip(str(img_file))
-                    if not args.media_keep_audio:
-                        base = base.without_audio()
-                    base = ensure_duration(base, total_dur, args.video_fill, W=W, H=H, bg_color=bg_color)
-                    base = fit_to_canvas(base, W, H, args.fit, bg_color)
-                    visual = apply_ken_burns(base, W, H, total_dur, args, key=str(img_file)) if args.kenburns != "none" else base
-                else:
-                    # IMAGEN STICKY
-                    base = ImageClip(str(img_file)).set_duration(total_dur)
-                    if args.kenburns != "none":
-                        visual = apply_ken_burns(base, W, H, total_dur, args, key=str(img_file))
-                    else:
-                        visual = fit_to_canvas(base, W, H, args.fit, bg_color)
-            else:
-                visual = ColorClip(size=(W, H), color=bg_color, duration=total_dur)
-
-            # Audio: cada parte con su offset dentro del grupo
-            offs = 0.0
-            tracks = []
-            for f in g:
-                tracks.append(f["audio"].set_start(offs))
-                offs += f["dur"]
-            comp_audio = CompositeAudioClip(tracks)
-
-            # Mezcla con audio de fondo del vídeo si se solicitó
-            final_audio = comp_audio
-            try:
-                if args.media_keep_audio and getattr(visual, "audio", None) is not None:
-                    bg = visual.audio.volumex(max(0.0, min(1.0, args.media_audio_vol))).set_duration(total_dur)
-                    final_audio = CompositeAudioClip([bg, comp_audio])
-            except Exception:
-                pass
-
-            video_clips.append(visual.set_audio(final_audio))
-
         prev_key = None
         for f in frames:
             if prev_key is None or f["img_key"] == prev_key:
                 group.append(f)
             else:
-                flush_group(group)
+                video_clips.append(build_sticky_group_clip(group, args, W, H, bg_color))
                 group = [f]
             prev_key = f["img_key"]
-        flush_group(group)
+        if group:
+            video_clips.append(build_sticky_group_clip(group, args, W, H, bg_color))
 
     else:
         # Fallback: clip por parte (sin sticky)
         for f in frames:
-            dur = f["dur"]
-            img_file = f["img_file"]
-
-            if img_file and img_file.exists():
-                suffix = img_file.suffix.lower()
-                if suffix in VIDEO_EXTS:
-                    # TRATAR COMO VIDEO
-                    base_vid = VideoFileClip(str(img_file))
-                    if not args.media_keep_audio:
-                        base_vid = base_vid.without_audio()
-                    base_vid = ensure_duration(base_vid, dur, args.video_fill, W=W, H=H, bg_color=bg_color)
-                    base_vid = fit_to_canvas(base_vid, W, H, args.fit, bg_color)
-
-                    if getattr(args, "kenburns", "none") != "none":
-                        final_video_clip = apply_ken_burns(base_vid, W, H, dur, args, key=str(img_file))
-                    else:
-                        final_video_clip = base_vid
-                else:
-                    # TRATAR COMO IMAGEN
-                    base_img = ImageClip(str(img_file)).set_duration(dur)
-                    if getattr(args, "kenburns", "none") != "none":
-                        final_video_clip = apply_ken_burns(base_img, W, H, dur, args, key=str(img_file))
-                    else:
-                        if args.fit == "contain":
-                            img_resized = base_img.resize(
-                                height=H if base_img.h / base_img.w >= H / W else None,
-                                width=W if base_img.h / base_img.w < H / W else None
-                            ).set_position(("center", "center"))
-                            bg = ColorClip(size=(W, H), color=bg_color, duration=dur)
-                            final_video_clip = CompositeVideoClip([bg, img_resized])
-                        else:
-                            scale = max(W / base_img.w, H / base_img.h)
-                            final_video_clip = base_img.resize(scale).crop(
-                                x_center=base_img.w * scale / 2,
-                                y_center=base_img.h * scale / 2,
-                                width=W, height=H
-                            )
-            else:
-                final_video_clip = ColorClip(size=(W, H), color=bg_color, duration=dur)
-
-            # Mezcla narración + posible audio del vídeo
-            final_audio = f["audio"]
-            try:
-                if args.media_keep_audio and getattr(final_video_clip, "audio", None) is not None:
-                    bg = final_video_clip.audio.volumex(max(0.0, min(1.0, args.media_audio_vol))).set_duration(dur)
-                    final_audio = CompositeAudioClip([bg, f["audio"]])
-            except Exception:
-                pass
-
-            video_clips.append(final_video_clip.set_audio(final_audio))
+            video_clips.append(build_frame_clip(f, args, W, H, bg_color))
 
     # Escribir ASS typing si se solicitó
     if hasattr(args, 'ass_typing_out') and args.ass_typing_out and ass_events:
@@ -169,15 +295,7 @@ def render_video_from_frames(
         print(f"Subtítulos ASS (typing) -> {args.ass_typing_out}")
 
     # Añadir cierre si existe
-    for t in turns:
-        if t.speaker == "__CIERRE__":
-            cierre_path = images_dir / "cierre.mp4"
-            if cierre_path.exists():
-                cierre_clip = VideoFileClip(str(cierre_path))
-                cierre_clip = fit_to_canvas(cierre_clip, W, H, args.fit, bg_color)
-                video_clips.append(cierre_clip)
-            else:
-                print("⚠️ Aviso: cierre.mp4 no encontrado en /images")
+    video_clips.extend(build_cierre_clips(turns, images_dir, args, W, H, bg_color))
 
     if not video_clips:
         print("❌ No hay clips de vídeo creados.")
@@ -0,0 +1,16 @@
+"""
+Configuración común de los tests.
+
+Los tests no llaman a ninguna API: se desactiva el registro de llamadas y
+la caché de respuestas para no escribir fuera del directorio temporal.
+"""
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("API_LEDGER", "0")
+os.environ.setdefault("LLM_CACHE", "0")
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,79 @@
+"""Tests del registro de llamadas (src/services/api_ledger.py)."""
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import api_ledger
+from src.services.api_ledger import ApiLedger, record_call
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    ledger = ApiLedger(str(tmp_path / "ledger.sqlite3"))
+    monkeypatch.setattr(api_ledger, "get_ledger", lambda: ledger)
+    yield ledger
+    ledger.close()
+
+
+def test_old_ledger_gets_ttft_column(tmp_path):
+    path = tmp_path / "old.sqlite3"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE calls (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, run_id TEXT, "
+                 "project TEXT, stage TEXT, provider TEXT NOT NULL, model TEXT, operation TEXT, "
+                 "latency_s REAL NOT NULL, ok INTEGER NOT NULL, retries INTEGER DEFAULT 0, "
+                 "bytes_in INTEGER DEFAULT 0, bytes_out INTEGER DEFAULT 0, units INTEGER DEFAULT 0, "
+                 "unit_kind TEXT, cost_usd REAL, error TEXT)")
+    conn.execute("INSERT INTO calls (ts, provider, latency_s, ok) VALUES (1, 'openai', 2.0, 1)")
+    conn.commit()
+    conn.close()
+
+    ledger = ApiLedger(str(path))
+    ledger.record(ts=2, provider="openai", latency_s=1.0, ok=1, ttft_s=0.3)
+    rows = ledger.rows()
+    ledger.close()
+    assert [r["ttft_s"] for r in rows] == [None, 0.3]
+
+
+def test_record_call_uses_thread_stage(ledger):
+    with api_ledger.ledger_stage("imagenes"):
+        record_call("gemini", "modelo", "image", 1.5, cost_usd=0.04)
+    row = ledger.rows()[-1]
+    assert (row["provider"], row["stage"], row["latency_s"], row["ok"]) == ("gemini", "imagenes", 1.5, 1)
+
+
+class _FakeStream:
+    """Stream de OpenAI: cada fragmento tarda `delay` segundos en llegar."""
+
+    def __init__(self, texts: list, delay: float):
+        self.texts = texts
+        self.delay = delay
+
+    def __iter__(self):
+        for text in self.texts:
+            time.sleep(self.delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=7, prompt_tokens=4,
+                                                                completion_tokens=3))
+
+
+def test_stream_latency_excludes_consumer_time(ledger):
+    pytest.importorskip("openai")
+    from src.services.openai_service import OpenAIService
+
+    service = OpenAIService(api_key="test", use_cache=False)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **params: _FakeStream(["hola ", "mundo"], delay=0.05))))
+
+    chunks = []
+    for chunk in service.chat_completion_stream([{"role": "user", "content": "hola"}], model="gpt-5.1"):
+        chunks.append(chunk)
+        time.sleep(0.3)  # consumidor lento
+
+    assert "".join(chunks) == "hola mundo"
+    row = ledger.rows()[-1]
+    assert row["operation"] == "chat_stream" and row["ok"] == 1
+    assert row["units"] == 7
+    assert 0.04 <= row["ttft_s"] < 0.2
+    assert 0.09 <= row["latency_s"] < 0.3
@@ -0,0 +1,121 @@
+"""Tests de los histogramas de latencia y los duplicados entre backends (src/services/image_backends.py)."""
+import threading
+
+import pytest
+
+from src.services.image_backends import (
+    _BUCKET_BASE, _BUCKET_COUNT, _BUCKET_GROWTH, HedgedImageGenerator, ImageBackend,
+    LatencyHistogram, LatencyStats, SceneRequest
+)
+from src.services.scene_scheduler import SceneGenerationError
+
+
+def test_bucket_edges_are_logarithmic():
+    assert LatencyHistogram._bucket(0.1) == 0
+    assert LatencyHistogram._bucket(_BUCKET_BASE) == 0
+    assert LatencyHistogram._bucket(_BUCKET_BASE * _BUCKET_GROWTH) == 1
+    assert LatencyHistogram._bucket(_BUCKET_BASE * _BUCKET_GROWTH + 0.01) == 2
+    assert LatencyHistogram._bucket(10 ** 9) == _BUCKET_COUNT - 1
+
+
+def test_percentile_returns_upper_edge_of_bucket():
+    hist = LatencyHistogram()
+    assert hist.percentile(50) == 0.0
+    for _ in range(9):
+        hist.record(1.0)
+    hist.record(60.0)
+
+    assert hist.total == 10
+    p50 = hist.percentile(50)
+    assert 1.0 <= p50 < 1.0 * _BUCKET_GROWTH
+    p99 = hist.percentile(99)
+    assert 60.0 <= p99 < 60.0 * _BUCKET_GROWTH
+
+
+def test_stats_require_min_samples_and_roundtrip(tmp_path):
+    path = str(tmp_path / "stats" / "latency.json")
+    stats = LatencyStats(path)
+    stats.record("gemini", 2.0)
+    assert stats.percentile("gemini", 90, min_samples=2) is None
+    stats.record("gemini", 3.0)
+    assert stats.percentile("gemini", 90, min_samples=2) >= 3.0
+    stats.save()
+
+    reloaded = LatencyStats(path)
+    assert reloaded.histograms["gemini"].counts == stats.histograms["gemini"].counts
+    assert reloaded.percentile("runware", 90) is None
+
+
+def test_stats_ignore_corrupt_file(tmp_path):
+    path = tmp_path / "latency.json"
+    path.write_text("{no es json", encoding="utf-8")
+    assert LatencyStats(str(path)).histograms == {}
+
+
+class _FakeBackend(ImageBackend):
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    @property
+    def cost_per_image(self) -> float:
+        return 0.01
+
+    def generate_scene(self, scene, dest_path):
+        self.calls += 1
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error is not None:
+            raise self.error
+        with open(dest_path, "w", encoding="utf-8") as f:
+            f.write(self.name)
+        return "generada"
+
+
+def _hedger(tmp_path, secondary, budget=1.0, delay=0.05):
+    stats = LatencyStats(str(tmp_path / "latency.json"))
+    hedger = HedgedImageGenerator(secondary, stats=stats, percentile=90, budget_usd=budget, max_workers=4)
+    hedger.hedge_delay = lambda backend: delay
+    return hedger
+
+
+def test_slow_primary_is_hedged_and_secondary_wins(tmp_path):
+    primary = _FakeBackend("gemini", delay=5.0)
+    secondary = _FakeBackend("runware")
+    hedger = _hedger(tmp_path, secondary)
+    image_path = tmp_path / "1.png"
+    try:
+        status = hedger.generate_scene(primary, SceneRequest(0, "prompt"), str(image_path))
+    finally:
+        primary.release.set()
+    assert status == "generada (runware)"
+    assert image_path.read_text(encoding="utf-8") == "runware"
+    assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+
+
+def test_no_hedge_when_budget_is_exhausted(tmp_path):
+    primary = _FakeBackend("gemini", delay=0.2)
+    secondary = _FakeBackend("runware")
+    hedger = _hedger(tmp_path, secondary, budget=0.0)
+
+    status = hedger.generate_scene(primary, SceneRequest(0, "prompt"), str(tmp_path / "1.png"))
+    assert status == "generada (gemini)"
+    assert secondary.calls == 0
+
+
+def test_failure_is_permanent_only_if_every_backend_failed_permanently(tmp_path):
+    permanent = SceneGenerationError("bloqueada", retryable=False)
+    hedger = _hedger(tmp_path, _FakeBackend("runware", error=permanent))
+    with pytest.raises(SceneGenerationError) as exc:
+        hedger.generate_scene(_FakeBackend("gemini", error=permanent), SceneRequest(0, "p"),
+                              str(tmp_path / "1.png"))
+    assert exc.value.retryable is False
+
+    hedger = _hedger(tmp_path, _FakeBackend("runware", error=RuntimeError("503")))
+    with pytest.raises(SceneGenerationError) as exc:
+        hedger.generate_scene(_FakeBackend("gemini", error=permanent), SceneRequest(0, "p"),
+                              str(tmp_path / "2.png"))
+    assert exc.value.retryable is True
@@ -0,0 +1,107 @@
+"""Tests de la caché en disco de respuestas de chat (src/services/llm_cache.py)."""
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import llm_cache
+from src.services.llm_cache import LLMCache, llm_cache_key
+
+MESSAGES = [{"role": "user", "content": "hola"}]
+
+
+def test_key_is_stable_and_sensitive_to_every_parameter():
+    base = llm_cache_key("gpt-5.1", MESSAGES, {"type": "json_object"}, temperature=0.2, seed=1)
+    assert base == llm_cache_key("gpt-5.1", MESSAGES, {"type": "json_object"}, seed=1, temperature=0.2)
+    assert base != llm_cache_key("gpt-5.1", MESSAGES, {"type": "json_object"}, temperature=0.3, seed=1)
+    assert base != llm_cache_key("gpt-5.1", MESSAGES, None, temperature=0.2, seed=1)
+    assert base != llm_cache_key("gpt-5", MESSAGES, {"type": "json_object"}, temperature=0.2, seed=1)
+
+
+def test_put_get_and_delete(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=0, max_mb=1)
+    key = llm_cache_key("m", MESSAGES)
+    assert cache.get(key) is None
+
+    cache.put(key, "respuesta")
+    assert cache.get(key) == "respuesta"
+    assert not list(tmp_path.glob("*/*.part"))
+
+    cache.delete(key)
+    assert cache.get(key) is None
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=60, max_mb=1)
+    key = llm_cache_key("m", MESSAGES)
+    cache.put(key, "vieja")
+    path = cache._path_for(key)
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    entry["created"] = time.time() - 120
+    path.write_text(json.dumps(entry), encoding="utf-8")
+
+    assert cache.get(key) is None
+    assert not path.exists()
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=0, max_mb=0.005)  # ~5 KB: caben tres entradas, no cuatro
+    keys = [llm_cache_key("m", MESSAGES, seed=i) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, "x" * 1500)
+        # mtime distinto y creciente para cada entrada
+        stamp = time.time() - 100 + i
+        os.utime(cache._path_for(key), (stamp, stamp))
+    # Usar la primera la convierte en la más reciente
+    assert cache.get(keys[0]) is not None
+
+    cache.put(llm_cache_key("m", MESSAGES, seed=99), "x" * 1500)
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+
+
+def test_directory_walk_is_throttled(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "_EVICT_EVERY", 5)
+    cache = LLMCache(str(tmp_path), ttl=0, max_mb=10)
+    walks = []
+    original = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda: (walks.append(1), original()))
+
+    for i in range(11):
+        cache.put(llm_cache_key("m", MESSAGES, seed=i), "respuesta")
+    # Primer guardado (tamaño desconocido) y luego cada 5
+    assert len(walks) == 3
+
+
+class _FakeClient:
+    def __init__(self, content: str):
+        self.content = content
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **params):
+        self.calls += 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def test_cached_response_failing_validation_is_refetched(tmp_path):
+    pytest.importorskip("openai")
+    from src.services.openai_service import OpenAIService
+
+    service = OpenAIService(api_key="test", use_cache=False)
+    service.cache = LLMCache(str(tmp_path), ttl=0, max_mb=1)
+    fmt = {"type": "json_object"}
+    service.cache.put(llm_cache_key("gpt-5.1", MESSAGES, fmt), '{"prompts": ["a"]}')
+    service.client = _FakeClient('{"prompts": ["a", "b"]}')
+
+    two_prompts = lambda data: len(data.get("prompts", [])) == 2
+    result = service.chat_completion(MESSAGES, response_format=fmt, validate=two_prompts)
+    assert result == {"prompts": ["a", "b"]}
+    assert service.client.calls == 1
+
+    # La respuesta nueva quedó cacheada: la siguiente no llama a la API
+    assert service.chat_completion(MESSAGES, response_format=fmt, validate=two_prompts) == result
+    assert service.client.calls == 1
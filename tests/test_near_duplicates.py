@@ -0,0 +1,98 @@
+"""Tests de la detección de ideas casi duplicadas (src/content/near_duplicates.py)."""
+import json
+import random
+
+import pytest
+
+from src.content.near_duplicates import SCRIPT_WINDOW, NearDuplicateIndex, shingles
+
+IDEA = ("Un farero desaparece durante una tormenta y su hija encuentra un diario "
+        "con coordenadas de un barco hundido que nadie recuerda en el pueblo")
+
+
+def _words(rng: random.Random, n: int) -> list:
+    return [f"palabra{rng.randrange(5000)}" for _ in range(n)]
+
+
+def test_shingles_ignore_accents_case_and_stopwords():
+    assert shingles("El Faro abandonado") == shingles("faro ABANDONADO")
+    assert shingles("faro") == {"faro"}
+
+
+def test_exact_and_edited_ideas_are_found():
+    index = NearDuplicateIndex()
+    index.update_project("1_Faro", "s1", idea=IDEA)
+    index.update_project("2_Bosque", "s2", idea="Una cabaña en el bosque donde un lobo habla con los niños")
+
+    exact = index.find_similar(IDEA)
+    assert exact[0][1:] == ("1_Faro", "idea")
+    assert exact[0][0] == pytest.approx(1.0)
+
+    edited = IDEA.replace("tormenta", "nevada").replace("pueblo", "puerto")
+    assert [p for _, p, _ in index.find_similar(edited, threshold=0.5)] == ["1_Faro"]
+    assert index.find_similar("Astronautas encuentran ruinas en Marte", threshold=0.5) == []
+
+
+def test_lsh_recall_on_perturbed_texts():
+    rng = random.Random(7)
+    index = NearDuplicateIndex()
+    originals = {}
+    for n in range(60):
+        text = " ".join(_words(rng, 40))
+        originals[f"p{n}"] = text
+        index.update_project(f"p{n}", "s", idea=text)
+
+    found = 0
+    for project, text in originals.items():
+        words = text.split()
+        # Cambia 2 de 40 palabras: Jaccard de bigramas ~0.8
+        for i in rng.sample(range(len(words)), 2):
+            words[i] = f"cambio{rng.randrange(10 ** 6)}"
+        hits = index.find_similar(" ".join(words), threshold=0.5)
+        found += bool(hits) and hits[0][1] == project
+    assert found / len(originals) >= 0.95
+
+
+def test_idea_repeated_inside_a_long_script_is_found_by_containment():
+    rng = random.Random(3)
+    filler = " ".join(_words(rng, SCRIPT_WINDOW * 5))
+    script = f"[NARRADOR] {filler} [imagen:3.png] {IDEA} {filler}"
+    index = NearDuplicateIndex()
+    index.update_project("1_Faro", "s1", script=script)
+
+    hits = index.find_similar(IDEA, threshold=0.5)
+    assert hits and hits[0][1:] == ("1_Faro", "guion")
+
+
+def test_stamps_skip_reindexing_and_removal_clears_buckets():
+    index = NearDuplicateIndex()
+    assert index.update_project("1_Faro", "s1", idea=IDEA)
+    assert not index.update_project("1_Faro", "s1", idea="otra cosa")
+    assert index.update_project("1_Faro", "s2", idea=IDEA)
+
+    assert index.prune(["otro"]) == 1
+    assert index.docs == {} and index._buckets == {}
+    assert index.find_similar(IDEA) == []
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = tmp_path / "minhash.json"
+    index = NearDuplicateIndex()
+    index.update_project("1_Faro", "s1", idea=IDEA, summary="El farero desaparecido")
+    index.save(str(path))
+
+    loaded = NearDuplicateIndex.load(str(path))
+    assert loaded.stamps == {"1_Faro": "s1"}
+    assert loaded.find_similar(IDEA) == index.find_similar(IDEA)
+
+    # Otra configuración de firmas: no se mezclan firmas incompatibles
+    assert NearDuplicateIndex.load(str(path), num_perm=64, bands=32).docs == {}
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["seed"] = 1
+    path.write_text(json.dumps(data), encoding="utf-8")
+    assert NearDuplicateIndex.load(str(path)).docs == {}
+
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=100, bands=64)
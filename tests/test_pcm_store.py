@@ -0,0 +1,130 @@
+"""Tests del almacenamiento sin pérdidas y su índice lateral (src/media/pcm_store.py)."""
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.media.pcm_store import (
+    AudioIndex, _flac_info, _wav_info, load_pcm_samples, pcm_to_wav_bytes, probe_lossless
+)
+
+
+def _pcm(frames: int) -> bytes:
+    return b"".join(struct.pack("<h", i % 1000) for i in range(frames))
+
+
+def _flac_header(sample_rate: int, channels: int, bits_per_sample: int, frames: int,
+                 last: bool = True) -> bytes:
+    """Cabecera fLaC + bloque STREAMINFO (sin tramas de audio)."""
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | ((bits_per_sample - 1) << 36) | frames
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\0" * 6 + packed.to_bytes(8, "big") + b"\0" * 16
+    block_header = bytes([0x80 if last else 0x00]) + len(streaminfo).to_bytes(3, "big")
+    return b"fLaC" + block_header + streaminfo
+
+
+def test_wav_info_reads_header_and_data_offset(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(pcm_to_wav_bytes(_pcm(1000), 22050))
+
+    info = _wav_info(path)
+    assert info == {"channels": 1, "sample_rate": 22050, "sample_width": 2,
+                    "data_offset": 44, "frames": 1000}
+
+
+def test_wav_info_skips_extra_chunks_with_padding(tmp_path):
+    wav = pcm_to_wav_bytes(_pcm(10), 16000)
+    # Chunk LIST de tamaño impar (lleva un byte de relleno) entre "fmt " y "data"
+    extra = b"LIST" + struct.pack("<I", 3) + b"abc" + b"\0"
+    data = wav[:36] + extra + wav[36:]
+    data = data[:4] + struct.pack("<I", len(data) - 8) + data[8:]
+    path = tmp_path / "b.wav"
+    path.write_bytes(data)
+
+    info = _wav_info(path)
+    assert info["data_offset"] == 44 + len(extra)
+    assert info["frames"] == 10
+
+
+def test_wav_info_clamps_truncated_data(tmp_path):
+    path = tmp_path / "c.wav"
+    path.write_bytes(pcm_to_wav_bytes(_pcm(100), 16000)[:-50])
+    assert _wav_info(path)["frames"] == 75
+
+
+def test_wav_info_rejects_non_wav(tmp_path):
+    path = tmp_path / "d.wav"
+    path.write_bytes(b"ID3" + b"\0" * 100)
+    assert _wav_info(path) is None
+
+
+def test_flac_info_reads_streaminfo(tmp_path):
+    path = tmp_path / "a.flac"
+    path.write_bytes(_flac_header(44100, 1, 16, 123456))
+
+    info = _flac_info(path)
+    assert info == {"channels": 1, "sample_rate": 44100, "sample_width": 2, "frames": 123456}
+
+
+def test_flac_info_rejects_other_first_block(tmp_path):
+    header = bytearray(_flac_header(44100, 2, 16, 10))
+    header[4] = 0x84  # primer bloque VORBIS_COMMENT en lugar de STREAMINFO
+    path = tmp_path / "b.flac"
+    path.write_bytes(bytes(header))
+    assert _flac_info(path) is None
+
+
+def test_probe_lossless_adds_format_and_duration(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(pcm_to_wav_bytes(_pcm(8000), 16000))
+
+    info = probe_lossless(path)
+    assert info["format"] == "wav"
+    assert info["duration"] == 0.5
+    assert probe_lossless(tmp_path / "a.mp3") is None
+
+
+def test_load_pcm_samples_maps_wav_data(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(pcm_to_wav_bytes(_pcm(500), 16000))
+
+    samples = load_pcm_samples(path, probe_lossless(path))
+    assert samples.shape == (500, 1)
+    assert np.array_equal(samples[:, 0], np.arange(500, dtype=np.int16))
+
+
+def test_index_roundtrip_and_stale_entries(tmp_path):
+    path = tmp_path / "001.wav"
+    path.write_bytes(pcm_to_wav_bytes(_pcm(100), 16000))
+    index = AudioIndex(tmp_path)
+    assert index.register(path)["frames"] == 100
+    index.save()
+
+    reloaded = AudioIndex(tmp_path)
+    assert reloaded.get(path)["sample_rate"] == 16000
+    # El archivo cambió desde que se registró: la entrada ya no vale
+    path.write_bytes(pcm_to_wav_bytes(_pcm(200), 16000))
+    assert reloaded.get(path) is None
+
+
+def test_index_is_safe_across_threads(tmp_path):
+    paths = []
+    for i in range(40):
+        p = tmp_path / f"{i:03d}.wav"
+        p.write_bytes(pcm_to_wav_bytes(_pcm(10 + i), 16000))
+        paths.append(p)
+    index = AudioIndex(tmp_path)
+
+    def writer(chunk: list) -> None:
+        for p in chunk:
+            index.register(p)
+            index.save()
+
+    threads = [threading.Thread(target=writer, args=(paths[i::4],)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    index.save()
+
+    assert set(AudioIndex(tmp_path).entries) == {p.name for p in paths}
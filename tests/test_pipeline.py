@@ -0,0 +1,101 @@
+"""Tests del renderizado en tubería (src/video/pipeline.py)."""
+import struct
+import threading
+import wave
+from argparse import Namespace
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("moviepy")
+imageio_ffmpeg = pytest.importorskip("imageio_ffmpeg")
+
+from src.video.pipeline import frame_aligned_duration, render_pipelined  # noqa: E402
+
+FPS = 10
+
+
+def _write_wav(path: Path, seconds: float, rate: int = 16000) -> None:
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(struct.pack("<h", 1000) * int(rate * seconds))
+
+
+def _args(tmp_path: Path) -> Namespace:
+    return Namespace(
+        resolution="64x36", fps=FPS, bg_color="#000000", fit="contain", pad_ms=0,
+        kenburns="none", kb_sticky=False, video_fill="loop", media_keep_audio=False,
+        media_audio_vol=0.0, music_audio=False, music_audio_vol=0.0,
+        images_dir=tmp_path, video_out=tmp_path / "out" / "video.mp4"
+    )
+
+
+def _units(tmp_path: Path, durations: list) -> tuple:
+    turns, units = [], []
+    for i, dur in enumerate(durations, start=1):
+        turns.append(SimpleNamespace(index=i, speaker="NARRADOR", image=None, text=f"t{i}"))
+        units.append(SimpleNamespace(block=i, speaker="NARRADOR", text=f"t{i}",
+                                     path=tmp_path / f"{i:03d}.wav", seconds=dur))
+    return turns, units
+
+
+def test_frame_aligned_duration_floors_to_whole_frames():
+    assert frame_aligned_duration(1.26, 10) == pytest.approx(1.2)
+    assert frame_aligned_duration(1.2, 10) == pytest.approx(1.2)
+    assert frame_aligned_duration(0.01, 10) == pytest.approx(0.1)
+
+
+def test_segments_are_joined_without_drift(tmp_path):
+    turns, units = _units(tmp_path, [0.35, 0.52, 0.41])
+
+    def produce(on_ready, stop):
+        for u in units:
+            _write_wav(u.path, u.seconds)
+            on_ready(u)
+
+    assert render_pipelined(produce, turns, _args(tmp_path), tmp_path, workers=2)
+    out = tmp_path / "out" / "video.mp4"
+    frames, secs = imageio_ffmpeg.count_frames_and_secs(str(out))
+    # Cada segmento se recorta a fotogramas completos: 3 + 5 + 4
+    assert frames == 12
+    assert not list((tmp_path / "out").glob("segments_*"))
+
+
+def test_producer_error_aborts_and_cleans_up(tmp_path):
+    turns, units = _units(tmp_path, [0.3, 0.3])
+
+    def produce(on_ready, stop):
+        _write_wav(units[0].path, 0.3)
+        on_ready(units[0])
+        raise RuntimeError("TTS caído")
+
+    assert not render_pipelined(produce, turns, _args(tmp_path), tmp_path)
+    assert not (tmp_path / "out" / "video.mp4").exists()
+    assert not list((tmp_path / "out").glob("segments_*"))
+
+
+def test_consumer_error_stops_the_producer(tmp_path):
+    turns, units = _units(tmp_path, [0.3] * 50)
+    produced = []
+    finished = threading.Event()
+
+    def produce(on_ready, stop):
+        try:
+            for u in units:
+                if stop.is_set():
+                    break
+                # Sin escribir el audio: el consumidor falla al abrir el primero
+                produced.append(u)
+                on_ready(u)
+                stop.wait(0.01)
+        finally:
+            finished.set()
+
+    assert not render_pipelined(produce, turns, _args(tmp_path), tmp_path)
+    # El productor se detuvo y terminó antes de que se borrara el directorio de trabajo
+    assert finished.is_set()
+    assert len(produced) < len(units)
+    assert not list((tmp_path / "out").glob("segments_*"))
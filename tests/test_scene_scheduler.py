@@ -0,0 +1,96 @@
+"""Tests del planificador de escenas con reintentos (src/services/scene_scheduler.py)."""
+import asyncio
+import threading
+
+from src.services.scene_scheduler import (
+    SceneGenerationError, SceneReport, run_scenes_async, run_scenes_threaded
+)
+
+
+class _Flaky:
+    """work() que falla las primeras `failures[arg]` veces para cada argumento."""
+
+    def __init__(self, failures: dict, permanent: set = frozenset()):
+        self.failures = dict(failures)
+        self.permanent = permanent
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, arg):
+        with self._lock:
+            self.calls[arg] = self.calls.get(arg, 0) + 1
+            if arg in self.permanent:
+                raise SceneGenerationError("bloqueada", retryable=False)
+            if self.failures.get(arg, 0) > 0:
+                self.failures[arg] -= 1
+                raise SceneGenerationError("error temporal")
+        return "generada"
+
+
+def test_failed_scenes_are_retried_in_later_rounds():
+    work = _Flaky({"b": 1, "c": 2})
+    report = SceneReport()
+    jobs = [(1, "a"), (2, "b"), (3, "c")]
+
+    assert run_scenes_threaded(jobs, work, report, max_workers=2, retry_rounds=2, backoff=0)
+    assert work.calls == {"a": 1, "b": 2, "c": 3}
+    assert [report.scenes[n].rounds for n in (1, 2, 3)] == [1, 2, 3]
+    assert report.failed() == []
+
+
+def test_scene_still_failing_after_all_rounds_is_reported():
+    work = _Flaky({"b": 10})
+    report = SceneReport()
+
+    assert not run_scenes_threaded([(1, "a"), (2, "b")], work, report, max_workers=2,
+                                   retry_rounds=2, backoff=0)
+    assert work.calls["b"] == 3
+    assert report.failed() == [2]
+    assert report.scenes[1].status == "generada"
+
+
+def test_permanent_failures_are_not_retried():
+    work = _Flaky({"c": 1}, permanent={"b"})
+    report = SceneReport()
+
+    assert not run_scenes_threaded([(1, "a"), (2, "b"), (3, "c")], work, report, max_workers=2,
+                                   retry_rounds=3, backoff=0)
+    assert work.calls == {"a": 1, "b": 1, "c": 2}
+    assert report.failed() == [2]
+    assert "sin reintento" in report.scenes[2].detail
+
+
+def test_generator_jobs_start_before_the_stream_ends():
+    started = threading.Event()
+
+    def jobs():
+        yield (1, "a")
+        # La primera escena ya está en marcha mientras llega la segunda
+        assert started.wait(5)
+        yield (2, "b")
+
+    def work(arg):
+        if arg == "a":
+            started.set()
+        return "generada"
+
+    report = SceneReport()
+    assert run_scenes_threaded(jobs(), work, report, max_workers=2, retry_rounds=0, backoff=0)
+    assert sorted(report.scenes) == [1, 2]
+
+
+def test_async_retries_and_permanent_failures():
+    work = _Flaky({"b": 1}, permanent={"c"})
+
+    async def awork(arg):
+        return work(arg)
+
+    async def stream():
+        for job in [(1, "a"), (2, "b"), (3, "c")]:
+            yield job
+
+    report = SceneReport()
+    ok = asyncio.run(run_scenes_async(stream(), awork, report, retry_rounds=2, backoff=0))
+    assert not ok
+    assert work.calls == {"a": 1, "b": 2, "c": 1}
+    assert report.failed() == [3]
@@ -0,0 +1,82 @@
+"""Tests del índice invertido de guiones (src/content/script_index.py)."""
+import sqlite3
+
+import pytest
+
+from src.content.script_index import TITLE_SPEAKER, TITLE_TURN, ScriptIndex, script_preamble
+
+SCRIPT = """El faro del fin del mundo
+[NARRADOR]
+[imagen:1.png]
+Nadie volvió a encender el faro abandonado después de aquella noche.
+[ANA]
+¿Quién dejó la estación de tren a oscuras?
+[NARRADOR]
+[imagen:2.png]
+La niña aparecía cada noche junto a la estación.
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ScriptIndex(str(tmp_path / "catalog.sqlite3"))
+    index.update_project("12_Faro_v", SCRIPT)
+    index.update_project("3_Otro", "[NARRADOR]\nUn faro distinto, lejos de la costa.")
+    yield index
+    index.close()
+
+
+def test_preamble_is_text_before_first_speaker():
+    assert script_preamble(SCRIPT) == "El faro del fin del mundo"
+    assert script_preamble("[NARRADOR]\nhola") == ""
+
+
+def test_title_line_is_searchable(index):
+    results = index.search("fin mundo")
+    assert [(r["project"], r["turn"], r["speaker"]) for r in results] == [("12_Faro_v", TITLE_TURN, TITLE_SPEAKER)]
+
+
+def test_results_carry_speaker_image_and_are_ordered_by_project_number(index):
+    results = index.search("faro")
+    assert [r["project"] for r in results] == ["3_Otro", "12_Faro_v", "12_Faro_v"]
+    narrador = results[-1]
+    assert (narrador["speaker"], narrador["image"]) == ("NARRADOR", "1.png")
+
+
+def test_all_words_accents_and_prefixes(index):
+    assert [r["speaker"] for r in index.search("Estación oscuras")] == ["ANA"]
+    assert len(index.search("estacion")) == 2
+    assert [r["image"] for r in index.search("aparec*")] == ["2.png"]
+    assert index.search("faro niña") == []
+
+
+def test_phrase_requires_order_and_adjacency(index):
+    assert len(index.search("faro abandonado", phrase=True)) == 1
+    assert index.search("abandonado faro", phrase=True) == []
+
+
+def test_project_filter_reindex_and_removal(index):
+    assert [r["project"] for r in index.search("faro", project="3_Otro")] == ["3_Otro"]
+
+    index.update_project("3_Otro", "[NARRADOR]\nAhora habla de un bosque.")
+    assert index.search("faro", project="3_Otro") == []
+    assert len(index.search("bosque")) == 1
+
+    index.remove_projects(["3_Otro"])
+    assert index.projects() == {"12_Faro_v"}
+
+
+def test_index_from_another_version_is_rebuilt(tmp_path):
+    path = str(tmp_path / "catalog.sqlite3")
+    index = ScriptIndex(path)
+    index.update_project("12_Faro_v", SCRIPT)
+    index.close()
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE script_index_meta SET value = '1' WHERE key = 'version'")
+    conn.commit()
+    conn.close()
+
+    index = ScriptIndex(path)
+    assert index.projects() == set()
+    index.close()
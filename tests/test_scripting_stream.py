@@ -0,0 +1,56 @@
+"""Tests de la extracción incremental de prompts en streaming (src/content/scripting.py)."""
+import json
+
+import pytest
+
+pytest.importorskip("openai")
+
+from src.content.scripting import iter_json_string_array  # noqa: E402
+
+PROMPTS = [
+    "Un faro en la niebla, óleo",
+    'Ella susurra "vuelve" junto a la puerta',
+    "Ruta C:\\viejo\\archivo y salto\nde línea",
+    "Emoji ☕ y \u00e9",
+]
+DOCUMENT = json.dumps({"titulo": "x", "visual_prompts": PROMPTS, "otro": ["no"]}, ensure_ascii=True)
+
+
+def _split(text: str, *cuts: int) -> list:
+    bounds = [0, *cuts, len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def test_whole_document_in_one_chunk():
+    assert list(iter_json_string_array([DOCUMENT], "visual_prompts")) == PROMPTS
+
+
+def test_one_character_per_chunk():
+    assert list(iter_json_string_array(list(DOCUMENT), "visual_prompts")) == PROMPTS
+
+
+@pytest.mark.parametrize("cut", range(1, len(DOCUMENT)))
+def test_every_two_chunk_split(cut):
+    # Incluye cortes dentro de la clave, de un escape (\\", \\u00e9) y entre comillas
+    assert list(iter_json_string_array(_split(DOCUMENT, cut), "visual_prompts")) == PROMPTS
+
+
+def test_items_are_yielded_before_the_stream_ends():
+    seen = []
+
+    def chunks():
+        first = json.dumps(PROMPTS[0])
+        for piece in _split(DOCUMENT, DOCUMENT.index(first) + len(first)):
+            seen.append(piece)
+            yield piece
+
+    gen = iter_json_string_array(chunks(), "visual_prompts")
+    assert next(gen) == PROMPTS[0]
+    assert len(seen) == 1
+
+
+def test_stops_at_end_of_array_and_ignores_other_keys():
+    doc = '{"visual_prompts": ["a", "b"], "despues": ["c"]}'
+    assert list(iter_json_string_array([doc], "visual_prompts")) == ["a", "b"]
+    assert list(iter_json_string_array(['{"visual_prompts": []}'], "visual_prompts")) == []
+    assert list(iter_json_string_array(['{"otra": ["a"]}'], "visual_prompts")) == []
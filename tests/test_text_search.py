@@ -0,0 +1,75 @@
+"""Tests de la tokenización y el índice BM25 (src/content/text_search.py)."""
+import pytest
+
+from src.content.text_search import BM25Index, normalize_word, search_tokens
+
+
+def test_normalization_drops_accents_but_keeps_enie():
+    assert normalize_word("¡Canción!") == "cancion"
+    assert normalize_word("NIÑA,") == "niña"
+    assert normalize_word("pingüino") == "pinguino"
+    assert normalize_word("...") == ""
+
+
+def test_search_tokens_split_compounds_and_drop_stopwords():
+    assert search_tokens("La casa-cueva y el faro") == ["la", "casa", "cueva", "y", "el", "faro"]
+    assert search_tokens("La casa-cueva y el faro", drop_stopwords=True) == ["casa", "cueva", "faro"]
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add("1_Faro_v", "El faro abandonado y el farero desaparecido en la niebla", tier="v")
+    index.add("2_Tren_mv", "Una estación de tren abandonada donde aparece una niña", tier="mv")
+    index.add("3_Bosque", "Un bosque con una cabaña y un lobo", tier="")
+    index.add("4_Faro_Faro", "Faro faro faro en la costa", tier="")
+    return index
+
+
+def test_ranking_prefers_matching_documents(index):
+    results = index.search("faro abandonado")
+    names = [name for _, name, _ in results]
+    assert names[0] == "1_Faro_v"
+    assert set(names) == {"1_Faro_v", "4_Faro_Faro"}
+    assert all(score > 0 for score, _, _ in results)
+
+
+def test_documents_without_query_terms_are_not_returned(index):
+    assert index.search("dragón espacial") == []
+    assert [name for _, name, _ in index.search("niña")] == ["2_Tren_mv"]
+
+
+def test_where_filter_and_k(index):
+    results = index.search("faro abandonada niña", where=lambda meta: meta["tier"] in ("v", "mv"))
+    assert {name for _, name, _ in results} == {"1_Faro_v", "2_Tren_mv"}
+    assert len(index.search("faro", k=1)) == 1
+
+
+def test_remove_and_replace_update_document_frequencies(index):
+    index.add("3_Bosque", "Un faro en el bosque")
+    assert index.df["faro"] == 3
+    index.remove("3_Bosque")
+    assert index.df["faro"] == 2
+    assert "lobo" not in index.df
+    assert len(index) == 3
+
+
+def test_save_and_load_roundtrip(index, tmp_path):
+    path = str(tmp_path / "index.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert loaded.search("faro abandonado") == index.search("faro abandonado")
+    assert BM25Index.load(str(tmp_path / "no_existe.json")) is None
+
+
+def test_idea_exemplars_fall_back_to_viral_projects(index, tmp_path):
+    pytest.importorskip("openai")
+    from src.content.ideation import select_idea_exemplars
+
+    path = str(tmp_path / "index.json")
+    index.save(path)
+    # Ningún proyecto viral comparte palabras con la consulta: se usan igualmente como ejemplos
+    block = select_idea_exemplars("estilo_inexistente_xyz", k=5, index_path=path)
+    assert "1_Faro_v" in block and "2_Tren_mv" in block
+    assert "3_Bosque" not in block
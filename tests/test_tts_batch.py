@@ -0,0 +1,105 @@
+"""Tests de la agrupación de turnos TTS por hablante (src/media/tts_batch.py)."""
+import wave
+from pathlib import Path
+
+import pytest
+
+from src.config.settings import ELEVEN_PCM_FORMATS
+from src.media import tts_batch
+from src.media.tts_batch import (
+    BATCH_SEPARATOR, TtsUnit, _char_spans, _cuts_from_alignment, group_units_by_speaker,
+    pending_runs, synthesize_group
+)
+
+pytest.importorskip("pydub")
+
+
+def _unit(block, speaker, text, tmp_path=Path(".")):
+    return TtsUnit(block=block, speaker=speaker, text=text, path=tmp_path / f"{block:03d}.wav")
+
+
+def test_groups_only_consecutive_same_speaker():
+    units = [_unit(1, "NARRADOR", "a"), _unit(2, "NARRADOR", "b"), _unit(3, "ANA", "c"),
+             _unit(4, "NARRADOR", "d")]
+    groups = group_units_by_speaker(units, max_chars=100)
+    assert [[u.block for u in g] for g in groups] == [[1, 2], [3], [4]]
+
+
+def test_groups_respect_max_chars_including_separator():
+    units = [_unit(i, "NARRADOR", "x" * 10) for i in range(1, 5)]
+    # 10 + 1 + 10 = 21 caben; un tercero (32) no
+    groups = group_units_by_speaker(units, max_chars=21)
+    assert [[u.block for u in g] for g in groups] == [[1, 2], [3, 4]]
+
+
+def test_pending_runs_do_not_bridge_completed_turns():
+    units = [_unit(i, "NARRADOR", "t") for i in range(1, 7)]
+    done = {2, 5}
+    runs = pending_runs(units, lambda u: u.block in done)
+    assert [[u.block for u in r] for r in runs] == [[1], [3, 4], [6]]
+
+
+def test_char_spans_account_for_separator():
+    spans = _char_spans(["hola", "que", "tal"])
+    joined = BATCH_SEPARATOR.join(["hola", "que", "tal"])
+    assert [joined[a:b] for a, b in spans] == ["hola", "que", "tal"]
+
+
+def test_cuts_fall_at_gap_midpoints():
+    texts = ["ab", "cd"]
+    joined = BATCH_SEPARATOR.join(texts)
+    # a b _ c d  -> el hueco entre "b" (termina en 0.4) y "c" (empieza en 0.8)
+    alignment = {
+        "characters": list(joined),
+        "character_start_times_seconds": [0.0, 0.2, 0.4, 0.8, 1.0],
+        "character_end_times_seconds": [0.2, 0.4, 0.8, 1.0, 1.2],
+    }
+    cuts = _cuts_from_alignment(alignment, _char_spans(texts), len(joined))
+    assert cuts == [pytest.approx(0.6)]
+
+
+def test_cuts_reject_misaligned_response():
+    alignment = {"characters": ["a"], "character_start_times_seconds": [0.0],
+                 "character_end_times_seconds": [0.1]}
+    assert _cuts_from_alignment(alignment, [(0, 1), (2, 3)], 3) is None
+
+
+class _FakeEleven:
+    """Devuelve PCM (un tono por turno y silencio en el separador) con su alineamiento."""
+
+    def __init__(self):
+        self.requests = []
+
+    def create_speech_with_timestamps(self, text, voice_id, model_id, speed, output_format):
+        self.requests.append(output_format)
+        rate = ELEVEN_PCM_FORMATS[output_format]
+        char_s = 0.05
+        samples = bytearray()
+        starts, ends = [], []
+        for i, ch in enumerate(text):
+            starts.append(i * char_s)
+            ends.append((i + 1) * char_s)
+            value = 0 if ch == " " else 8000
+            samples += int(value).to_bytes(2, "little", signed=True) * int(rate * char_s)
+        alignment = {"characters": list(text), "character_start_times_seconds": starts,
+                     "character_end_times_seconds": ends}
+        return bytes(samples), alignment
+
+
+def test_synthesize_group_always_requests_pcm_and_writes_one_clip_per_turn(tmp_path):
+    group = [_unit(1, "NARRADOR", "aaaa", tmp_path), _unit(2, "NARRADOR", "bb", tmp_path)]
+    service = _FakeEleven()
+
+    # output_format=None (modo MP3): la petición agrupada se hace igualmente en PCM
+    method, durations = synthesize_group(service, group, "voz", "modelo", 1.0, output_format=None)
+
+    assert service.requests == [tts_batch.DEFAULT_PCM_FORMAT]
+    assert method == "timestamps"
+    # "aaaa" = 0.2 s; el corte cae en mitad del separador (0.225 s)
+    assert durations[0] == pytest.approx(0.225, abs=0.002)
+    assert sum(durations) == pytest.approx(0.35, abs=0.002)
+    for unit in group:
+        assert unit.path.exists()
+        assert not unit.path.with_name(unit.path.name + ".part").exists()
+        with wave.open(str(unit.path)) as w:
+            assert w.getnchannels() == 1
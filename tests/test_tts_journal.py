@@ -0,0 +1,92 @@
+"""Tests del journal de TTS y la reanudación tras una interrupción (src/media/tts_journal.py)."""
+import struct
+import wave
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pydub")
+
+from src.media.tts_journal import JOURNAL_FILENAME, TtsJournal, request_hash, write_atomic  # noqa: E402
+
+
+def _wav_bytes(tmp_path: Path, seconds: float = 0.2, rate: int = 16000) -> bytes:
+    path = tmp_path / "_tmp.wav"
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(struct.pack("<h", 500) * int(rate * seconds))
+    data = path.read_bytes()
+    path.unlink()
+    return data
+
+
+def test_request_hash_depends_on_every_field():
+    base = request_hash("hola", "voz", "modelo", 1.0, "wav")
+    assert base == request_hash("hola", "voz", "modelo", 1.0004, "wav")
+    assert base != request_hash("hola", "voz", "modelo", 1.1, "wav")
+    assert base != request_hash("hola", "voz", "modelo", 1.0, "mp3")
+
+
+def test_recorded_file_is_complete_after_restart(tmp_path):
+    audio = tmp_path / "001_NARRADOR.wav"
+    write_atomic(audio, _wav_bytes(tmp_path))
+    TtsJournal(tmp_path).record(audio, "h1", 0.2)
+
+    resumed = TtsJournal(tmp_path)
+    assert resumed.is_complete(audio, "h1")
+    assert not resumed.is_complete(audio, "otro-hash")
+
+
+def test_truncated_file_is_requeued(tmp_path):
+    audio = tmp_path / "001_NARRADOR.wav"
+    data = _wav_bytes(tmp_path)
+    write_atomic(audio, data)
+    TtsJournal(tmp_path).record(audio, "h1", 0.2)
+
+    audio.write_bytes(data[: len(data) // 2])
+    assert not TtsJournal(tmp_path).is_complete(audio, "h1")
+
+
+def test_corrupt_file_with_matching_size_is_requeued_after_restart(tmp_path):
+    audio = tmp_path / "001_NARRADOR.wav"
+    data = _wav_bytes(tmp_path)
+    write_atomic(audio, data)
+    TtsJournal(tmp_path).record(audio, "h1", 0.2)
+
+    # Mismo tamaño que lo registrado, pero el contenido ya no es audio
+    audio.write_bytes(b"\0" * len(data))
+    assert not TtsJournal(tmp_path).is_complete(audio, "h1")
+
+
+def test_truncated_journal_line_is_ignored(tmp_path):
+    audio = tmp_path / "001_NARRADOR.wav"
+    write_atomic(audio, _wav_bytes(tmp_path))
+    TtsJournal(tmp_path).record(audio, "h1", 0.2)
+    with (tmp_path / JOURNAL_FILENAME).open("a", encoding="utf-8") as f:
+        f.write('{"file": "002_NARRADOR.wav", "ha')
+
+    resumed = TtsJournal(tmp_path)
+    assert set(resumed.entries) == {"001_NARRADOR.wav"}
+    assert resumed.is_complete(audio, "h1")
+
+
+def test_legacy_file_is_adopted_only_if_it_decodes(tmp_path):
+    good = tmp_path / "001_NARRADOR.wav"
+    bad = tmp_path / "002_NARRADOR.wav"
+    write_atomic(good, _wav_bytes(tmp_path))
+    bad.write_bytes(b"no es audio")
+
+    journal = TtsJournal(tmp_path)
+    assert journal.is_complete(good, "h1")
+    assert not journal.is_complete(bad, "h2")
+    # La adopción queda registrada para la próxima ejecución
+    assert TtsJournal(tmp_path).entries["001_NARRADOR.wav"]["hash"] == "h1"
+
+
+def test_write_atomic_leaves_no_part_file(tmp_path):
+    audio = tmp_path / "001_NARRADOR.wav"
+    write_atomic(audio, b"datos")
+    assert audio.read_bytes() == b"datos"
+    assert not (tmp_path / "001_NARRADOR.wav.part").exists()